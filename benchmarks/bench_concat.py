@@ -0,0 +1,110 @@
+"""
+Concatenación de segmentos: la implementación anterior de
+`PostProcessor._concatenate_binary` (open + `shutil.copyfileobj` por archivo)
+contra `ditupy.concat.concatenate_files` (copia en el kernel, lotes de
+descriptores y salida preasignada).
+
+Genera conjuntos sintéticos de N segmentos que suman `--total-mb`. Antes de
+cada corrida se descarta la caché de páginas de los archivos
+(posix_fadvise DONTNEED) para no medir sólo memoria.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_concat [--files 1000 10000] [--total-mb 2048]
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+from ditupy.concat import concatenate_files
+
+
+def legacy_concatenate(files: List[Path], output_path: Path):
+    with open(output_path, "wb") as outfile:
+        for f in files:
+            with open(f, "rb") as readfile:
+                shutil.copyfileobj(readfile, outfile)
+
+
+def make_segments(directory: Path, count: int, total_bytes: int) -> List[Path]:
+    directory.mkdir(parents=True, exist_ok=True)
+    size = total_bytes // count
+    block = os.urandom(size)
+    files = []
+    for i in range(count):
+        path = directory / f"segment_{i}.m4s"
+        path.write_bytes(block)
+        files.append(path)
+    os.sync()
+    return files
+
+
+def drop_cache(paths: List[Path]):
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for path in paths:
+        if not path.exists():
+            continue
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def run(fn: Callable, files: List[Path], output: Path, repeat: int):
+    best_wall, best_cpu = float("inf"), float("inf")
+    for _ in range(repeat):
+        output.unlink(missing_ok=True)
+        os.sync()
+        drop_cache(files)
+        cpu0, wall0 = time.process_time(), time.perf_counter()
+        fn(files, output)
+        fd = os.open(output, os.O_RDONLY)
+        os.fsync(fd)
+        os.close(fd)
+        best_wall = min(best_wall, time.perf_counter() - wall0)
+        best_cpu = min(best_cpu, time.process_time() - cpu0)
+    return best_wall, best_cpu
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--total-mb", type=int, default=2048)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--dir", default=None, help="Directorio de trabajo (mismo FS).")
+    args = parser.parse_args()
+
+    base = Path(tempfile.mkdtemp(prefix="bench_concat_", dir=args.dir))
+    total = args.total_mb * 1024 * 1024
+    engines = [
+        ("copyfileobj", legacy_concatenate),
+        ("kernel", lambda files, out: concatenate_files(files, out)),
+    ]
+    try:
+        header = f"{'archivos':>8} {'método':>12} {'seg':>8} {'CPU s':>7} {'MB/s':>8}"
+        print(header)
+        print("-" * len(header))
+        for count in args.files:
+            files = make_segments(base / f"set_{count}", count, total)
+            size_mb = sum(f.stat().st_size for f in files) / 1024 / 1024
+            for name, fn in engines:
+                wall, cpu = run(fn, files, base / "out.mp4", args.repeat)
+                print(
+                    f"{count:>8} {name:>12} {wall:>8.2f} {cpu:>7.2f} "
+                    f"{size_mb / wall:>8.0f}"
+                )
+            method = concatenate_files(files[:1], base / "probe.mp4")[1]
+            print(f"{'':>8} (motor del kernel: {method})")
+            shutil.rmtree(base / f"set_{count}")
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
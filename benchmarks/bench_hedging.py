@@ -0,0 +1,211 @@
+"""
+Latencia de cola por segmento con y sin peticiones cubiertas (`HedgePolicy`):
+sin cobertura, con la copia al mismo host y con la copia a una BaseURL
+alternativa.
+
+Dos orígenes HTTP locales sirven segmentos de tamaño fijo con una latencia
+base y, con probabilidad `--straggler`, una petición que se queda colgada
+`--stall` segundos; con `--trickle` el rezagado no se cuelga sino que envía
+el cuerpo de a poco durante esos segundos. Los segmentos se piden en lotes de `--batch` (como un
+ciclo live o un `download_batch`), así que cada rezagado frena su lote.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_hedging [--segments 1000] [--straggler 0.03] [--stall 2] [--trickle]
+"""
+
+import argparse
+import random
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import List, Optional
+
+from benchmarks.bench_recording_host import media_fragment
+from ditupy.dash_model import ManifestModel, RepresentationModel
+from ditupy.services.downloader import SegmentDownloader
+from ditupy.services.hedging import HedgePolicy
+
+MPD_TEMPLATE = (
+    '<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="static" '
+    'mediaPresentationDuration="PT1H">'
+    "<BaseURL>{primary}/</BaseURL><BaseURL>{mirror}/</BaseURL>"
+    '<Period id="p1"><AdaptationSet mimeType="video/mp4">'
+    '<Representation id="v" bandwidth="4000000"><SegmentTemplate timescale="1000" '
+    'duration="2000" startNumber="1" media="v_$Number$.m4s"/>'
+    "</Representation></AdaptationSet></Period></MPD>"
+)
+
+
+def start_origin(
+    body: bytes,
+    latency: float,
+    straggler: float,
+    stall: float,
+    seed: int,
+    trickle: bool = False,
+) -> ThreadingHTTPServer:
+    """
+    Origen que sirve `body` tras `latency` s (x0.5-1.5), o tarda `stall` s si
+    le toca rezagarse: esperando antes de responder o, con `trickle`,
+    enviando el cuerpo en 16 trozos espaciados.
+    """
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            with lock:
+                slow = rng.random() < straggler
+                delay = stall if slow else latency * rng.uniform(0.5, 1.5)
+            pieces = 16 if slow and trickle else 1
+            if pieces == 1:
+                time.sleep(delay)
+            try:
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                step = -(-len(body) // pieces)
+                for start in range(0, len(body), step):
+                    if pieces > 1:
+                        time.sleep(delay / pieces)
+                    self.wfile.write(body[start : start + step])
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                # La copia perdedora ya cerró la conexión.
+                pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    # Un intento abandonado corta su conexión: no es un error del origen.
+    server.handle_error = lambda request, address: None  # type: ignore
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class TimedDownloader(SegmentDownloader):
+    """SegmentDownloader que anota cuánto tarda cada `download_file`."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies: List[float] = []
+        self._lock = threading.Lock()
+
+    def download_file(self, *args, **kwargs) -> bool:
+        started = time.perf_counter()
+        try:
+            return super().download_file(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.latencies.append(time.perf_counter() - started)
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run(
+    rep: RepresentationModel,
+    segments: int,
+    batch: int,
+    workers: int,
+    hedge: Optional[HedgePolicy],
+    use_mirror: bool,
+    base: Path,
+):
+    work = Path(tempfile.mkdtemp(dir=base))
+    downloader = TimedDownloader(work, max_workers=workers, hedge=hedge)
+    all_segments = list(rep.iter_segments(0, segments * 2))
+    started = time.perf_counter()
+    for first in range(0, len(all_segments), batch):
+        downloader.download_segments(
+            all_segments[first : first + batch],
+            "video",
+            rep=rep if use_mirror else None,
+        )
+    total = time.perf_counter() - started
+    missing = sum(
+        not downloader.segment_path(s, "video").exists() for s in all_segments
+    )
+    shutil.rmtree(work, ignore_errors=True)
+    return downloader.latencies, total, missing
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--segments", type=int, default=1000)
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--size-kb", type=int, default=256)
+    parser.add_argument("--latency", type=float, default=0.03)
+    parser.add_argument("--straggler", type=float, default=0.03)
+    parser.add_argument("--stall", type=float, default=2.0)
+    parser.add_argument("--budget", type=float, default=0.05)
+    parser.add_argument(
+        "--trickle", action="store_true", help="Rezagados lentos pero constantes"
+    )
+    args = parser.parse_args()
+
+    body = media_fragment(args.size_kb * 1024)
+    origins = [
+        start_origin(body, args.latency, args.straggler, args.stall, seed, args.trickle)
+        for seed in (1, 2)
+    ]
+    primary, mirror = (f"http://127.0.0.1:{o.server_address[1]}" for o in origins)
+    manifest = ManifestModel.from_xml(
+        MPD_TEMPLATE.format(primary=primary, mirror=mirror)
+    )
+    rep = manifest.periods[0].adaptation_sets[0].representations[0]
+
+    print(
+        f"{args.segments} segmentos de {args.size_kb} KB, lotes de {args.batch}, "
+        f"{args.workers} hilos; rezagados {args.straggler:.0%} de {args.stall:.1f}s"
+        f"{' (goteando)' if args.trickle else ''}"
+    )
+    header = (
+        f"{'variante':>22} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} "
+        f"{'max ms':>7} {'total s':>8} {'copias':>7} {'ganadas':>8} {'faltan':>7}"
+    )
+    print(header)
+    print("-" * len(header))
+    base = Path(tempfile.mkdtemp(prefix="bench_hedging_"))
+    try:
+        variants = [
+            ("sin cobertura", None, False),
+            ("cobertura, mismo host", HedgePolicy(budget=args.budget), False),
+            ("cobertura, alternativa", HedgePolicy(budget=args.budget), True),
+        ]
+        for name, hedge, use_mirror in variants:
+            latencies, total, missing = run(
+                rep,
+                args.segments,
+                args.batch,
+                args.workers,
+                hedge,
+                use_mirror,
+                base,
+            )
+            ms = [v * 1000 for v in latencies]
+            copies = f"{hedge.stats.ratio:.1%}" if hedge else "-"
+            wins = str(hedge.stats.hedge_wins) if hedge else "-"
+            print(
+                f"{name:>22} {percentile(ms, 0.5):>7.0f} {percentile(ms, 0.95):>7.0f} "
+                f"{percentile(ms, 0.99):>7.0f} {max(ms):>7.0f} {total:>8.2f} "
+                f"{copies:>7} {wins:>8} {missing:>7}"
+            )
+    finally:
+        for origin in origins:
+            origin.shutdown()
+        shutil.rmtree(base, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Transporte de segmentos: el pool HTTP/1.1 de `requests` contra el
+transporte HTTP/2 opcional (`new_session(http2=True)`, requiere
+`httpx[http2]`), y la caída a HTTP/1.1 de ese transporte cuando el servidor
+no negocia h2.
+
+El origen es un servidor TLS local (certificado autofirmado generado con el
+binario `openssl`) que habla HTTP/2 con `h2` o HTTP/1.1 según lo negociado
+por ALPN, y cuenta los handshakes TLS. Corre en un proceso aparte: el CPU
+medido es sólo el del cliente.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_http2 [--segments 800] [--workers 16] [--size-kb 512]
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import shutil
+import ssl
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from benchmarks.bench_recording_host import media_fragment
+from ditupy.services.downloader import SegmentDownloader, new_session
+from ditupy.services.http2 import HTTP2_AVAILABLE
+
+
+class _Http1:
+    """HTTP/1.1 mínimo con keep-alive: GET de cualquier ruta devuelve `body`."""
+
+    def __init__(self, transport, body: bytes):
+        self.transport = transport
+        self.body = body
+        self.buffer = b""
+
+    def data_received(self, data: bytes):
+        self.buffer += data
+        while b"\r\n\r\n" in self.buffer:
+            _, self.buffer = self.buffer.split(b"\r\n\r\n", 1)
+            self.transport.write(
+                b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n" % len(self.body)
+                + self.body
+            )
+
+
+class _Http2:
+    """HTTP/2 con `h2`: cada stream recibe `body` respetando el control de flujo."""
+
+    def __init__(self, transport, body: bytes):
+        import h2.config
+        import h2.connection
+
+        self.transport = transport
+        self.body = body
+        self.pending: Dict[int, memoryview] = {}
+        self.conn = h2.connection.H2Connection(
+            h2.config.H2Configuration(client_side=False)
+        )
+        self.conn.initiate_connection()
+        self.transport.write(self.conn.data_to_send())
+
+    def data_received(self, data: bytes):
+        import h2.events
+
+        for event in self.conn.receive_data(data):
+            if isinstance(event, h2.events.RequestReceived):
+                self.conn.send_headers(
+                    event.stream_id,
+                    [(":status", "200"), ("content-length", str(len(self.body)))],
+                )
+                self.pending[event.stream_id] = memoryview(self.body)
+            elif isinstance(event, h2.events.StreamReset):
+                self.pending.pop(event.stream_id, None)
+        self.flush()
+
+    def flush(self):
+        for stream_id in list(self.pending):
+            data = self.pending[stream_id]
+            while data:
+                window = min(
+                    self.conn.local_flow_control_window(stream_id),
+                    self.conn.max_outbound_frame_size,
+                )
+                if window <= 0:
+                    break
+                self.conn.send_data(stream_id, data[:window].tobytes())
+                data = data[window:]
+            if data:
+                self.pending[stream_id] = data
+            else:
+                self.conn.end_stream(stream_id)
+                del self.pending[stream_id]
+        self.transport.write(self.conn.data_to_send())
+
+
+class _Origin(asyncio.Protocol):
+    def __init__(self, body: bytes, handshakes):
+        self.body = body
+        self.handshakes = handshakes
+        self.handler = None
+
+    def connection_made(self, transport):
+        # Con TLS, asyncio llama a connection_made después del handshake.
+        with self.handshakes.get_lock():
+            self.handshakes.value += 1
+        alpn = transport.get_extra_info("ssl_object").selected_alpn_protocol()
+        handler = _Http2 if alpn == "h2" else _Http1
+        self.handler = handler(transport, self.body)
+
+    def data_received(self, data: bytes):
+        try:
+            self.handler.data_received(data)
+        except Exception:
+            # Un stream cancelado a mitad (RST_STREAM) puede dejar eventos sueltos.
+            pass
+
+
+def serve(port, cert: str, key: str, alpn: List[str], size: int, handshakes):
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert, key)
+    context.set_alpn_protocols(alpn)
+    body = media_fragment(size)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        server = await loop.create_server(
+            lambda: _Origin(body, handshakes), "127.0.0.1", 0, ssl=context
+        )
+        port.value = server.sockets[0].getsockname()[1]
+        await server.serve_forever()
+
+    asyncio.run(main())
+
+
+def make_certificate(directory: Path):
+    cert, key = directory / "cert.pem", directory / "key.pem"
+    subprocess.run(
+        [
+            "openssl",
+            "req",
+            "-x509",
+            "-newkey",
+            "rsa:2048",
+            "-nodes",
+            "-days",
+            "1",
+            "-subj",
+            "/CN=127.0.0.1",
+            "-addext",
+            "subjectAltName=IP:127.0.0.1",
+            "-keyout",
+            str(key),
+            "-out",
+            str(cert),
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return str(cert), str(key)
+
+
+def start_origin(cert: str, key: str, alpn: List[str], size: int):
+    port = multiprocessing.Value("i", 0)
+    handshakes = multiprocessing.Value("i", 0)
+    process = multiprocessing.Process(
+        target=serve, args=(port, cert, key, alpn, size, handshakes), daemon=True
+    )
+    process.start()
+    while not port.value:
+        time.sleep(0.05)
+    return process, f"https://127.0.0.1:{port.value}", handshakes
+
+
+def run(origin: str, cert: str, http2: bool, args, base: Path) -> dict:
+    session = new_session(args.workers, http2=http2, max_streams=args.streams)
+    # Sin trust_env, REQUESTS_CA_BUNDLE no pisa el certificado autofirmado.
+    session.trust_env = False
+    session.verify = cert
+    work = Path(tempfile.mkdtemp(dir=base))
+    downloader = SegmentDownloader(work, max_workers=args.workers, session=session)
+    urls = [f"{origin}/seg_{i}.m4s" for i in range(args.segments)]
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    downloader.download_batch(urls, "video")
+    wall = time.perf_counter() - wall0
+    cpu = time.process_time() - cpu0
+    adapter = session.get_adapter(origin)
+    protocol = next(iter(getattr(adapter, "protocols", {}).values()), "HTTP/1.1")
+    ok = len(list((work / "video").glob("*.m4s")))
+    session.close()
+    shutil.rmtree(work, ignore_errors=True)
+    return {"wall": wall, "cpu": cpu, "protocol": protocol, "ok": ok}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--segments", type=int, default=800)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--streams", type=int, default=100)
+    parser.add_argument("--size-kb", type=int, default=512)
+    args = parser.parse_args()
+
+    if not HTTP2_AVAILABLE:
+        print("Falta httpx[http2]: pip install 'httpx[http2]'")
+        return
+    if not shutil.which("openssl"):
+        print("Falta el binario openssl para generar el certificado.")
+        return
+
+    logging.basicConfig(level=logging.WARNING)
+    base = Path(tempfile.mkdtemp(prefix="bench_http2_"))
+    origins = []
+    try:
+        cert, key = make_certificate(base)
+        size = args.size_kb * 1024
+        both = start_origin(cert, key, ["h2", "http/1.1"], size)
+        only_h1 = start_origin(cert, key, ["http/1.1"], size)
+        origins = [both[0], only_h1[0]]
+        print(
+            f"{args.segments} segmentos de {args.size_kb} KB, {args.workers} hilos, "
+            f"hasta {args.streams} streams\n"
+        )
+        header = (
+            f"{'variante':>22} {'protocolo':>9} {'handshakes':>10} {'seg':>6} "
+            f"{'CPU s':>6} {'MB/s':>6} {'ok':>5}"
+        )
+        print(header)
+        print("-" * len(header))
+        variants = [
+            ("requests HTTP/1.1", both, False),
+            ("http2", both, True),
+            ("http2 sin h2 (ALPN)", only_h1, True),
+        ]
+        for name, (_, origin, handshakes), http2 in variants:
+            handshakes.value = 0
+            r = run(origin, cert, http2, args, base)
+            rate = args.segments * args.size_kb / 1024 / r["wall"]
+            print(
+                f"{name:>22} {r['protocol']:>9} {handshakes.value:>10} "
+                f"{r['wall']:>6.2f} {r['cpu']:>6.2f} {rate:>6.0f} {r['ok']:>5}"
+            )
+    finally:
+        for process in origins:
+            process.terminate()
+        shutil.rmtree(base, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
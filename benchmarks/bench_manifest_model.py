@@ -0,0 +1,196 @@
+"""
+Compara el recorrido con los wrappers XML de `ditupy.dash` contra el modelo
+pre-resuelto de `ditupy.dash_model` sobre un MPD sintético grande, con el
+SegmentTimeline repetido en cada Representation (peor caso para compilar) o
+una sola vez en el AdaptationSet (lo habitual en empaquetadores).
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_manifest_model [--segments 3000] [--reps 36]
+"""
+
+import argparse
+import time
+from typing import Callable, Tuple
+
+from ditupy.dash import DashManifest
+from ditupy.dash_model import ManifestModel
+
+MPD_HEADER = (
+    '<?xml version="1.0" encoding="utf-8"?>\n'
+    '<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" xmlns:cenc="urn:mpeg:cenc:2013" '
+    'type="static" mediaPresentationDuration="PT{duration}S">\n'
+    "<BaseURL>https://cdn.example.com/vod/</BaseURL>\n"
+    '<Period id="1" start="PT0S">\n'
+)
+
+
+def build_mpd(
+    segments: int, video_reps: int, audio_reps: int, shared: bool = False
+) -> Tuple[str, int]:
+    """
+    MPD con un <S> explícito por segmento (sin r) y muchas Representations;
+    con `shared` el timeline va en el AdaptationSet. Retorna (xml, fin del
+    timeline en timescale).
+    """
+    timeline = []
+    t = 0
+    for i in range(segments):
+        d = 96000 if i % 2 else 95000
+        timeline.append(f'<S t="{t}" d="{d}"/>')
+        t += d
+    timeline_xml = "<SegmentTimeline>" + "".join(timeline) + "</SegmentTimeline>"
+    duration = t / 30000
+
+    def template(kind: str) -> str:
+        return (
+            f'<SegmentTemplate timescale="30000" startNumber="1" '
+            f'media="{kind}_$RepresentationID$_$Number%05d$.mp4" '
+            f'initialization="{kind}_$RepresentationID$_init.mp4">'
+            f"{timeline_xml}</SegmentTemplate>"
+        )
+
+    def representation(kind: str, rep_id: int, bandwidth: int, extra: str) -> str:
+        return (
+            f'<Representation id="{rep_id}" bandwidth="{bandwidth}" {extra}>'
+            '<ContentProtection schemeIdUri="urn:uuid:edef8ba9-79d6-4ace-a3c8-27dcd51d21ed">'
+            "<cenc:pssh>AAAA</cenc:pssh></ContentProtection>"
+            f"{'' if shared else template(kind)}</Representation>"
+        )
+
+    parts = [MPD_HEADER.format(duration=duration)]
+    parts.append('<AdaptationSet mimeType="video/mp4">')
+    if shared:
+        parts.append(template("video"))
+    for i in range(video_reps):
+        parts.append(
+            representation(
+                "video", i + 1, 300000 + i * 150000, f'width="1280" height="{240 + i}"'
+            )
+        )
+    parts.append("</AdaptationSet>")
+    parts.append('<AdaptationSet mimeType="audio/mp4" lang="es">')
+    if shared:
+        parts.append(template("audio"))
+    for i in range(audio_reps):
+        parts.append(representation("audio", 1000 + i, 64000 + i * 32000, ""))
+    parts.append("</AdaptationSet></Period></MPD>")
+    return "".join(parts), t
+
+
+def run_wrappers(xml: str, passes: int = 1) -> int:
+    manifest = DashManifest(xml, source_url="https://cdn.example.com/vod/index.mpd")
+    total = 0
+    for _ in range(passes):
+        period = manifest.get_content_period()
+        for aset in period.get_adaptation_sets():
+            aset.get_best_representation()
+            for rep in aset.get_representations():
+                _ = rep.initialization_url
+                total += len(rep.get_segments())
+    return total
+
+
+def run_model(xml: str, passes: int = 1) -> int:
+    model = ManifestModel.from_xml(
+        xml, source_url="https://cdn.example.com/vod/index.mpd"
+    )
+    total = 0
+    for _ in range(passes):
+        period = model.get_content_period()
+        for aset in period.get_adaptation_sets():
+            aset.get_best_representation()
+            for rep in aset.representations:
+                _ = rep.initialization_url
+                total += len(rep.get_segments())
+    return total
+
+
+def live_cycle(period, passes: int, tail_from: int) -> int:
+    """
+    Patrón de cada poll del grabador live sobre un mismo MPD: elegir las
+    pistas, consultar `is_open_ended` y generar sólo los segmentos nuevos.
+    """
+    total = 0
+    for _ in range(passes):
+        for kind in ("video", "audio"):
+            rep = period.get_adaptation_sets(type_filter=kind)[
+                0
+            ].get_best_representation()
+            _ = rep.initialization_url
+            if not rep.is_open_ended:
+                total += sum(1 for _ in rep.iter_segments(from_time=tail_from))
+    return total
+
+
+def run_live_cycle_wrappers(xml: str, passes: int, tail_from: int) -> int:
+    manifest = DashManifest(xml, source_url="https://cdn.example.com/vod/index.mpd")
+    return live_cycle(manifest.get_content_period(), passes, tail_from)
+
+
+def run_live_cycle_model(xml: str, passes: int, tail_from: int) -> int:
+    model = ManifestModel.from_xml(
+        xml, source_url="https://cdn.example.com/vod/index.mpd"
+    )
+    return live_cycle(model.get_content_period(), passes, tail_from)
+
+
+def best_of(fn: Callable[..., int], rounds: int, *args) -> float:
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--segments", type=int, default=3000)
+    parser.add_argument("--reps", type=int, default=36, help="Representations de video")
+    parser.add_argument("--audio-reps", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument(
+        "--passes", type=int, default=5, help="Recorridos sobre el mismo manifiesto"
+    )
+    parser.add_argument(
+        "--polls", type=int, default=30, help="Polls live sobre el mismo manifiesto"
+    )
+    args = parser.parse_args()
+
+    for shared in (False, True):
+        xml, end = build_mpd(args.segments, args.reps, args.audio_reps, shared)
+        assert run_wrappers(xml) == run_model(xml)
+        tail_from = end - 3 * 96000
+
+        where = "en el AdaptationSet" if shared else "en cada Representation"
+        print(
+            f"\nMPD sintético: {len(xml) / 1e6:.1f} MB, {args.reps + args.audio_reps} "
+            f"representations x {args.segments} <S>, timeline {where}"
+        )
+        scenarios = [
+            ("parse + todas las reps, 1 recorrido", run_wrappers, run_model, (1,)),
+            (
+                f"parse + todas las reps, {args.passes} recorridos",
+                run_wrappers,
+                run_model,
+                (args.passes,),
+            ),
+            (
+                f"ciclo live (mejor video/audio), {args.polls} polls",
+                run_live_cycle_wrappers,
+                run_live_cycle_model,
+                (args.polls, tail_from),
+            ),
+        ]
+        print(f"{'escenario':<48} {'wrappers':>10} {'modelo':>10} {'x':>6}")
+        for name, wrappers_fn, model_fn, extra in scenarios:
+            wrappers = best_of(wrappers_fn, args.rounds, xml, *extra)
+            model = best_of(model_fn, args.rounds, xml, *extra)
+            print(
+                f"{name:<48} {wrappers * 1000:8.1f}ms {model * 1000:8.1f}ms "
+                f"{wrappers / model:5.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Memoria de `SegmentDownloader.download_batch` según la cantidad de segmentos
+y el presupuesto de memoria (`MemoryBudget`): con envío perezoso y bytes en
+vuelo acotados, el pico de RSS debería depender del presupuesto y no del
+largo del trabajo.
+
+El origen es un servidor HTTP local con segmentos de `--size-kb`. Cada
+escenario corre en un subproceso para medir su memoria máxima por separado.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_pipeline [--segments 200 800 3200] [--budgets-mb 16 512]
+"""
+
+import argparse
+import json
+import logging
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from benchmarks.bench_recording_host import media_fragment
+
+
+def start_origin(size: int) -> ThreadingHTTPServer:
+    """Origen que responde cualquier ruta con un segmento de `size` bytes."""
+    body = media_fragment(size)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_child(args):
+    """Descarga `args.n` segmentos y muestra las métricas en JSON por stdout."""
+    from ditupy.services.downloader import MemoryBudget, SegmentDownloader
+
+    logging.basicConfig(level=logging.CRITICAL)
+    output = Path(tempfile.mkdtemp(prefix="bench_pipeline_"))
+    try:
+        budget = MemoryBudget(args.budget_mb * 1024 * 1024)
+        downloader = SegmentDownloader(
+            output, max_workers=args.workers, memory_budget=budget
+        )
+        urls = (f"{args.origin}/seg_{i}.m4s" for i in range(args.n))
+        wall0 = time.perf_counter()
+        downloader.download_batch(urls, "video")
+        wall = time.perf_counter() - wall0
+        print(
+            json.dumps(
+                {
+                    "wall": wall,
+                    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                    "peak_mb": budget.peak / 1024 / 1024,
+                    "segments": len(list((output / "video").glob("*.m4s"))),
+                }
+            )
+        )
+    finally:
+        shutil.rmtree(output, ignore_errors=True)
+
+
+def run_scenario(origin: str, n: int, budget_mb: int, args) -> dict:
+    cmd = [
+        sys.executable,
+        "-m",
+        "benchmarks.bench_pipeline",
+        "--child",
+        "--n",
+        str(n),
+        "--budget-mb",
+        str(budget_mb),
+        "--workers",
+        str(args.workers),
+        "--origin",
+        origin,
+    ]
+    out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--segments", type=int, nargs="+", default=[200, 800, 3200])
+    parser.add_argument("--budgets-mb", type=int, nargs="+", default=[16, 512])
+    parser.add_argument("--size-kb", type=int, default=1024)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--child", action="store_true")
+    parser.add_argument("--n", type=int, default=0)
+    parser.add_argument("--budget-mb", type=int, default=0)
+    parser.add_argument("--origin", default="")
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    server = start_origin(args.size_kb * 1024)
+    origin = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"Segmentos de {args.size_kb} KB, {args.workers} hilos ({origin})\n")
+    header = (
+        f"{'segmentos':>9} {'presupuesto':>11} {'en vuelo MB':>11} "
+        f"{'RSS MB':>7} {'seg':>6} {'MB/s':>7} {'ok':>6}"
+    )
+    print(header)
+    print("-" * len(header))
+    for budget_mb in args.budgets_mb:
+        for n in args.segments:
+            r = run_scenario(origin, n, budget_mb, args)
+            rate = n * args.size_kb / 1024 / r["wall"]
+            print(
+                f"{n:>9} {budget_mb:>9}MB {r['peak_mb']:>11.1f} {r['rss_mb']:>7.1f} "
+                f"{r['wall']:>6.2f} {rate:>7.0f} {r['segments']:>6}"
+            )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Recursos usados al grabar 1, 10 y 50 canales a la vez: un hilo por
+`LiveRecorder` (cada uno con su sesión y su pool) contra `RecordingHost`
+(planificador único, sesión y pool compartidos).
+
+El origen live es un servidor HTTP local que publica N canales con
+SegmentTemplate por @duration. Cada escenario corre en un subproceso para
+medir su CPU, memoria máxima e hilos sin contar el servidor.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_recording_host [--channels 1 10 50] [--seconds 12]
+"""
+
+import argparse
+import json
+import logging
+import resource
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+MPD_TEMPLATE = (
+    '<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="dynamic" '
+    'availabilityStartTime="{ast}" minimumUpdatePeriod="PT2S" '
+    'timeShiftBufferDepth="PT10S" maxSegmentDuration="PT1S">'
+    '<Period id="p1" start="PT0S">'
+    '<AdaptationSet mimeType="video/mp4"><Representation id="v" bandwidth="{vbw}" '
+    'height="720"><SegmentTemplate timescale="1000" duration="1000" startNumber="1" '
+    'media="v_$Number$.m4s" initialization="v_init.mp4"/></Representation>'
+    "</AdaptationSet>"
+    '<AdaptationSet mimeType="audio/mp4"><Representation id="a" bandwidth="{abw}">'
+    '<SegmentTemplate timescale="1000" duration="1000" startNumber="1" '
+    'media="a_$Number$.m4s" initialization="a_init.mp4"/></Representation>'
+    "</AdaptationSet></Period></MPD>"
+)
+
+
+def media_fragment(size: int) -> bytes:
+    """moof + mdat mínimos de ~`size` bytes: pasan la validación del descargador."""
+
+    def box(kind: bytes, payload: bytes) -> bytes:
+        return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+    moof = box(
+        b"moof",
+        box(b"mfhd", struct.pack(">II", 0, 1))
+        + box(b"traf", box(b"tfhd", struct.pack(">II", 0x020000, 1))),
+    )
+    return moof + box(b"mdat", b"\0" * max(0, size - len(moof) - 8))
+
+
+def start_origin(video_bytes: int, audio_bytes: int) -> ThreadingHTTPServer:
+    """Origen con /chN/live.mpd para cualquier N y segmentos de tamaño fijo."""
+    ast = datetime.fromtimestamp(time.time() - 30, timezone.utc).strftime(
+        "%Y-%m-%dT%H:%M:%SZ"
+    )
+    mpd = MPD_TEMPLATE.format(
+        ast=ast, vbw=video_bytes * 8, abw=audio_bytes * 8
+    ).encode()
+    video, audio = media_fragment(video_bytes), media_fragment(audio_bytes)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.endswith(".mpd"):
+                body = mpd
+            elif "/v_" in self.path:
+                body = video
+            else:
+                body = audio
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_schedule(index: int, seconds: float):
+    from ditupy.schemas.simple_schedule import SimpleSchedule
+
+    now = int(time.time() * 1000)
+    return SimpleSchedule(
+        contentId=index,
+        title=f"Canal {index}",
+        shortDescription="",
+        airingStartTime=now,
+        airingEndTime=now + int(seconds * 1000),
+        duration=int(seconds),
+        episodeId=index,
+        episodeTitle="",
+        episodeNumber=1,
+        season=1,
+        channel_info={"channelId": index, "channelName": f"c{index}"},
+    )
+
+
+def run_child(args):
+    """Ejecuta un escenario y muestra sus métricas en JSON por stdout."""
+    from ditupy.services.live_recorder import LiveRecorder
+    from ditupy.services.recording_host import RecordingHost
+
+    logging.basicConfig(level=logging.CRITICAL)
+    output = Path(tempfile.mkdtemp(prefix="bench_host_"))
+    peak_threads = [threading.active_count()]
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(0.1):
+            peak_threads[0] = max(peak_threads[0], threading.active_count())
+
+    threading.Thread(target=sample, daemon=True).start()
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+
+    urls = [f"{args.origin}/ch{i}/live.mpd" for i in range(args.n)]
+    options = dict(pre_roll=0, post_roll=0)
+    if args.mode == "host":
+        host = RecordingHost(
+            output,
+            max_concurrency=args.concurrency,
+            max_bandwidth=args.max_bandwidth,
+        )
+        for i, url in enumerate(urls):
+            host.add(url, make_schedule(i, args.seconds), **options)
+        host.run()
+    else:
+        threads = []
+        for i, url in enumerate(urls):
+            recorder = LiveRecorder(
+                url, make_schedule(i, args.seconds), output, **options
+            )
+            thread = threading.Thread(target=recorder.record)
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+
+    done.set()
+    files = [p for p in output.rglob("*.m4s")]
+    print(
+        json.dumps(
+            {
+                "wall": time.perf_counter() - wall0,
+                "cpu": time.process_time() - cpu0,
+                "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                "threads": peak_threads[0],
+                "segments": len(files),
+                "mbytes": sum(p.stat().st_size for p in files) / 1024 / 1024,
+            }
+        )
+    )
+
+
+def run_scenario(origin: str, mode: str, n: int, args) -> dict:
+    cmd = [
+        sys.executable,
+        "-m",
+        "benchmarks.bench_recording_host",
+        "--child",
+        "--mode",
+        mode,
+        "--n",
+        str(n),
+        "--seconds",
+        str(args.seconds),
+        "--origin",
+        origin,
+        "--concurrency",
+        str(args.concurrency),
+    ]
+    if args.max_bandwidth:
+        cmd += ["--max-bandwidth", str(args.max_bandwidth)]
+    out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--channels", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--seconds", type=float, default=12.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--max-bandwidth", type=float, default=None)
+    parser.add_argument("--video-bytes", type=int, default=64 * 1024)
+    parser.add_argument("--audio-bytes", type=int, default=8 * 1024)
+    parser.add_argument("--child", action="store_true")
+    parser.add_argument("--mode", default="host")
+    parser.add_argument("--n", type=int, default=1)
+    parser.add_argument("--origin", default="")
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    server = start_origin(args.video_bytes, args.audio_bytes)
+    origin = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"Grabaciones de {args.seconds:.0f}s contra origen local ({origin})\n")
+    header = f"{'canales':>7} {'modo':>8} {'hilos':>6} {'CPU s':>7} {'RSS MB':>7} {'segs':>6} {'MB':>7}"
+    print(header)
+    print("-" * len(header))
+    for n in args.channels:
+        for mode in ("threads", "host"):
+            r = run_scenario(origin, mode, n, args)
+            print(
+                f"{n:>7} {mode:>8} {r['threads']:>6} {r['cpu']:>7.2f} "
+                f"{r['rss_mb']:>7.1f} {r['segments']:>6} {r['mbytes']:>7.1f}"
+            )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
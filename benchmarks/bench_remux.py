@@ -0,0 +1,281 @@
+"""
+Muxing final sin recodificar: `ditupy.remux` (en proceso, fragmentado o con
+el moov al principio) contra `ffmpeg -c copy -movflags +faststart`, si está
+instalado.
+
+Genera pistas fMP4 sintéticas de video y audio (init + segmentos `moof` +
+`mdat`) que suman `--total-mb` y mide tiempo, CPU y pico de memoria
+residente de cada variante. La salida del remuxer se verifica con
+`ditupy.isobmff.inspect_file`.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_remux [--total-mb 2048] [--segments 1800]
+"""
+
+import argparse
+import os
+import resource
+import shutil
+import struct
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+from ditupy.isobmff import inspect_file
+from ditupy.remux import remux
+
+VIDEO_TIMESCALE = 90000
+AUDIO_TIMESCALE = 48000
+SEGMENT_SECONDS = 2
+# Configuración real de H.264 (High, 1280x720) y AAC-LC (48 kHz, estéreo):
+# sin ella FFmpeg no puede leer los parámetros de las pistas y no hay comparación.
+_AVCC = bytes.fromhex(
+    "0164001fffe1001a6764001facd9405005bb011000000300100000030320f18319"
+    "6001000668ebe3cb22c0fdf8f800"
+)
+_ESDS = bytes.fromhex(
+    "0380808025000200048080801740150000000001f4000001f20f0580808005119056e5"
+    "00068080800102"
+)
+
+
+def box(kind: str, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), kind.encode()) + payload
+
+
+def full_box(kind: str, version: int, flags: int, payload: bytes) -> bytes:
+    return box(kind, struct.pack(">I", (version << 24) | flags) + payload)
+
+
+def init_segment(track_id: int, handler: str, timescale: int) -> bytes:
+    matrix = struct.pack(">9I", 0x10000, 0, 0, 0, 0x10000, 0, 0, 0, 0x40000000)
+    mvhd = full_box(
+        "mvhd",
+        0,
+        0,
+        struct.pack(">IIIIIH10x", 0, 0, 1000, 0, 0x10000, 0x100)
+        + matrix
+        + b"\0" * 24
+        + struct.pack(">I", track_id + 1),
+    )
+    tkhd = full_box(
+        "tkhd",
+        0,
+        3,
+        struct.pack(">IIII", 0, 0, track_id, 0)
+        + struct.pack(">I8xhhh2x", 0, 0, 0, 0x100 if handler == "soun" else 0)
+        + matrix
+        + struct.pack(">II", 1280 << 16, 720 << 16),
+    )
+    mdhd = full_box("mdhd", 0, 0, struct.pack(">IIIIHH", 0, 0, timescale, 0, 0x55C4, 0))
+    hdlr = full_box(
+        "hdlr", 0, 0, b"\0" * 4 + handler.encode() + b"\0" * 12 + b"bench\0"
+    )
+    if handler == "vide":
+        header = full_box("vmhd", 0, 1, b"\0" * 8)
+        entry = box(
+            "avc1",
+            b"\0" * 6
+            + struct.pack(
+                ">H16xHHII4xH32xHh", 1, 1280, 720, 0x480000, 0x480000, 1, 24, -1
+            )
+            + box("avcC", _AVCC),
+        )
+    else:
+        header = full_box("smhd", 0, 0, b"\0" * 4)
+        entry = box(
+            "mp4a",
+            b"\0" * 6
+            + struct.pack(">H8xHH4xI", 1, 2, 16, AUDIO_TIMESCALE << 16)
+            + full_box("esds", 0, 0, _ESDS),
+        )
+    dinf = box(
+        "dinf",
+        full_box("dref", 0, 0, struct.pack(">I", 1) + full_box("url ", 0, 1, b"")),
+    )
+    stbl = box(
+        "stbl",
+        full_box("stsd", 0, 0, struct.pack(">I", 1) + entry)
+        + full_box("stts", 0, 0, b"\0" * 4)
+        + full_box("stsc", 0, 0, b"\0" * 4)
+        + full_box("stsz", 0, 0, b"\0" * 8)
+        + full_box("stco", 0, 0, b"\0" * 4),
+    )
+    trak = box(
+        "trak", tkhd + box("mdia", mdhd + hdlr + box("minf", header + dinf + stbl))
+    )
+    trex = full_box("trex", 0, 0, struct.pack(">IIIII", track_id, 1, 0, 0, 0))
+    ftyp = box("ftyp", b"iso6" + struct.pack(">I", 0) + b"iso6dash")
+    return ftyp + box("moov", mvhd + trak + box("mvex", trex))
+
+
+def media_segment(
+    sequence: int,
+    track_id: int,
+    time: int,
+    durations: List[int],
+    sample_size: int,
+    video: bool,
+) -> bytes:
+    count = len(durations)
+    if video:
+        # GOP cerrado por segmento: primera muestra sync, resto no; B-frames vía cto.
+        flags = 0x1 | 0x4 | 0x100 | 0x200 | 0x800
+        samples = b"".join(
+            struct.pack(">III", d, sample_size, (i % 3) * d)
+            for i, d in enumerate(durations)
+        )
+        extra = struct.pack(">I", 0x02000000)
+        trun_body = lambda offset: struct.pack(">Ii", count, offset) + extra + samples
+    else:
+        flags = 0x1 | 0x100 | 0x200
+        samples = b"".join(struct.pack(">II", d, sample_size) for d in durations)
+        trun_body = lambda offset: struct.pack(">Ii", count, offset) + samples
+
+    def moof(offset: int) -> bytes:
+        traf = box(
+            "traf",
+            full_box("tfhd", 0, 0x20020, struct.pack(">II", track_id, 0x01010000))
+            + full_box("tfdt", 1, 0, struct.pack(">Q", time))
+            + full_box("trun", 0, flags, trun_body(offset)),
+        )
+        return box("moof", full_box("mfhd", 0, 0, struct.pack(">I", sequence)) + traf)
+
+    size = len(moof(0))
+    return moof(size + 8) + box("mdat", os.urandom(64) * (sample_size * count // 64))
+
+
+def make_track(
+    directory: Path, track_id: int, handler: str, segments: int, segment_bytes: int
+) -> List[Path]:
+    directory.mkdir(parents=True)
+    video = handler == "vide"
+    timescale = VIDEO_TIMESCALE if video else AUDIO_TIMESCALE
+    # 25 fps o cuadros AAC de 1024 muestras.
+    sample_duration = timescale // 25 if video else 1024
+    per_segment = SEGMENT_SECONDS * timescale // sample_duration
+    sample_size = max(64, (segment_bytes // per_segment) // 64 * 64)
+
+    files = [directory / "init.mp4"]
+    files[0].write_bytes(init_segment(track_id, handler, timescale))
+    for n in range(segments):
+        path = directory / f"segment_{n}.m4s"
+        path.write_bytes(
+            media_segment(
+                n + 1,
+                track_id,
+                n * per_segment * sample_duration,
+                [sample_duration] * per_segment,
+                sample_size,
+                video,
+            )
+        )
+        files.append(path)
+    return files
+
+
+def run_ffmpeg(video: List[Path], audio: List[Path], output: Path, scratch: Path):
+    inputs = []
+    for name, files in (("video", video), ("audio", audio)):
+        joined = scratch / f"{name}.mp4"
+        with open(joined, "wb") as out:
+            for f in files:
+                with open(f, "rb") as src:
+                    shutil.copyfileobj(src, out)
+        inputs += ["-i", str(joined)]
+    subprocess.run(
+        [
+            "ffmpeg",
+            "-y",
+            # La carga útil es aleatoria: el sondeo del decodificador H.264 se queja
+            # de cada muestra, pero la copia no decodifica nada.
+            "-v",
+            "fatal",
+            *inputs,
+            "-c",
+            "copy",
+            "-movflags",
+            "+faststart",
+            str(output),
+        ],
+        check=True,
+    )
+
+
+def measure(fn: Callable[[], None]):
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    fn()
+    wall = time.perf_counter() - wall0
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = (
+        time.process_time()
+        - cpu0
+        + (after.ru_utime - children.ru_utime)
+        + (after.ru_stime - children.ru_stime)
+    )
+    return wall, cpu
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--total-mb", type=int, default=2048)
+    parser.add_argument("--segments", type=int, default=1800)
+    parser.add_argument("--dir", default=None, help="Directorio de trabajo.")
+    args = parser.parse_args()
+
+    base = Path(tempfile.mkdtemp(prefix="bench_remux_", dir=args.dir))
+    try:
+        per_segment = args.total_mb * 1024 * 1024 // args.segments
+        video = make_track(
+            base / "video", 1, "vide", args.segments, per_segment * 9 // 10
+        )
+        audio = make_track(base / "audio", 1, "soun", args.segments, per_segment // 10)
+        size_mb = sum(f.stat().st_size for f in video + audio) / 1024 / 1024
+        expected = args.segments * SEGMENT_SECONDS
+        print(
+            f"Entrada: {len(video) + len(audio)} archivos, {size_mb:.0f} MB, {expected}s"
+        )
+
+        variants = [
+            (
+                "remux fragmentado",
+                lambda out: remux([video, audio], out, fragmented=True),
+            ),
+            ("remux faststart", lambda out: remux([video, audio], out)),
+        ]
+        if shutil.which("ffmpeg"):
+            variants.append(("ffmpeg", lambda out: run_ffmpeg(video, audio, out, base)))
+        else:
+            print(
+                "(ffmpeg no está instalado: sólo se mide el remuxer interno, "
+                "sin comparación con FFmpeg)"
+            )
+
+        header = f"{'variante':>18} {'seg':>7} {'CPU s':>7} {'MB/s':>7} {'duración':>9}"
+        print(header)
+        print("-" * len(header))
+        for name, fn in variants:
+            output = base / "out.mp4"
+            output.unlink(missing_ok=True)
+            os.sync()
+            wall, cpu = measure(lambda: fn(output))
+            info = inspect_file(output)
+            print(
+                f"{name:>18} {wall:>7.2f} {cpu:>7.2f} {size_mb / wall:>7.0f} "
+                f"{info.duration:>8.1f}s"
+            )
+            for gap in info.gaps():
+                print(f"{'':>18} hueco: {gap}")
+            (base / "video.mp4").unlink(missing_ok=True)
+            (base / "audio.mp4").unlink(missing_ok=True)
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"Pico de memoria del proceso: {rss:.0f} MB")
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Cierre de una grabación con salida continua (`RollingOutput`): cuánto tarda
+`PostProcessor.process` y cuántas veces lee y escribe el contenido, según
+`/proc/self/io` (con FFmpeg también cuenta lo de los procesos hijos).
+
+Se graba una sesión sintética (pistas fMP4 de `bench_remux`) anexando los
+segmentos ciclo a ciclo como lo hace `LiveRecorder(rolling=True)`, con y sin
+rotación de partes, y se mide sólo el cierre.
+
+Uso (desde la raíz del repo, en Linux):
+    python -m benchmarks.bench_rolling [--total-mb 1024] [--segments 900]
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from benchmarks.bench_remux import SEGMENT_SECONDS, make_track
+from ditupy.services.processor import PostProcessor
+from ditupy.services.rolling_output import RollingOutput
+
+
+def io_counters() -> Dict[str, int]:
+    """rchar/wchar del proceso: bytes leídos y escritos por llamadas al sistema."""
+    counters = {}
+    with open("/proc/self/io", encoding="ascii") as f:
+        for line in f:
+            name, value = line.split(":")
+            counters[name] = int(value)
+    return counters
+
+
+def record(base: Path, args, rotate_every: Optional[float]) -> int:
+    """Graba la sesión en `base` como salida continua. Retorna los bytes de media."""
+    per_segment = args.total_mb * 1024 * 1024 // args.segments
+    video = make_track(base / "video", 1, "vide", args.segments, per_segment * 9 // 10)
+    audio = make_track(base / "audio", 1, "soun", args.segments, per_segment // 10)
+    content = sum(f.stat().st_size for f in video + audio)
+
+    output = RollingOutput(base, rotate_every=rotate_every)
+    output.set_init("video", video[0])
+    output.set_init("audio", audio[0])
+    for first in range(1, args.segments + 1, args.cycle):
+        last = first + args.cycle
+        output.append("video", video[first:last], args.cycle * SEGMENT_SECONDS)
+        output.append("audio", audio[first:last], args.cycle * SEGMENT_SECONDS)
+        output.maybe_rotate()
+    output.close()
+    return content
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--total-mb", type=int, default=1024)
+    parser.add_argument("--segments", type=int, default=900)
+    parser.add_argument("--cycle", type=int, default=3, help="Segmentos por ciclo")
+    parser.add_argument("--dir", default=None, help="Directorio de trabajo.")
+    args = parser.parse_args()
+
+    if not os.path.exists("/proc/self/io"):
+        print("Hace falta /proc/self/io (Linux) para contar los bytes movidos.")
+        return
+
+    logging.basicConfig(level=logging.WARNING)
+    hours = args.segments * SEGMENT_SECONDS / 3600
+    print(f"Grabación sintética: {args.total_mb} MB, {hours:.2f} h")
+    header = (
+        f"{'variante':>22} {'partes':>6} {'seg':>6} {'MB/s':>6} "
+        f"{'leído':>7} {'escrito':>8}"
+    )
+    print(header)
+    print("-" * len(header))
+    variants = [
+        ("una parte", None),
+        ("partes de 10 min", 600.0),
+    ]
+    for name, rotate_every in variants:
+        base = Path(tempfile.mkdtemp(prefix="bench_rolling_", dir=args.dir))
+        try:
+            content = record(base, args, rotate_every)
+            processor = PostProcessor(base)
+            os.sync()
+            before = io_counters()
+            started = time.perf_counter()
+            ok = processor.process("final.mp4", cleanup=False)
+            wall = time.perf_counter() - started
+            after = io_counters()
+            parts = len(list(base.glob("final*.mp4")))
+            read = (after["rchar"] - before["rchar"]) / content
+            written = (after["wchar"] - before["wchar"]) / content
+            status = "" if ok else "  (falló)"
+            print(
+                f"{name:>22} {parts:>6} {wall:>6.2f} "
+                f"{content / 1024 / 1024 / wall:>6.0f} {read:>6.2f}x {written:>7.2f}x"
+                f"{status}"
+            )
+        finally:
+            shutil.rmtree(base, ignore_errors=True)
+    print(
+        "\nleído/escrito: bytes movidos por el cierre sobre el contenido "
+        "(1.00x = una pasada)."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -3,8 +3,9 @@ from pathlib import Path
 from ditupy.ditu import DituClient
 from ditupy.logging_config import setup_logging
 from ditupy.schemas.types import DRMInfo
+from ditupy.services.disk_budget import DiskBudget
 from ditupy.services.license_manager import LicenseManager
-from ditupy.services.processor import PostProcessor
+from ditupy.services.post_executor import PostProcessExecutor
 from ditupy.services.vod_downloader import VodDownloader
 
 setup_logging()
@@ -12,6 +13,11 @@ setup_logging()
 client = DituClient()
 series = client.get_series()
 device_path = "dumper-main/key_dumps/Android Emulator 5554/private_keys/4464/2137596953"
+# El post-procesado corre en segundo plano mientras se descarga el siguiente episodio.
+post = PostProcessExecutor(max_episodes=2)
+# Un episodio sólo empieza a descargarse si su estimación (segmentos + post-
+# procesado) cabe junto a lo que aún ocupan los anteriores; si no, espera.
+disk = DiskBudget("downloads")
 for serie in series:
     if "suite" in serie.metadata.title.lower():
         episodes = [
@@ -24,13 +30,23 @@ for serie in series:
             title = episode.title_slug
             episode_number = episode.metadata.episodeNumber
 
-            manifest = client.get_stream_url(content_id=episode.metadata.contentId)
+            folder_prefix = f"{title}.{episode.metadata.year}.capitulo.{str(episode_number).zfill(2)}.ditu"
+            content_id = episode.metadata.contentId
 
-            downloader = VodDownloader(manifest=manifest)
+            # Si ya hay una carpeta de un intento anterior, se reanuda desde su
+            # snapshot y sólo se llama a la API si el token venció.
+            previous = next(Path("downloads").glob(f"{folder_prefix}.*p"), None)
+            if previous is not None:
+                downloader = VodDownloader.resume(
+                    previous, lambda: client.get_stream_url(content_id=content_id)
+                )
+            else:
+                manifest = client.get_stream_url(content_id=content_id)
+                downloader = VodDownloader(manifest=manifest)
             stream_info = downloader.extract_info()
 
             # Construir ruta
-            folder_name = f"{title}.{episode.metadata.year}.capitulo.{str(episode_number).zfill(2)}.ditu.{stream_info.height}p"
+            folder_name = f"{folder_prefix}.{stream_info.height}p"
             output_path = Path("downloads") / folder_name
 
             filename = f"{folder_name}.mp4"
@@ -39,8 +55,11 @@ for serie in series:
                 print(f"Saltando: {filename} (Ya existe)")
                 continue
 
+            needed = downloader.required_bytes()
+            reservation = disk.acquire(output_path, needed) if needed else None
+
             print(f"Iniciando descarga de: {filename}")
-            downloader.download(output_path=output_path)
+            downloader.download(output_path=output_path, check_space=False)
 
             # Obtiene las Key de descifrado.
             drm_info_path = output_path / "drm_info.json"
@@ -50,11 +69,18 @@ for serie in series:
             keys = license_manager.get_keys(drm_info)
 
             # Procesa los segmentos descargados/cifrados y los descifra si se proporcionan las keys.
-            processor = PostProcessor(output_path)
-            processor.process(filename, keys=keys)
+            future = post.submit(
+                output_path, filename, keys=keys, expected_duration=stream_info.duration
+            )
+            if reservation is not None:
+                reservation.release_when(future)
 
-            if processor.verify_integrity(final_file, stream_info.duration):
-                print(f"Descargado y Verificado: {episode.metadata.title}")
-            else:
-                print(f"WARNING: Descarga incompleta para: {episode.metadata.title}")
-                raise Exception("Descarga incompleta")
+results = post.wait()
+post.shutdown()
+for path, ok in results.items():
+    if ok:
+        print(f"Descargado y Verificado: {path.name}")
+    else:
+        print(f"WARNING: Descarga incompleta para: {path.name}")
+if not all(results.values()):
+    raise Exception("Descarga incompleta")
@@ -0,0 +1,245 @@
+import errno
+import logging
+import os
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Tamaño de bloque de las copias por read/write (también lo usa remux.py).
+CHUNK_SIZE = 8 * 1024 * 1024
+# Errores con los que el kernel/sistema de archivos indica que el método no aplica.
+UNSUPPORTED_ERRNOS = {
+    errno.ENOSYS,
+    errno.EXDEV,
+    errno.EINVAL,
+    errno.EOPNOTSUPP,
+    errno.ENOTSUP,
+}
+
+
+# En Windows os.open abre en modo texto salvo que se pida O_BINARY.
+O_BINARY = getattr(os, "O_BINARY", 0)
+# pread/pwrite no existen en Windows: ahí se posiciona con lseek.
+_POSITIONAL = hasattr(os, "pread") and hasattr(os, "pwrite")
+
+
+def read_at(fd: int, size: int, offset: int) -> bytes:
+    """Lee hasta `size` bytes de `fd` desde `offset` (pread, o lseek+read)."""
+    if _POSITIONAL:
+        return os.pread(fd, size, offset)
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.read(fd, size)
+
+
+def write_at(fd: int, data: bytes, offset: int):
+    """Escribe todo `data` en `fd` desde `offset` (pwrite, o lseek+write)."""
+    view = memoryview(data)
+    if not _POSITIONAL:
+        os.lseek(fd, offset, os.SEEK_SET)
+    while view:
+        if _POSITIONAL:
+            n = os.pwrite(fd, view, offset)
+        else:
+            n = os.write(fd, view)
+        view = view[n:]
+        offset += n
+
+
+# Se llama con los bytes de cada bloque copiado (p. ej. un BandwidthLimiter.consume).
+Throttle = Optional[Callable[[int], None]]
+
+
+def _step(size: int, throttle: Throttle) -> int:
+    """Con `throttle`, se copia por bloques para descontar a medida que se avanza."""
+    return CHUNK_SIZE if throttle is not None else size
+
+
+def _short(done: int, size: int) -> ValueError:
+    return ValueError(f"El origen terminó antes de tiempo: {done} de {size} bytes.")
+
+
+def _copy_range(
+    src: int, dst: int, size: int, dst_offset: int, throttle: Throttle = None
+) -> int:
+    """copy_file_range: el kernel copia (o comparte extents, en btrfs/xfs/NFS)."""
+    step = _step(size, throttle)
+    done = 0
+    while done < size:
+        count = min(step, size - done)
+        n = os.copy_file_range(src, dst, count, done, dst_offset + done)
+        if n == 0:
+            raise _short(done, size)
+        if throttle is not None:
+            throttle(n)
+        done += n
+    return done
+
+
+def _sendfile(
+    src: int, dst: int, size: int, dst_offset: int, throttle: Throttle = None
+) -> int:
+    """sendfile a archivo regular: copia en el kernel sin pasar por userspace."""
+    os.lseek(dst, dst_offset, os.SEEK_SET)
+    step = _step(size, throttle)
+    done = 0
+    while done < size:
+        n = os.sendfile(dst, src, done, min(step, size - done))
+        if n == 0:
+            raise _short(done, size)
+        if throttle is not None:
+            throttle(n)
+        done += n
+    return done
+
+
+def _read_write(
+    src: int, dst: int, size: int, dst_offset: int, throttle: Throttle = None
+) -> int:
+    done = 0
+    while done < size:
+        data = read_at(src, min(CHUNK_SIZE, size - done), done)
+        if not data:
+            raise _short(done, size)
+        write_at(dst, data, dst_offset + done)
+        if throttle is not None:
+            throttle(len(data))
+        done += len(data)
+    return done
+
+
+_METHODS = [
+    ("copy_file_range", _copy_range, hasattr(os, "copy_file_range")),
+    ("sendfile", _sendfile, hasattr(os, "sendfile")),
+    ("read/write", _read_write, True),
+]
+
+
+def preallocate(fd: int, size: int):
+    """Reserva el tamaño final de una vez: menos fragmentación y falla temprana sin espacio."""
+    if size <= 0 or not hasattr(os, "posix_fallocate"):
+        return
+    try:
+        os.posix_fallocate(fd, 0, size)
+    except OSError as e:
+        if e.errno == errno.ENOSPC:
+            raise
+        # Sistema de archivos sin soporte: se escribe igual, sin reserva.
+
+
+def concatenate_files(
+    files: Sequence[Path],
+    output_path: Path,
+    batch_size: int = 256,
+    throttle: Throttle = None,
+) -> Tuple[int, str]:
+    """
+    Une `files` en `output_path` a nivel de bytes, copiando dentro del kernel
+    (copy_file_range, luego sendfile) y, si ninguno está disponible, leyendo
+    y escribiendo por bloques. Los archivos se abren en lotes de
+    `batch_size` descriptores y la salida se preasigna con el tamaño total.
+    `throttle` recibe los bytes de cada bloque copiado.
+
+    Retorna (bytes escritos, método usado).
+    """
+    methods = [(name, fn) for name, fn, available in _METHODS if available]
+    fd_out = os.open(
+        output_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | O_BINARY, 0o644
+    )
+    written = 0
+    try:
+        sizes = [os.stat(f).st_size for f in files]
+        preallocate(fd_out, sum(sizes))
+
+        for first in range(0, len(files), batch_size):
+            batch = files[first : first + batch_size]
+            fds: List[int] = []
+            try:
+                for f in batch:
+                    fds.append(os.open(f, os.O_RDONLY | O_BINARY))
+                for fd_in, size in zip(fds, sizes[first : first + batch_size]):
+                    written += _copy_one(
+                        methods, fd_in, fd_out, size, written, throttle
+                    )
+            finally:
+                for fd in fds:
+                    os.close(fd)
+    finally:
+        os.close(fd_out)
+    return written, methods[0][0]
+
+
+def _copy_one(
+    methods: list,
+    fd_in: int,
+    fd_out: int,
+    size: int,
+    offset: int,
+    throttle: Throttle = None,
+) -> int:
+    """Copia con el primer método que funcione; los que fallan se descartan."""
+    while True:
+        name, fn = methods[0]
+        try:
+            return fn(fd_in, fd_out, size, offset, throttle)
+        except OSError as e:
+            if e.errno not in UNSUPPORTED_ERRNOS or len(methods) == 1:
+                raise
+            logger.debug(f"{name} no disponible ({e}); usando {methods[1][0]}.")
+            methods.pop(0)
+
+
+def append_file(path: Path, fd_out: int, offset: int, throttle: Throttle = None) -> int:
+    """
+    Copia `path` en `fd_out` a partir de `offset` con el mejor método
+    disponible. Retorna el nuevo final del archivo de salida.
+    """
+    methods = [(name, fn) for name, fn, available in _METHODS if available]
+    fd_in = os.open(path, os.O_RDONLY | O_BINARY)
+    try:
+        size = os.fstat(fd_in).st_size
+        copied = _copy_one(methods, fd_in, fd_out, size, offset, throttle)
+    finally:
+        os.close(fd_in)
+    if copied != size:
+        raise ValueError(f"{path.name}: se copiaron {copied} de {size} bytes.")
+    return offset + copied
+
+
+def stream_files(files: Sequence[Path], fd_out: int, throttle: Throttle = None) -> int:
+    """
+    Escribe `files` en orden sobre un descriptor secuencial (pipe/FIFO) con
+    sendfile, o read/write si no está disponible. `throttle` recibe los bytes
+    de cada bloque escrito. Retorna los bytes escritos.
+    """
+    use_sendfile = hasattr(os, "sendfile")
+    written = 0
+    for path in files:
+        fd_in = os.open(path, os.O_RDONLY | O_BINARY)
+        try:
+            size = os.fstat(fd_in).st_size
+            step = _step(size, throttle)
+            offset = 0
+            while offset < size:
+                if use_sendfile:
+                    try:
+                        n = os.sendfile(fd_out, fd_in, offset, min(step, size - offset))
+                    except OSError as e:
+                        if e.errno not in UNSUPPORTED_ERRNOS:
+                            raise
+                        use_sendfile = False
+                        continue
+                else:
+                    data = read_at(fd_in, min(CHUNK_SIZE, size - offset), offset)
+                    n = os.write(fd_out, data) if data else 0
+                if n == 0:
+                    raise ValueError(
+                        f"{path.name}: se enviaron {offset} de {size} bytes."
+                    )
+                if throttle is not None:
+                    throttle(n)
+                offset += n
+            written += offset
+        finally:
+            os.close(fd_in)
+    return written
@@ -1,9 +1,12 @@
+import itertools
 import logging
+import math
+import re
 import xml.etree.ElementTree as ET
-from typing import Any, List, Optional
+from typing import Any, Callable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
 from urllib.parse import urljoin
 
-from ditupy.utils import parse_iso_duration
+from ditupy.utils import parse_iso_datetime, parse_iso_duration
 
 logger = logging.getLogger(__name__)
 
@@ -13,9 +16,10 @@ NAMESPACES = {"mpd": "urn:mpeg:dash:schema:mpd:2011", "cenc": "urn:mpeg:cenc:201
 class XmlNode:
     """Clase base para envolver elementos XML y facilitar la extracción segura."""
 
-    def __init__(self, element: ET.Element, base_url: str = ""):
+    def __init__(self, element: ET.Element, base_url: str = "", parent: Any = None):
         self._el = element
         self._base_url = base_url
+        self.parent = parent
 
     def _attr(self, name: str, default: Any = None, cast_type: type = str) -> Any:
         """Extrae un atributo de forma segura y lo tipa."""
@@ -79,7 +83,217 @@ class ContentProtection(XmlNode):
         return None
 
 
+class Segment(NamedTuple):
+    """
+    Segmento resuelto de una Representation.
+    `time` y `duration` están en unidades de `timescale`; `time` es relativo al
+    inicio del Period (ya descontado el presentationTimeOffset).
+    `byte_range` (primer y último byte, inclusive) se usa cuando el segmento es
+    una porción de un archivo mayor (SegmentBase o SegmentList con mediaRange).
+    """
+
+    number: int
+    time: int
+    duration: int
+    url: str
+    timescale: int = 1
+    byte_range: Optional[Tuple[int, int]] = None
+
+    @property
+    def start_seconds(self) -> float:
+        return self.time / self.timescale
+
+    @property
+    def duration_seconds(self) -> float:
+        return self.duration / self.timescale
+
+    @property
+    def end_seconds(self) -> float:
+        return (self.time + self.duration) / self.timescale
+
+
+def parse_byte_range(value: Optional[str]) -> Optional[Tuple[int, int]]:
+    """Convierte un atributo `range`/`indexRange`/`mediaRange` ("first-last") en tupla."""
+    if not value:
+        return None
+    first, _, last = value.strip().partition("-")
+    try:
+        return int(first), int(last)
+    except ValueError:
+        logger.warning(f"Rango de bytes inválido en el MPD: '{value}'")
+        return None
+
+
+# (t, d, r) de cada <S>. `t` es None cuando el MPD lo omite (continúa del anterior).
+TimelineEntry = Tuple[Optional[int], int, int]
+
+_TEMPLATE_TAG = re.compile(
+    r"\$(RepresentationID|Number|Bandwidth|Time|SubNumber)(?:%0(\d+)d)?\$|\$\$"
+)
+
+
+def compile_template(
+    pattern: str, representation_id: str = "", bandwidth: int = 0
+) -> Callable[[int, int], str]:
+    """
+    Convierte un patrón de SegmentTemplate ($Number%05d$, $Time$, ...) en una
+    función (number, time) -> str. Los identificadores constantes de la
+    Representation se sustituyen una sola vez.
+    """
+    parts: List[str] = []
+    last = 0
+    for match in _TEMPLATE_TAG.finditer(pattern):
+        parts.append(
+            pattern[last : match.start()].replace("{", "{{").replace("}", "}}")
+        )
+        last = match.end()
+        ident, width = match.group(1), match.group(2)
+        if ident is None:
+            parts.append("$")
+        elif ident == "RepresentationID":
+            parts.append(str(representation_id).replace("{", "{{").replace("}", "}}"))
+        elif ident == "Bandwidth":
+            parts.append(f"{bandwidth:0{width}d}" if width else str(bandwidth))
+        elif ident in ("Number", "SubNumber"):
+            parts.append(f"{{0:0{width}d}}" if width else "{0}")
+        else:
+            parts.append(f"{{1:0{width}d}}" if width else "{1}")
+    parts.append(pattern[last:].replace("{", "{{").replace("}", "}}"))
+    return "".join(parts).format
+
+
+def expand_template(
+    pattern: str,
+    representation_id: str = "",
+    number: int = 0,
+    time: int = 0,
+    bandwidth: int = 0,
+) -> str:
+    """Expande un patrón de SegmentTemplate para un único segmento."""
+    return compile_template(pattern, representation_id, bandwidth)(number, time)
+
+
+def iter_template_segments(
+    media: str,
+    base_url: str,
+    representation_id: str,
+    bandwidth: int = 0,
+    timescale: int = 1,
+    start_number: int = 1,
+    presentation_time_offset: int = 0,
+    duration: Optional[int] = None,
+    timeline: Optional[Sequence[TimelineEntry]] = None,
+    period_duration: Optional[float] = None,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    from_time: Optional[int] = None,
+) -> Iterator[Segment]:
+    """
+    Genera perezosamente los segmentos de un SegmentTemplate.
+
+    Soporta direccionamiento por SegmentTimeline (t/d/r, incluido r negativo) y
+    por @duration. `start` y `end` (segundos relativos al Period) acotan la
+    ventana; sin `end` ni duración de Period, un r negativo final o una plantilla
+    por duración generan segmentos indefinidamente (caso live).
+    `from_time` (unidades de timescale) omite, sin generarlos, los segmentos que
+    terminan antes o justo en ese instante.
+    """
+    timescale = timescale or 1
+    pto = presentation_time_offset
+    # Los identificadores sólo sustituyen texto dentro del path, así que basta
+    # resolver la BaseURL una vez sobre el patrón en lugar de por segmento.
+    url_for = compile_template(urljoin(base_url, media), representation_id, bandwidth)
+
+    limit: Optional[int] = None
+    if period_duration:
+        limit = pto + int(round(period_duration * timescale))
+    if end is not None:
+        end_media = pto + math.ceil(end * timescale)
+        limit = end_media if limit is None else min(limit, end_media)
+    start_media = pto + int(start * timescale) if start else None
+    if from_time is not None:
+        start_media = max(start_media or 0, pto + from_time)
+
+    if timeline is None:
+        if not duration:
+            return
+        first = 0
+        if start_media is not None:
+            first = max(0, (start_media - pto) // duration)
+        for index in itertools.count(first):
+            t = pto + index * duration
+            if limit is not None and t >= limit:
+                return
+            number = start_number + index
+            yield Segment(
+                number,
+                t - pto,
+                duration,
+                url_for(number, t),
+                timescale,
+            )
+        return
+
+    number = start_number
+    t = 0
+    for pos, (s_t, d, r) in enumerate(timeline):
+        if s_t is not None:
+            t = s_t
+        if d <= 0:
+            continue
+
+        if r >= 0:
+            count: Optional[int] = r + 1
+        else:
+            # r negativo: repetir hasta el siguiente <S t> o el fin del Period.
+            next_t = timeline[pos + 1][0] if pos + 1 < len(timeline) else None
+            stop = next_t if next_t is not None else limit
+            count = None if stop is None else max(0, -(-(stop - t) // d))
+
+        first = 0
+        if start_media is not None and start_media > t:
+            first = (start_media - t) // d
+            if count is not None:
+                first = min(first, count)
+
+        index = first
+        while count is None or index < count:
+            seg_t = t + index * d
+            if limit is not None and seg_t >= limit:
+                return
+            seg_number = number + index
+            yield Segment(
+                seg_number,
+                seg_t - pto,
+                d,
+                url_for(seg_number, seg_t),
+                timescale,
+            )
+            index += 1
+
+        if count is None:
+            return
+        number += count
+        t += count * d
+
+
 class SegmentTemplate(XmlNode):
+    """
+    Envuelve un <SegmentTemplate>. Si se indica `parent` (la plantilla del nivel
+    superior: AdaptationSet o Period), los atributos ausentes se heredan de ahí.
+    """
+
+    def _attr(self, name: str, default: Any = None, cast_type: type = str) -> Any:
+        if self._el.get(name) is None and isinstance(self.parent, SegmentTemplate):
+            return self.parent._attr(name, default, cast_type)
+        return super()._attr(name, default, cast_type)
+
+    def _timeline_node(self) -> Optional[ET.Element]:
+        node = self._find_child("SegmentTimeline")
+        if node is None and isinstance(self.parent, SegmentTemplate):
+            return self.parent._timeline_node()
+        return node
+
     @property
     def initialization(self) -> str:
         return self._attr("initialization", "")
@@ -96,26 +310,85 @@ class SegmentTemplate(XmlNode):
     def timescale(self) -> int:
         return self._attr("timescale", 1, int)
 
-    def generate_segment_urls(self, representation_id: str) -> List[str]:
-        segments = []
-        timeline = self._find_child("SegmentTimeline")
-        if not timeline:
-            # TODO: Implementar lógica basada en duración si no hay timeline.
-            raise NotImplementedError(
-                "SegmentTimeline no implementado sin SegmentTimeline."
-            )
-
-        current_number = self.start_number
-        media_pattern = self.media.replace("$RepresentationID$", str(representation_id))
+    @property
+    def presentation_time_offset(self) -> int:
+        return self._attr("presentationTimeOffset", 0, int)
 
-        for s in timeline.findall("mpd:S", NAMESPACES):
-            repeat = int(s.get("r", 0))
-            for _ in range(repeat + 1):
-                url_rel = media_pattern.replace("$Number$", str(current_number))
-                segments.append(urljoin(self._base_url, url_rel))
-                current_number += 1
+    @property
+    def duration(self) -> Optional[int]:
+        return self._attr("duration", None, int)
 
-        return segments
+    @property
+    def timeline(self) -> Optional[List[TimelineEntry]]:
+        node = self._timeline_node()
+        if node is None:
+            return None
+        entries: List[TimelineEntry] = []
+        for s in node.findall("mpd:S", NAMESPACES):
+            t = s.get("t")
+            entries.append(
+                (
+                    int(t) if t is not None else None,
+                    int(s.get("d", 0)),
+                    int(s.get("r", 0)),
+                )
+            )
+        return entries
+
+    def initialization_url(self, representation_id: str, bandwidth: int = 0) -> str:
+        if not self.initialization:
+            return ""
+        init = expand_template(
+            self.initialization, representation_id, bandwidth=bandwidth
+        )
+        return urljoin(self._base_url, init)
+
+    def iter_segments(
+        self,
+        representation_id: str,
+        bandwidth: int = 0,
+        period_duration: Optional[float] = None,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        from_time: Optional[int] = None,
+    ) -> Iterator[Segment]:
+        return iter_template_segments(
+            self.media,
+            self._base_url,
+            representation_id,
+            bandwidth=bandwidth,
+            timescale=self.timescale,
+            start_number=self.start_number,
+            presentation_time_offset=self.presentation_time_offset,
+            duration=self.duration,
+            timeline=self.timeline,
+            period_duration=period_duration,
+            start=start,
+            end=end,
+            from_time=from_time,
+        )
+
+    def generate_segment_urls(
+        self,
+        representation_id: str,
+        bandwidth: int = 0,
+        period_duration: Optional[float] = None,
+    ) -> List[str]:
+        if self.timeline is None and not self.duration:
+            raise ValueError("SegmentTemplate sin SegmentTimeline ni @duration.")
+        if self.timeline is None and not period_duration:
+            raise ValueError(
+                "SegmentTemplate por @duration requiere la duración del Period."
+            )
+        timeline = self.timeline
+        if timeline and timeline[-1][2] < 0 and not period_duration:
+            raise ValueError(
+                "SegmentTimeline con r=-1 final requiere la duración del Period."
+            )
+        return [
+            seg.url
+            for seg in self.iter_segments(representation_id, bandwidth, period_duration)
+        ]
 
 
 class Representation(XmlNode):
@@ -146,22 +419,76 @@ class Representation(XmlNode):
             for el in self._find_children("ContentProtection")
         ]
 
-    def get_segments(self) -> List[str]:
-        tmpl_node = self._find_child("SegmentTemplate")
-        if tmpl_node:
-            template = SegmentTemplate(tmpl_node, self.base_url)
-            return template.generate_segment_urls(self.id)
-        return []
+    def get_segment_template(self) -> Optional[SegmentTemplate]:
+        """
+        Resuelve el SegmentTemplate efectivo aplicando la herencia
+        Period -> AdaptationSet -> Representation.
+        """
+        chain = []
+        node: Any = self
+        while isinstance(node, XmlNode):
+            tmpl_node = node._find_child("SegmentTemplate")
+            if tmpl_node is not None:
+                chain.append(tmpl_node)
+            node = node.parent
+
+        template = None
+        for tmpl_node in reversed(chain):
+            template = SegmentTemplate(tmpl_node, self.base_url, parent=template)
+        return template
+
+    def _period_duration(self) -> Optional[float]:
+        node: Any = self.parent
+        while isinstance(node, XmlNode) and not isinstance(node, Period):
+            node = node.parent
+        return node.duration_seconds if isinstance(node, Period) else None
+
+    def iter_segments(
+        self,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        from_time: Optional[int] = None,
+    ) -> Iterator[Segment]:
+        """Genera perezosamente los segmentos, opcionalmente acotados a [start, end)."""
+        template = self.get_segment_template()
+        if template is None:
+            return iter(())
+        return template.iter_segments(
+            self.id,
+            self.bandwidth,
+            self._period_duration(),
+            start=start,
+            end=end,
+            from_time=from_time,
+        )
 
     @property
-    def initialization_url(self) -> str:
-        tmpl_node = self._find_child("SegmentTemplate")
-        if tmpl_node:
-            template = SegmentTemplate(tmpl_node, self.base_url)
-            init_pattern = template.initialization.replace(
-                "$RepresentationID$", str(self.id)
+    def is_open_ended(self) -> bool:
+        """True si la plantilla genera segmentos sin fin sin un `end` explícito."""
+        template = self.get_segment_template()
+        if template is None or self._period_duration():
+            return False
+        timeline = template.timeline
+        if timeline is None:
+            return bool(template.duration)
+        return bool(timeline) and timeline[-1][2] < 0
+
+    def get_segments(self, end: Optional[float] = None) -> List[str]:
+        """
+        URLs de los segmentos hasta `end` (segundos relativos al Period).
+        :raises ValueError: Si la plantilla no tiene fin y no se indica `end`.
+        """
+        if end is None and self.is_open_ended:
+            raise ValueError(
+                f"[{self.id}] Plantilla sin fin: get_segments requiere `end`."
             )
-            return urljoin(self.base_url, init_pattern)
+        return [seg.url for seg in self.iter_segments(end=end)]
+
+    @property
+    def initialization_url(self) -> str:
+        template = self.get_segment_template()
+        if template is not None:
+            return template.initialization_url(self.id, self.bandwidth)
         return ""
 
 
@@ -188,8 +515,9 @@ class AdaptationSet(XmlNode):
     def get_representations(self) -> List[Representation]:
         # Estandar: Las representaciones heredan la info de ContentProtection del padre si no la tienen.
         # Nuestro caso: El XML muestra que están dentro de Representation, pero es bueno tenerlo en cuenta.
+        base_url = self.base_url
         return [
-            Representation(el, self.base_url)
+            Representation(el, base_url, parent=self)
             for el in self._find_children("Representation")
         ]
 
@@ -199,16 +527,14 @@ class AdaptationSet(XmlNode):
             logger.warning(f"AdaptationSet ({self.mime_type}) sin representaciones.")
             return None
 
+        best = max(reps, key=lambda r: r.bandwidth)
         if self.is_video:
-            best = sorted(reps, key=lambda r: r.bandwidth, reverse=True)[0]
             logger.info(
                 f"Mejor VIDEO: {best.width}x{best.height} (ID: {best.id}, BW: {best.bandwidth})"
             )
-            return best
         else:
-            best = sorted(reps, key=lambda r: r.bandwidth, reverse=True)[0]
             logger.info(f"Mejor AUDIO: ID {best.id} (BW: {best.bandwidth})")
-            return best
+        return best
 
 
 class Period(XmlNode):
@@ -220,11 +546,29 @@ class Period(XmlNode):
     def start(self) -> str:
         return self._attr("start")
 
+    @property
+    def start_seconds(self) -> float:
+        return parse_iso_duration(self.start or "")
+
+    @property
+    def duration_seconds(self) -> Optional[float]:
+        """
+        Duración del Period: @duration, la distancia hasta el siguiente Period o lo
+        que resta de mediaPresentationDuration. None si no está acotado (live).
+        """
+        own = self._attr("duration")
+        if own:
+            return parse_iso_duration(own)
+        if isinstance(self.parent, DashManifest):
+            return self.parent._period_duration_hint(self._el)
+        return None
+
     def get_adaptation_sets(
         self, type_filter: Optional[str] = None
     ) -> List[AdaptationSet]:
+        base_url = self.base_url
         sets = [
-            AdaptationSet(el, self.base_url)
+            AdaptationSet(el, base_url, parent=self)
             for el in self._find_children("AdaptationSet")
         ]
         if type_filter == "video":
@@ -249,6 +593,43 @@ class DashManifest:
         duration_str = self._root.get("mediaPresentationDuration", "")
         return parse_iso_duration(duration_str)
 
+    @property
+    def type(self) -> str:
+        return self._root.get("type", "static")
+
+    @property
+    def is_dynamic(self) -> bool:
+        return self.type == "dynamic"
+
+    def _duration_attr(self, name: str) -> Optional[float]:
+        value = self._root.get(name)
+        return parse_iso_duration(value) if value else None
+
+    @property
+    def availability_start_time(self) -> Optional[float]:
+        """Epoch (UTC) del availabilityStartTime, o None si no está declarado."""
+        return parse_iso_datetime(self._root.get("availabilityStartTime", ""))
+
+    @property
+    def publish_time(self) -> Optional[float]:
+        return parse_iso_datetime(self._root.get("publishTime", ""))
+
+    @property
+    def minimum_update_period(self) -> Optional[float]:
+        return self._duration_attr("minimumUpdatePeriod")
+
+    @property
+    def time_shift_buffer_depth(self) -> Optional[float]:
+        return self._duration_attr("timeShiftBufferDepth")
+
+    @property
+    def suggested_presentation_delay(self) -> Optional[float]:
+        return self._duration_attr("suggestedPresentationDelay")
+
+    @property
+    def max_segment_duration(self) -> Optional[float]:
+        return self._duration_attr("maxSegmentDuration")
+
     @property
     def base_url(self) -> str:
         node = self._root.find("mpd:BaseURL", NAMESPACES)
@@ -259,9 +640,21 @@ class DashManifest:
             return val
         return self._source_url
 
+    def _period_duration_hint(self, period_el: ET.Element) -> Optional[float]:
+        """Duración implícita de un Period sin @duration."""
+        elements = self._root.findall("mpd:Period", NAMESPACES)
+        start = parse_iso_duration(period_el.get("start", ""))
+        idx = elements.index(period_el)
+        if idx + 1 < len(elements) and elements[idx + 1].get("start"):
+            return parse_iso_duration(elements[idx + 1].get("start", "")) - start
+        if self.duration_seconds:
+            return self.duration_seconds - start
+        return None
+
     def get_periods(self) -> List[Period]:
+        base_url = self.base_url
         return [
-            Period(el, self.base_url)
+            Period(el, base_url, parent=self)
             for el in self._root.findall("mpd:Period", NAMESPACES)
         ]
 
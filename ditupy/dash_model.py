@@ -0,0 +1,810 @@
+import logging
+import math
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urljoin
+
+from ditupy.dash import (
+    NAMESPACES,
+    DashManifest,
+    Segment,
+    TimelineEntry,
+    expand_template,
+    iter_template_segments,
+    parse_byte_range,
+)
+from ditupy.isobmff import SegmentIndex
+from ditupy.scte35 import SpliceSignal, parse_event_signal
+from ditupy.utils import parse_iso_duration
+
+logger = logging.getLogger(__name__)
+
+_MPD = f"{{{NAMESPACES['mpd']}}}"
+_CENC = f"{{{NAMESPACES['cenc']}}}"
+
+WIDEVINE_SYSTEM_ID = "edef8ba9"
+
+_TEMPLATE_ATTRS = (
+    "media",
+    "initialization",
+    "timescale",
+    "startNumber",
+    "presentationTimeOffset",
+    "duration",
+)
+
+_LIST_ATTRS = ("timescale", "startNumber", "presentationTimeOffset", "duration")
+_BASE_ATTRS = ("timescale", "presentationTimeOffset", "indexRange")
+
+ByteRange = Tuple[int, int]
+
+
+@dataclass(frozen=True, slots=True)
+class ProtectionModel:
+    scheme_id_uri: str
+    value: str = ""
+    default_kid: Optional[str] = None
+    pssh: Optional[str] = None
+
+    @property
+    def is_widevine(self) -> bool:
+        return WIDEVINE_SYSTEM_ID in self.scheme_id_uri.lower()
+
+
+@dataclass(frozen=True, slots=True)
+class TemplateModel:
+    """SegmentTemplate con la herencia ya aplicada."""
+
+    media: str
+    initialization: str = ""
+    timescale: int = 1
+    start_number: int = 1
+    presentation_time_offset: int = 0
+    duration: Optional[int] = None
+    timeline: Optional[Tuple[TimelineEntry, ...]] = None
+
+
+@dataclass(frozen=True, slots=True)
+class SegmentBaseModel:
+    """SegmentBase: un único archivo cuyos fragmentos se localizan con su `sidx`."""
+
+    index_range: Optional[ByteRange] = None
+    timescale: int = 1
+    presentation_time_offset: int = 0
+
+
+@dataclass(frozen=True, slots=True)
+class SegmentListModel:
+    """SegmentList con la herencia aplicada y las URLs ya resueltas."""
+
+    segments: Tuple[Tuple[str, Optional[ByteRange]], ...]
+    timescale: int = 1
+    start_number: int = 1
+    presentation_time_offset: int = 0
+    duration: Optional[int] = None
+    timeline: Optional[Tuple[TimelineEntry, ...]] = None
+
+    def iter_times(self) -> Iterator[Tuple[int, int]]:
+        """(tiempo de media, duración) de cada SegmentURL, en orden."""
+        if self.timeline is None:
+            d = self.duration or 0
+            for index in range(len(self.segments)):
+                yield self.presentation_time_offset + index * d, d
+            return
+        t = 0
+        remaining = len(self.segments)
+        for s_t, d, r in self.timeline:
+            if s_t is not None:
+                t = s_t
+            # r negativo: se repite hasta agotar las SegmentURL.
+            count = remaining if r < 0 else min(r + 1, remaining)
+            for _ in range(count):
+                yield t, d
+                t += d
+            remaining -= count
+            if remaining <= 0:
+                return
+
+
+@dataclass(frozen=True, slots=True)
+class RepresentationModel:
+    id: str
+    bandwidth: int
+    width: Optional[int]
+    height: Optional[int]
+    codecs: str
+    mime_type: str
+    content_type: str
+    lang: str
+    base_url: str
+    initialization_url: str
+    template: Optional[TemplateModel]
+    protections: Tuple[ProtectionModel, ...]
+    period_duration: Optional[float] = None
+    initialization_range: Optional[ByteRange] = None
+    segment_base: Optional[SegmentBaseModel] = None
+    segment_list: Optional[SegmentListModel] = None
+    # BaseURL alternativas (otros hosts/CDN) ya resueltas, sin la principal.
+    alternate_base_urls: Tuple[str, ...] = ()
+
+    @property
+    def is_video(self) -> bool:
+        return self.content_type == "video"
+
+    @property
+    def is_audio(self) -> bool:
+        return self.content_type == "audio"
+
+    @property
+    def widevine_pssh(self) -> Optional[str]:
+        for protection in self.protections:
+            if protection.is_widevine and protection.pssh:
+                return protection.pssh
+        return None
+
+    def iter_segments(
+        self,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        from_time: Optional[int] = None,
+    ) -> Iterator[Segment]:
+        """
+        Genera perezosamente los segmentos, opcionalmente acotados a [start, end).
+        Con SegmentBase no hay nada que generar sin el `sidx`: ver `needs_index`.
+        """
+        if self.segment_list is not None:
+            return self._iter_list_segments(start, end, from_time)
+        tmpl = self.template
+        if tmpl is None:
+            return iter(())
+        return iter_template_segments(
+            tmpl.media,
+            self.base_url,
+            self.id,
+            bandwidth=self.bandwidth,
+            timescale=tmpl.timescale,
+            start_number=tmpl.start_number,
+            presentation_time_offset=tmpl.presentation_time_offset,
+            duration=tmpl.duration,
+            timeline=tmpl.timeline,
+            period_duration=self.period_duration,
+            start=start,
+            end=end,
+            from_time=from_time,
+        )
+
+    def _iter_list_segments(
+        self,
+        start: Optional[float],
+        end: Optional[float],
+        from_time: Optional[int],
+    ) -> Iterator[Segment]:
+        lst: SegmentListModel = self.segment_list  # type: ignore
+        ts = lst.timescale
+        pto = lst.presentation_time_offset
+        limit = None if end is None else math.ceil(end * ts)
+        if self.period_duration:
+            period_limit = int(round(self.period_duration * ts))
+            limit = period_limit if limit is None else min(limit, period_limit)
+        skip_until = int(start * ts) if start else None
+        if from_time is not None:
+            skip_until = max(skip_until or 0, from_time)
+
+        for index, ((url, media_range), (t, d)) in enumerate(
+            zip(lst.segments, lst.iter_times())
+        ):
+            rel = t - pto
+            if limit is not None and rel >= limit:
+                return
+            if skip_until is not None and rel + d <= skip_until:
+                continue
+            yield Segment(lst.start_number + index, rel, d, url, ts, media_range)
+
+    def mirrors(self, url: str) -> Tuple[str, ...]:
+        """
+        `url` (resuelta contra `base_url`) en cada BaseURL alternativa. Vacío si
+        no hay alternativas o si `url` no cuelga de la BaseURL principal.
+        """
+        if not self.alternate_base_urls:
+            return ()
+        if url == self.base_url:
+            return self.alternate_base_urls
+        prefix = self.base_url[: self.base_url.rfind("/") + 1]
+        if not prefix or not url.startswith(prefix):
+            return ()
+        tail = url[len(prefix) :]
+        return tuple(
+            alt[: alt.rfind("/") + 1] + tail for alt in self.alternate_base_urls
+        )
+
+    @property
+    def needs_index(self) -> bool:
+        """True si los segmentos sólo se conocen tras leer el `sidx` (SegmentBase)."""
+        return (
+            self.segment_base is not None
+            and self.template is None
+            and self.segment_list is None
+        )
+
+    def segments_from_index(self, index: SegmentIndex) -> List[Segment]:
+        """Convierte las referencias del `sidx` en segmentos con rango de bytes."""
+        pto = self.segment_base.presentation_time_offset if self.segment_base else 0
+        segments = []
+        for number, ref in enumerate(index.references, start=1):
+            if ref.is_index:
+                logger.warning(
+                    f"[{self.id}] sidx jerárquico no soportado; se omite una referencia."
+                )
+                continue
+            segments.append(
+                Segment(
+                    number,
+                    ref.time - pto,
+                    ref.duration,
+                    self.base_url,
+                    index.timescale,
+                    ref.byte_range,
+                )
+            )
+        return segments
+
+    @property
+    def timescale(self) -> int:
+        if self.template:
+            return self.template.timescale
+        if self.segment_list:
+            return self.segment_list.timescale
+        if self.segment_base:
+            return self.segment_base.timescale
+        return 1
+
+    @property
+    def is_open_ended(self) -> bool:
+        """True si la plantilla genera segmentos sin fin sin un `end` explícito."""
+        tmpl = self.template
+        if tmpl is None or self.period_duration:
+            return False
+        if tmpl.timeline is None:
+            return bool(tmpl.duration)
+        return bool(tmpl.timeline) and tmpl.timeline[-1][2] < 0
+
+    def timeline_window(self) -> Optional[Tuple[int, Optional[int]]]:
+        """
+        (inicio, fin) de la ventana publicada en unidades de timescale, relativo
+        al Period, calculado sobre las entradas <S> sin expandir los segmentos.
+        El fin es None si la última entrada repite indefinidamente (r < 0).
+        """
+        tmpl = self.template
+        if tmpl is None or not tmpl.timeline:
+            return None
+        pto = tmpl.presentation_time_offset
+        first_t = tmpl.timeline[0][0] or 0
+        t = first_t
+        timeline = tmpl.timeline
+        for pos, (s_t, d, r) in enumerate(timeline):
+            if s_t is not None:
+                t = s_t
+            if r >= 0:
+                t += (r + 1) * d
+            elif pos + 1 < len(timeline) and timeline[pos + 1][0] is not None:
+                next_t: int = timeline[pos + 1][0]  # type: ignore
+                t += -(-(next_t - t) // d) * d
+            else:
+                return first_t - pto, None
+        return first_t - pto, t - pto
+
+    def get_segments(self, end: Optional[float] = None) -> List[str]:
+        """
+        URLs de los segmentos hasta `end` (segundos relativos al Period).
+        :raises ValueError: Si la plantilla no tiene fin y no se indica `end`.
+        """
+        if end is None and self.is_open_ended:
+            raise ValueError(
+                f"[{self.id}] Plantilla sin fin: get_segments requiere `end`."
+            )
+        return [seg.url for seg in self.iter_segments(end=end)]
+
+
+@dataclass(frozen=True, slots=True)
+class AdaptationSetModel:
+    id: str
+    mime_type: str
+    content_type: str
+    lang: str
+    roles: Tuple[str, ...]
+    representations: Tuple[RepresentationModel, ...]
+
+    @property
+    def is_video(self) -> bool:
+        return self.content_type == "video"
+
+    @property
+    def is_audio(self) -> bool:
+        return self.content_type == "audio"
+
+    def get_best_representation(self) -> Optional[RepresentationModel]:
+        if not self.representations:
+            logger.warning(f"AdaptationSet ({self.mime_type}) sin representaciones.")
+            return None
+        return max(self.representations, key=lambda r: r.bandwidth)
+
+
+@dataclass(frozen=True, slots=True)
+class EventModel:
+    id: str
+    presentation_time: float
+    duration: Optional[float]
+    signal: Optional[SpliceSignal] = None
+
+
+@dataclass(frozen=True, slots=True)
+class EventStreamModel:
+    scheme_id_uri: str
+    value: str
+    events: Tuple[EventModel, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class PeriodModel:
+    id: str
+    start: float
+    duration: Optional[float]
+    adaptation_sets: Tuple[AdaptationSetModel, ...]
+    event_streams: Tuple[EventStreamModel, ...] = ()
+    inband_event_schemes: Tuple[str, ...] = ()
+
+    def get_adaptation_sets(
+        self, type_filter: Optional[str] = None
+    ) -> List[AdaptationSetModel]:
+        if type_filter is None:
+            return list(self.adaptation_sets)
+        return [a for a in self.adaptation_sets if a.content_type == type_filter]
+
+
+@dataclass(frozen=True, slots=True)
+class ManifestModel:
+    """
+    Vista inmutable y pre-resuelta de un MPD: BaseURLs, plantillas y atributos
+    heredados ya calculados, para no volver a recorrer el XML.
+    """
+
+    source_url: str
+    type: str
+    duration: float
+    periods: Tuple[PeriodModel, ...]
+    availability_start_time: Optional[float] = None
+    publish_time: Optional[float] = None
+    minimum_update_period: Optional[float] = None
+    time_shift_buffer_depth: Optional[float] = None
+    suggested_presentation_delay: Optional[float] = None
+    max_segment_duration: Optional[float] = None
+
+    @property
+    def is_dynamic(self) -> bool:
+        return self.type == "dynamic"
+
+    def get_content_period(self) -> PeriodModel:
+        return self.periods[0]
+
+    @classmethod
+    def from_xml(cls, xml_content: str, source_url: str = "") -> "ManifestModel":
+        return compile_manifest(DashManifest(xml_content, source_url=source_url))
+
+
+def _join_base(base: str, el: ET.Element) -> str:
+    node = el.find(f"{_MPD}BaseURL")
+    if node is not None and node.text and node.text.strip():
+        return urljoin(base, node.text.strip()) if base else node.text.strip()
+    return base
+
+
+def _join_alternates(
+    base: str, alternates: Tuple[str, ...], el: ET.Element
+) -> Tuple[str, ...]:
+    """
+    BaseURL alternativas de `el`: cada <BaseURL> del nivel resuelta contra la
+    principal y las alternativas heredadas, sin repetir ni incluir la que
+    `_join_base` elige como principal.
+    """
+    texts = [
+        node.text.strip()
+        for node in el.findall(f"{_MPD}BaseURL")
+        if node.text and node.text.strip()
+    ]
+    if not texts:
+        return alternates
+    primary = _join_base(base, el)
+    resolved: List[str] = []
+    for text in texts:
+        for parent in (base, *alternates):
+            url = urljoin(parent, text) if parent else text
+            if url != primary and url not in resolved:
+                resolved.append(url)
+    return tuple(resolved)
+
+
+def _to_int(value: Optional[str], default: Optional[int]) -> Optional[int]:
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        logger.warning(f"Valor entero inválido en el MPD: '{value}'")
+        return default
+
+
+def _merge_template(
+    inherited: Optional[Dict[str, object]], el: ET.Element
+) -> Optional[Dict[str, object]]:
+    node = el.find(f"{_MPD}SegmentTemplate")
+    if node is None:
+        return inherited
+
+    merged: Dict[str, object] = dict(inherited) if inherited else {}
+    for name in _TEMPLATE_ATTRS:
+        value = node.get(name)
+        if value is not None:
+            merged[name] = value
+
+    timeline_node = node.find(f"{_MPD}SegmentTimeline")
+    if timeline_node is not None:
+        # Se analiza en el nivel donde aparece: las Representations que lo
+        # heredan comparten la misma tupla.
+        merged["timeline"] = _parse_timeline(timeline_node)
+    return merged
+
+
+def _merge_segment_base(
+    inherited: Optional[Dict[str, object]], el: ET.Element
+) -> Optional[Dict[str, object]]:
+    node = el.find(f"{_MPD}SegmentBase")
+    if node is None:
+        return inherited
+
+    merged: Dict[str, object] = dict(inherited) if inherited else {}
+    for name in _BASE_ATTRS:
+        value = node.get(name)
+        if value is not None:
+            merged[name] = value
+    init = node.find(f"{_MPD}Initialization")
+    if init is not None:
+        merged["initialization"] = init
+    return merged
+
+
+def _merge_segment_list(
+    inherited: Optional[Dict[str, object]], el: ET.Element
+) -> Optional[Dict[str, object]]:
+    node = el.find(f"{_MPD}SegmentList")
+    if node is None:
+        return inherited
+
+    merged: Dict[str, object] = dict(inherited) if inherited else {}
+    for name in _LIST_ATTRS:
+        value = node.get(name)
+        if value is not None:
+            merged[name] = value
+    init = node.find(f"{_MPD}Initialization")
+    if init is not None:
+        merged["initialization"] = init
+    timeline_node = node.find(f"{_MPD}SegmentTimeline")
+    if timeline_node is not None:
+        merged["timeline"] = _parse_timeline(timeline_node)
+    urls = node.findall(f"{_MPD}SegmentURL")
+    if urls:
+        merged["urls"] = tuple((u.get("media", ""), u.get("mediaRange")) for u in urls)
+    return merged
+
+
+def _parse_timeline(node: ET.Element) -> Tuple[TimelineEntry, ...]:
+    # Es el bucle más caliente de la compilación (un <S> por segmento en
+    # timelines sin `r`): se lee `attrib` directamente.
+    entries: List[TimelineEntry] = []
+    append = entries.append
+    for s in node.iterfind(f"{_MPD}S"):
+        attrib = s.attrib
+        t, d, r = attrib.get("t"), attrib.get("d"), attrib.get("r")
+        append(
+            (
+                None if t is None else int(t),
+                0 if d is None else int(d),
+                0 if r is None else int(r),
+            )
+        )
+    return tuple(entries)
+
+
+def _build_template(merged: Optional[Dict[str, object]]) -> Optional[TemplateModel]:
+    if not merged:
+        return None
+    return TemplateModel(
+        media=str(merged.get("media", "")),
+        initialization=str(merged.get("initialization", "")),
+        timescale=_to_int(merged.get("timescale"), 1) or 1,  # type: ignore
+        start_number=_to_int(merged.get("startNumber"), 1),  # type: ignore
+        presentation_time_offset=_to_int(merged.get("presentationTimeOffset"), 0),  # type: ignore
+        duration=_to_int(merged.get("duration"), None),  # type: ignore
+        timeline=merged.get("timeline"),  # type: ignore
+    )
+
+
+def _build_segment_base(
+    merged: Optional[Dict[str, object]],
+) -> Optional[SegmentBaseModel]:
+    if merged is None:
+        return None
+    return SegmentBaseModel(
+        index_range=parse_byte_range(merged.get("indexRange")),  # type: ignore
+        timescale=_to_int(merged.get("timescale"), 1) or 1,  # type: ignore
+        presentation_time_offset=_to_int(merged.get("presentationTimeOffset"), 0),  # type: ignore
+    )
+
+
+def _build_segment_list(
+    merged: Optional[Dict[str, object]], base_url: str
+) -> Optional[SegmentListModel]:
+    if not merged or "urls" not in merged:
+        return None
+    return SegmentListModel(
+        segments=tuple(
+            (urljoin(base_url, media) if media else base_url, parse_byte_range(rng))
+            for media, rng in merged["urls"]  # type: ignore
+        ),
+        timescale=_to_int(merged.get("timescale"), 1) or 1,  # type: ignore
+        start_number=_to_int(merged.get("startNumber"), 1),  # type: ignore
+        presentation_time_offset=_to_int(merged.get("presentationTimeOffset"), 0),  # type: ignore
+        duration=_to_int(merged.get("duration"), None),  # type: ignore
+        timeline=merged.get("timeline"),  # type: ignore
+    )
+
+
+def _initialization(
+    merged: Optional[Dict[str, object]], base_url: str
+) -> Tuple[str, Optional[ByteRange]]:
+    """URL y rango del <Initialization> de un SegmentBase/SegmentList."""
+    node = merged.get("initialization") if merged else None
+    if node is None:
+        return "", None
+    source = node.get("sourceURL")  # type: ignore
+    url = urljoin(base_url, source) if source else base_url
+    return url, parse_byte_range(node.get("range"))  # type: ignore
+
+
+def _protections(el: ET.Element) -> Tuple[ProtectionModel, ...]:
+    result = []
+    for node in el.iterfind(f"{_MPD}ContentProtection"):
+        pssh_node = node.find(f"{_CENC}pssh")
+        result.append(
+            ProtectionModel(
+                scheme_id_uri=node.get("schemeIdUri", ""),
+                value=node.get("value", ""),
+                default_kid=node.get(f"{_CENC}default_KID"),
+                pssh=(
+                    pssh_node.text.strip()
+                    if pssh_node is not None and pssh_node.text
+                    else None
+                ),
+            )
+        )
+    return tuple(result)
+
+
+def _content_type(mime_type: str, declared: str) -> str:
+    if declared:
+        return declared
+    return mime_type.split("/", 1)[0] if mime_type else ""
+
+
+def _compile_representation(
+    el: ET.Element,
+    base_url: str,
+    template: Optional[Dict[str, object]],
+    set_mime: str,
+    set_content_type: str,
+    lang: str,
+    set_protections: Tuple[ProtectionModel, ...],
+    period_duration: Optional[float],
+    segment_base: Optional[Dict[str, object]] = None,
+    segment_list: Optional[Dict[str, object]] = None,
+    alternates: Tuple[str, ...] = (),
+) -> RepresentationModel:
+    rep_id = el.get("id", "")
+    bandwidth = _to_int(el.get("bandwidth"), 0) or 0
+    alternates = _join_alternates(base_url, alternates, el)
+    base_url = _join_base(base_url, el)
+    tmpl = _build_template(_merge_template(template, el))
+    mime_type = el.get("mimeType", set_mime)
+
+    segment_base = _merge_segment_base(segment_base, el)
+    segment_list = _merge_segment_list(segment_list, el)
+    base_model = _build_segment_base(segment_base)
+    list_model = _build_segment_list(segment_list, base_url)
+
+    init_url, init_range = "", None
+    if tmpl is not None and tmpl.initialization:
+        init_url = urljoin(
+            base_url, expand_template(tmpl.initialization, rep_id, bandwidth=bandwidth)
+        )
+    elif list_model is not None:
+        init_url, init_range = _initialization(segment_list, base_url)
+    elif base_model is not None:
+        init_url, init_range = _initialization(segment_base, base_url)
+        if not init_url and base_model.index_range:
+            # Sin <Initialization>, ftyp+moov son los bytes previos al sidx.
+            init_url, init_range = base_url, (0, base_model.index_range[0] - 1)
+
+    return RepresentationModel(
+        id=rep_id,
+        bandwidth=bandwidth,
+        width=_to_int(el.get("width"), None),
+        height=_to_int(el.get("height"), None),
+        codecs=el.get("codecs", ""),
+        mime_type=mime_type,
+        content_type=_content_type(mime_type, set_content_type),
+        lang=lang,
+        base_url=base_url,
+        initialization_url=init_url,
+        template=tmpl,
+        # Las protecciones propias tienen prioridad sobre las del AdaptationSet.
+        protections=_protections(el) + set_protections,
+        period_duration=period_duration,
+        initialization_range=init_range,
+        segment_base=base_model,
+        segment_list=list_model,
+        alternate_base_urls=alternates,
+    )
+
+
+def _compile_adaptation_set(
+    el: ET.Element,
+    base_url: str,
+    template: Optional[Dict[str, object]],
+    period_duration: Optional[float],
+    segment_base: Optional[Dict[str, object]] = None,
+    segment_list: Optional[Dict[str, object]] = None,
+    alternates: Tuple[str, ...] = (),
+) -> AdaptationSetModel:
+    alternates = _join_alternates(base_url, alternates, el)
+    base_url = _join_base(base_url, el)
+    template = _merge_template(template, el)
+    segment_base = _merge_segment_base(segment_base, el)
+    segment_list = _merge_segment_list(segment_list, el)
+    mime_type = el.get("mimeType", "")
+    lang = el.get("lang", "")
+    protections = _protections(el)
+
+    representations = tuple(
+        _compile_representation(
+            rep,
+            base_url,
+            template,
+            mime_type,
+            el.get("contentType", ""),
+            lang,
+            protections,
+            period_duration,
+            segment_base,
+            segment_list,
+            alternates,
+        )
+        for rep in el.iterfind(f"{_MPD}Representation")
+    )
+
+    content_type = _content_type(mime_type, el.get("contentType", ""))
+    if not content_type and representations:
+        content_type = representations[0].content_type
+
+    return AdaptationSetModel(
+        id=el.get("id", ""),
+        mime_type=mime_type,
+        content_type=content_type,
+        lang=lang,
+        roles=tuple(r.get("value", "") for r in el.iterfind(f"{_MPD}Role")),
+        representations=representations,
+    )
+
+
+def _event_streams(period_el: ET.Element) -> Tuple[EventStreamModel, ...]:
+    streams = []
+    for stream in period_el.iterfind(f"{_MPD}EventStream"):
+        timescale = _to_int(stream.get("timescale"), 1) or 1
+        pto = _to_int(stream.get("presentationTimeOffset"), 0) or 0
+        events = []
+        for event in stream.iterfind(f"{_MPD}Event"):
+            duration = _to_int(event.get("duration"), None)
+            events.append(
+                EventModel(
+                    id=event.get("id", ""),
+                    presentation_time=(
+                        (_to_int(event.get("presentationTime"), 0) or 0) - pto
+                    )
+                    / timescale,
+                    duration=duration / timescale if duration is not None else None,
+                    signal=parse_event_signal(event),
+                )
+            )
+        streams.append(
+            EventStreamModel(
+                scheme_id_uri=stream.get("schemeIdUri", ""),
+                value=stream.get("value", ""),
+                events=tuple(events),
+            )
+        )
+    return tuple(streams)
+
+
+def _inband_event_schemes(period_el: ET.Element) -> Tuple[str, ...]:
+    schemes = []
+    for node in period_el.iter(f"{_MPD}InbandEventStream"):
+        scheme = node.get("schemeIdUri", "")
+        if scheme and scheme not in schemes:
+            schemes.append(scheme)
+    return tuple(schemes)
+
+
+def compile_manifest(manifest: DashManifest) -> ManifestModel:
+    """
+    Recorre el MPD una sola vez y devuelve un ManifestModel inmutable con la
+    herencia (BaseURL, SegmentTemplate, ContentProtection) ya resuelta.
+    """
+    root = manifest._root
+    mpd_base = manifest.base_url
+    mpd_alternates = _join_alternates(manifest._source_url, (), root)
+    total_duration = manifest.duration_seconds
+    period_elements = root.findall(f"{_MPD}Period")
+
+    periods = []
+    for idx, period_el in enumerate(period_elements):
+        start = parse_iso_duration(period_el.get("start", ""))
+        if period_el.get("duration"):
+            duration: Optional[float] = parse_iso_duration(
+                period_el.get("duration", "")
+            )
+        elif idx + 1 < len(period_elements) and period_elements[idx + 1].get("start"):
+            next_start = parse_iso_duration(period_elements[idx + 1].get("start", ""))
+            duration = next_start - start
+        elif total_duration:
+            duration = total_duration - start
+        else:
+            duration = None
+
+        alternates = _join_alternates(mpd_base, mpd_alternates, period_el)
+        base_url = _join_base(mpd_base, period_el)
+        template = _merge_template(None, period_el)
+        segment_base = _merge_segment_base(None, period_el)
+        segment_list = _merge_segment_list(None, period_el)
+        periods.append(
+            PeriodModel(
+                id=period_el.get("id", str(idx)),
+                start=start,
+                duration=duration,
+                adaptation_sets=tuple(
+                    _compile_adaptation_set(
+                        as_el,
+                        base_url,
+                        template,
+                        duration,
+                        segment_base,
+                        segment_list,
+                        alternates,
+                    )
+                    for as_el in period_el.iterfind(f"{_MPD}AdaptationSet")
+                ),
+                event_streams=_event_streams(period_el),
+                inband_event_schemes=_inband_event_schemes(period_el),
+            )
+        )
+
+    return ManifestModel(
+        source_url=manifest._source_url,
+        type=manifest.type,
+        duration=total_duration,
+        periods=tuple(periods),
+        availability_start_time=manifest.availability_start_time,
+        publish_time=manifest.publish_time,
+        minimum_update_period=manifest.minimum_update_period,
+        time_shift_buffer_depth=manifest.time_shift_buffer_depth,
+        suggested_presentation_delay=manifest.suggested_presentation_delay,
+        max_segment_duration=manifest.max_segment_duration,
+    )
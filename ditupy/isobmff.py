@@ -0,0 +1,479 @@
+import logging
+import mmap
+import os
+import struct
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class SidxReference:
+    """Una entrada del `sidx`: rango absoluto en el archivo y tiempo de presentación."""
+
+    offset: int
+    size: int
+    time: int
+    duration: int
+    is_index: bool = False
+
+    @property
+    def byte_range(self) -> Tuple[int, int]:
+        return self.offset, self.offset + self.size - 1
+
+
+@dataclass(frozen=True, slots=True)
+class SegmentIndex:
+    timescale: int
+    earliest_presentation_time: int
+    references: Tuple[SidxReference, ...]
+
+
+def iter_boxes(
+    data: bytes, offset: int = 0, end: Optional[int] = None
+) -> Iterator[Tuple[str, int, int, int]]:
+    """
+    Recorre las cajas de primer nivel en `data[offset:end]`.
+    Devuelve (tipo, inicio, inicio del payload, fin) de cada una. Una caja
+    truncada corta la iteración.
+    """
+    end = len(data) if end is None else end
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, offset)
+        header = 8
+        if size == 1:
+            if offset + 16 > end:
+                return
+            size = struct.unpack_from(">Q", data, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            return
+        yield box_type.decode("latin-1"), offset, offset + header, offset + size
+        offset += size
+
+
+def parse_sidx(data: bytes, box_offset: int = 0) -> Optional[SegmentIndex]:
+    """
+    Analiza una caja `sidx` que empieza en `data[0]`. `box_offset` es su
+    posición absoluta en el archivo, necesaria porque las referencias se
+    expresan relativas al primer byte posterior a la caja.
+    """
+    boxes = list(iter_boxes(data))
+    if not boxes or boxes[0][0] != "sidx":
+        return None
+    _, _, payload, box_end = boxes[0]
+
+    version = data[payload]
+    pos = payload + 8  # version + flags + reference_ID
+    timescale = struct.unpack_from(">I", data, pos)[0]
+    pos += 4
+    if version == 0:
+        earliest, first_offset = struct.unpack_from(">II", data, pos)
+        pos += 8
+    else:
+        earliest, first_offset = struct.unpack_from(">QQ", data, pos)
+        pos += 16
+    pos += 2  # reserved
+    count = struct.unpack_from(">H", data, pos)[0]
+    pos += 2
+
+    references: List[SidxReference] = []
+    offset = box_offset + box_end + first_offset
+    time = earliest
+    for _ in range(count):
+        if pos + 12 > box_end:
+            logger.warning("sidx truncado; se usan las referencias leídas.")
+            break
+        ref, duration, _sap = struct.unpack_from(">III", data, pos)
+        pos += 12
+        size = ref & 0x7FFFFFFF
+        references.append(
+            SidxReference(offset, size, time, duration, is_index=bool(ref >> 31))
+        )
+        offset += size
+        time += duration
+
+    return SegmentIndex(timescale, earliest, tuple(references))
+
+
+def find_sidx(data: bytes, base_offset: int = 0) -> Optional[SegmentIndex]:
+    """Busca el primer `sidx` de primer nivel en un bloque que empieza en `base_offset`."""
+    for box_type, start, _, end in iter_boxes(data):
+        if box_type == "sidx":
+            return parse_sidx(data[start:end], base_offset + start)
+    return None
+
+
+# Bytes fijos de una sample entry antes de sus cajas hijas (ISO/IEC 14496-12).
+_SAMPLE_ENTRY_HEADER = {"encv": 78, "enca": 28}
+
+
+def find_box(
+    data: bytes, path: Sequence[str], offset: int = 0, end: Optional[int] = None
+) -> Optional[Tuple[int, int]]:
+    """
+    Busca una caja anidada siguiendo `path` (p. ej. ("moov", "trak", "mdia")).
+    Devuelve (inicio del payload, fin) de la primera coincidencia.
+    """
+    for box_type, _, payload, box_end in iter_boxes(data, offset, end):
+        if box_type != path[0]:
+            continue
+        if len(path) == 1:
+            return payload, box_end
+        if box_type == "stsd":
+            payload += 8  # version + flags + entry_count
+        elif box_type in _SAMPLE_ENTRY_HEADER:
+            payload += _SAMPLE_ENTRY_HEADER[box_type]
+        found = find_box(data, path[1:], payload, box_end)
+        if found is not None:
+            return found
+    return None
+
+
+@dataclass(frozen=True, slots=True)
+class ProtectionInfo:
+    """Datos de `sinf` de un init cifrado: esquema (cenc, cbcs, ...) y KID por defecto."""
+
+    scheme: str
+    default_kid: str  # hex sin guiones, como las llaves de LicenseManager
+
+
+def find_protection(init: bytes) -> Optional[ProtectionInfo]:
+    """Lee esquema y KID del primer track cifrado del init, o None si está en claro."""
+    stsd = ("moov", "trak", "mdia", "minf", "stbl", "stsd")
+    for entry in _SAMPLE_ENTRY_HEADER:
+        sinf = find_box(init, (*stsd, entry, "sinf"))
+        if sinf is None:
+            continue
+        schm = find_box(init, ("schm",), *sinf)
+        tenc = find_box(init, ("schi", "tenc"), *sinf)
+        if schm is None or tenc is None:
+            return None
+        scheme = init[schm[0] + 4 : schm[0] + 8].decode("latin-1")
+        kid = init[tenc[0] + 8 : tenc[0] + 24]
+        return ProtectionInfo(scheme, kid.hex())
+    return None
+
+
+@dataclass(frozen=True, slots=True)
+class TrackInfo:
+    """Pista del `moov`: duración de `mdhd` (0 en fMP4) y valores por defecto de `trex`."""
+
+    track_id: int
+    handler: str  # "vide", "soun", ...
+    timescale: int
+    duration: int
+    default_sample_duration: int = 0
+    default_sample_size: int = 0
+
+
+@dataclass(frozen=True, slots=True)
+class FragmentInfo:
+    """Un `traf` de un `moof`: tiempo base (tfdt), duración y tamaño de sus muestras."""
+
+    offset: int  # posición del moof en el archivo
+    sequence: int
+    track_id: int
+    base_time: int
+    duration: int
+    samples: int
+    data_size: int
+
+
+@dataclass(frozen=True, slots=True)
+class MediaGap:
+    """
+    Discontinuidad entre dos fragmentos consecutivos de una pista.
+    kind: "time" (el tfdt salta hacia adelante) o "sequence" (falta algún mfhd).
+    """
+
+    kind: str
+    track_id: int
+    offset: int  # moof posterior al hueco
+    start: float
+    end: float
+    expected_sequence: int = 0
+    found_sequence: int = 0
+
+    @property
+    def seconds(self) -> float:
+        return self.end - self.start
+
+
+@dataclass(frozen=True, slots=True)
+class MediaInfo:
+    size: int
+    tracks: Tuple[TrackInfo, ...]
+    fragments: Tuple[FragmentInfo, ...]
+    truncated_at: Optional[int] = (
+        None  # fin de la última caja completa, si falta el resto
+    )
+
+    def track(self, track_id: int) -> Optional[TrackInfo]:
+        return next((t for t in self.tracks if t.track_id == track_id), None)
+
+    def track_duration(self, track_id: int) -> float:
+        """Duración en segundos: del primer tfdt al fin del último fragmento, o de mdhd."""
+        track = self.track(track_id)
+        if track is None or not track.timescale:
+            return 0.0
+        frags = [f for f in self.fragments if f.track_id == track_id]
+        if not frags:
+            return track.duration / track.timescale
+        start = min(f.base_time for f in frags)
+        end = max(f.base_time + f.duration for f in frags)
+        return (end - start) / track.timescale
+
+    @property
+    def duration(self) -> float:
+        return max((self.track_duration(t.track_id) for t in self.tracks), default=0.0)
+
+    def gaps(self, min_gap: float = 0.01) -> List[MediaGap]:
+        """
+        Huecos de tiempo (mayores a `min_gap` segundos) por pista y de
+        secuencia: el número de `mfhd` es del archivo, no de cada pista, así
+        que se controla en orden de aparición sobre todos los fragmentos.
+        """
+        gaps: List[MediaGap] = []
+        scales = {t.track_id: t.timescale or 1 for t in self.tracks}
+        last: Dict[int, FragmentInfo] = {}
+        previous: Optional[FragmentInfo] = None
+        for frag in self.fragments:
+            scale = scales.get(frag.track_id, 1)
+            before = last.get(frag.track_id)
+            expected = before.base_time + before.duration if before else frag.base_time
+            if before is not None and (frag.base_time - expected) / scale > min_gap:
+                gaps.append(
+                    MediaGap(
+                        "time",
+                        frag.track_id,
+                        frag.offset,
+                        expected / scale,
+                        frag.base_time / scale,
+                    )
+                )
+            if previous is not None and frag.sequence > previous.sequence + 1:
+                gaps.append(
+                    MediaGap(
+                        "sequence",
+                        frag.track_id,
+                        frag.offset,
+                        expected / scale,
+                        frag.base_time / scale,
+                        previous.sequence + 1,
+                        frag.sequence,
+                    )
+                )
+            last[frag.track_id] = frag
+            previous = frag
+        return gaps
+
+
+def _full_box(data, payload: int) -> Tuple[int, int, int]:
+    """(version, flags, inicio del contenido) de una FullBox."""
+    head = struct.unpack_from(">I", data, payload)[0]
+    return head >> 24, head & 0xFFFFFF, payload + 4
+
+
+def _parse_trak(data, start: int, end: int) -> Optional[Tuple[int, str, int, int]]:
+    tkhd = find_box(data, ("tkhd",), start, end)
+    mdhd = find_box(data, ("mdia", "mdhd"), start, end)
+    hdlr = find_box(data, ("mdia", "hdlr"), start, end)
+    if tkhd is None or mdhd is None:
+        return None
+    version, _, pos = _full_box(data, tkhd[0])
+    track_id = struct.unpack_from(">I", data, pos + (16 if version == 1 else 8))[0]
+    version, _, pos = _full_box(data, mdhd[0])
+    if version == 1:
+        timescale, duration = struct.unpack_from(">IQ", data, pos + 16)
+    else:
+        timescale, duration = struct.unpack_from(">II", data, pos + 8)
+    handler = ""
+    if hdlr is not None:
+        handler = bytes(data[hdlr[0] + 8 : hdlr[0] + 12]).decode("latin-1")
+    return track_id, handler, timescale, duration
+
+
+def parse_moov(data, start: int, end: int) -> List[TrackInfo]:
+    """Pistas de un `moov` (payload en `data[start:end]`), con los defaults de `mvex/trex`."""
+    defaults = {}
+    mvex = find_box(data, ("mvex",), start, end)
+    if mvex is not None:
+        for box_type, _, payload, box_end in iter_boxes(data, *mvex):
+            if box_type == "trex":
+                track_id, _, duration, size = struct.unpack_from(
+                    ">IIII", data, payload + 4
+                )
+                defaults[track_id] = (duration, size)
+
+    tracks = []
+    for box_type, _, payload, box_end in iter_boxes(data, start, end):
+        if box_type != "trak":
+            continue
+        parsed = _parse_trak(data, payload, box_end)
+        if parsed is None:
+            continue
+        track_id, handler, timescale, duration = parsed
+        sample_duration, sample_size = defaults.get(track_id, (0, 0))
+        tracks.append(
+            TrackInfo(
+                track_id, handler, timescale, duration, sample_duration, sample_size
+            )
+        )
+    return tracks
+
+
+# Campos opcionales de tfhd: (flag, bytes) en orden.
+_TFHD_FIELDS = ((0x1, 8), (0x2, 4), (0x8, 4), (0x10, 4), (0x20, 4))
+
+
+def _parse_traf(
+    data, start: int, end: int, defaults: Dict[int, Tuple[int, int]]
+) -> Optional[Tuple[int, int, int, int, int]]:
+    """(track_id, tfdt, duración, muestras, bytes) de un `traf`, en una pasada."""
+    track_id: Optional[int] = None
+    default_duration = default_size = 0
+    base_time = duration = samples = size = 0
+    for box_type, _, payload, box_end in iter_boxes(data, start, end):
+        if box_type == "tfhd":
+            _, flags, pos = _full_box(data, payload)
+            track_id = struct.unpack_from(">I", data, pos)[0]
+            pos += 4
+            default_duration, default_size = defaults.get(track_id, (0, 0))
+            for flag, width in _TFHD_FIELDS:
+                if flags & flag:
+                    if flag == 0x8:
+                        default_duration = struct.unpack_from(">I", data, pos)[0]
+                    elif flag == 0x10:
+                        default_size = struct.unpack_from(">I", data, pos)[0]
+                    pos += width
+        elif box_type == "tfdt":
+            version, _, pos = _full_box(data, payload)
+            base_time = struct.unpack_from(">Q" if version == 1 else ">I", data, pos)[0]
+        elif box_type == "trun":
+            _, flags, pos = _full_box(data, payload)
+            count = struct.unpack_from(">I", data, pos)[0]
+            pos += 4 + (4 if flags & 0x1 else 0) + (4 if flags & 0x4 else 0)
+            # Campos por muestra presentes (duración, tamaño, flags, cto).
+            fields = [bool(flags & f) for f in (0x100, 0x200, 0x400, 0x800)]
+            stride = sum(fields)
+            values: Tuple[int, ...] = ()
+            if count and stride and pos + 4 * stride * count <= box_end:
+                values = struct.unpack_from(f">{stride * count}I", data, pos)
+            if fields[0]:
+                duration += sum(values[0::stride])
+            else:
+                duration += default_duration * count
+            if fields[1]:
+                size += sum(values[int(fields[0]) :: stride])
+            else:
+                size += default_size * count
+            samples += count
+    if track_id is None:
+        return None
+    return track_id, base_time, duration, samples, size
+
+
+def parse_moof(
+    data, offset: int, start: int, end: int, defaults: Dict[int, Tuple[int, int]]
+) -> List[FragmentInfo]:
+    """Fragmentos (uno por `traf`) de un `moof` que empieza en `offset`."""
+    sequence = 0
+    fragments = []
+    for box_type, _, payload, box_end in iter_boxes(data, start, end):
+        if box_type == "mfhd":
+            sequence = struct.unpack_from(">I", data, payload + 4)[0]
+        if box_type != "traf":
+            continue
+        parsed = _parse_traf(data, payload, box_end, defaults)
+        if parsed is not None:
+            track_id, base_time, duration, samples, size = parsed
+            fragments.append(
+                FragmentInfo(
+                    offset, sequence, track_id, base_time, duration, samples, size
+                )
+            )
+    return fragments
+
+
+def inspect_boxes(data, tracks: Sequence[TrackInfo] = ()) -> MediaInfo:
+    """
+    Recorre sólo las cabeceras: `moov` (pistas) y cada `moof` (fragmentos);
+    los `mdat` se saltan por tamaño. `tracks` permite inspeccionar segmentos
+    sueltos con la información de su init.
+    """
+    found: List[TrackInfo] = list(tracks)
+    fragments: List[FragmentInfo] = []
+    last_end = 0
+    for box_type, start, payload, end in iter_boxes(data):
+        last_end = end
+        if box_type == "moov":
+            found = parse_moov(data, payload, end)
+        elif box_type == "moof":
+            defaults = {
+                t.track_id: (t.default_sample_duration, t.default_sample_size)
+                for t in found
+            }
+            fragments.extend(parse_moof(data, start, payload, end, defaults))
+    truncated = last_end if last_end < len(data) else None
+    return MediaInfo(len(data), tuple(found), tuple(fragments), truncated)
+
+
+def inspect_file(path, tracks: Sequence[TrackInfo] = ()) -> MediaInfo:
+    """`inspect_boxes` sobre el archivo mapeado en memoria (no se lee el contenido)."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return MediaInfo(0, tuple(tracks), ())
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return inspect_boxes(data, tracks)
+
+
+def read_init(path) -> bytes:
+    """
+    Cajas de `path` hasta el `moov` inclusive (ftyp, moov...), sin leer los
+    fragmentos que le siguen: sirve tanto para un init suelto como para un
+    fMP4 de horas. Vacío si no hay `moov`.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for box_type, _, _, end in iter_boxes(data):
+                if box_type == "moov":
+                    return data[:end]
+    return b""
+
+
+def check_fragment(data) -> Optional[str]:
+    """
+    Valida un segmento de medios recién descargado: cajas completas, al menos
+    un `moof` seguido de su `mdat` y muestras que caben en él. Retorna la
+    descripción del problema, o None si está bien.
+    """
+    last_end = 0
+    moof_data = None
+    has_moof = False
+    for box_type, start, payload, end in iter_boxes(data):
+        last_end = end
+        if box_type == "moof":
+            has_moof = True
+            moof_data = sum(
+                f.data_size for f in parse_moof(data, start, payload, end, {})
+            )
+        elif box_type == "mdat":
+            if moof_data is None:
+                return f"mdat sin moof en el byte {start}"
+            if moof_data > end - payload:
+                return f"mdat de {end - payload} bytes para {moof_data} de muestras"
+            moof_data = None
+    if last_end < len(data):
+        return f"caja incompleta o inválida en el byte {last_end} de {len(data)}"
+    if not has_moof:
+        return "sin moof"
+    if moof_data is not None:
+        return "moof sin mdat"
+    return None
@@ -87,6 +87,9 @@ def setup_logging(
         "selenium",
         "undetected_chromedriver",
         "hpack",
+        "httpx",
+        "httpcore",
+        "h2",
         "peewee",
         "pyrogram",
     ]
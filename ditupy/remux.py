@@ -0,0 +1,674 @@
+import heapq
+import logging
+import mmap
+import os
+import struct
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from ditupy.concat import (
+    CHUNK_SIZE,
+    UNSUPPORTED_ERRNOS,
+    O_BINARY,
+    Throttle,
+    preallocate,
+    read_at,
+)
+from ditupy.isobmff import find_box, find_protection, iter_boxes
+
+logger = logging.getLogger(__name__)
+
+_NON_SYNC = 0x10000  # sample_is_non_sync_sample en sample_flags
+_U32 = 0xFFFFFFFF
+
+
+def _box(kind: str, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), kind.encode()) + payload
+
+
+def _full_box(kind: str, version: int, flags: int, payload: bytes) -> bytes:
+    return _box(kind, struct.pack(">I", (version << 24) | flags) + payload)
+
+
+def _run_length(values: Sequence[int]) -> List[Tuple[int, int]]:
+    """[(repeticiones, valor), ...] para stts/ctts."""
+    entries: List[Tuple[int, int]] = []
+    for value in values:
+        if entries and entries[-1][1] == value:
+            entries[-1] = (entries[-1][0] + 1, value)
+        else:
+            entries.append((1, value))
+    return entries
+
+
+@dataclass(slots=True)
+class _Run:
+    """Un `trun`: muestras contiguas dentro del archivo de origen."""
+
+    source: int
+    offset: int
+    size: int
+    time: int
+    durations: List[int]
+    sizes: List[int]
+    flags: List[int]
+    ctos: List[int]
+
+
+@dataclass(slots=True)
+class _Fragment:
+    source: int
+    start: int  # moof
+    moof_end: int
+    end: int  # fin del mdat
+    time: int
+    mfhd: int  # posición relativa del sequence_number
+    # Por traf: posiciones relativas de track_ID y de base_data_offset.
+    tfhd: List[Tuple[int, Optional[int]]]
+    runs: List[_Run] = field(default_factory=list)
+
+
+def _full_header(data, payload: int) -> Tuple[int, int, int]:
+    head = struct.unpack_from(">I", data, payload)[0]
+    return head >> 24, head & 0xFFFFFF, payload + 4
+
+
+class _Track:
+    """
+    Pista de entrada: un init y fragmentos `moof`+`mdat` repartidos en uno o
+    más archivos (segmentos sueltos o una pista ya concatenada). Sólo se leen
+    cabeceras; los archivos se mapean de a uno.
+    """
+
+    def __init__(self, files: Sequence[Path]):
+        self.files = [Path(f) for f in files]
+        self.fragments: List[_Fragment] = []
+        if not self.files:
+            raise ValueError("Pista sin archivos.")
+        for number, path in enumerate(self.files):
+            with open(path, "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    continue
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    if number == 0:
+                        self._parse_init(data)
+                    self._parse_fragments(data, number)
+        if not self.fragments:
+            raise ValueError(f"{self.files[0].parent.name}: pista sin fragmentos.")
+
+    def _parse_init(self, data):
+        init_end = 0
+        for box_type, start, payload, end in iter_boxes(data):
+            if box_type == "ftyp":
+                self.ftyp = bytes(data[start:end])
+            elif box_type == "moov":
+                init_end = end
+                self._parse_moov(data, payload, end)
+                break
+        if not init_end:
+            raise ValueError(f"{self.files[0].name}: sin moov.")
+        if find_protection(bytes(data[:init_end])) is not None:
+            raise ValueError(f"{self.files[0].name}: pista cifrada.")
+
+    def _parse_moov(self, data, start: int, end: int):
+        traks = [b for b in iter_boxes(data, start, end) if b[0] == "trak"]
+        if len(traks) != 1:
+            raise ValueError(f"Se esperaba un trak por init, hay {len(traks)}.")
+        for box_type, box_start, _, box_end in iter_boxes(data, start, end):
+            if box_type == "mvhd":
+                self.mvhd = bytes(data[box_start:box_end])
+        _, trak_start, trak_payload, trak_end = traks[0]
+        self.trak = bytes(data[trak_start:trak_end])
+        base = trak_start
+
+        tkhd = find_box(data, ("tkhd",), trak_payload, trak_end)
+        mdhd = find_box(data, ("mdia", "mdhd"), trak_payload, trak_end)
+        hdlr = find_box(data, ("mdia", "hdlr"), trak_payload, trak_end)
+        if tkhd is None or mdhd is None or hdlr is None:
+            raise ValueError("trak sin tkhd/mdhd/hdlr.")
+        version, _, pos = _full_header(data, tkhd[0])
+        self.tkhd_id_pos = pos + (16 if version == 1 else 8) - base
+        self.track_id = struct.unpack_from(
+            ">I", data, pos + (16 if version == 1 else 8)
+        )[0]
+        version, _, pos = _full_header(data, mdhd[0])
+        self.timescale = struct.unpack_from(
+            ">I", data, pos + (16 if version == 1 else 8)
+        )[0]
+        self.handler = bytes(data[hdlr[0] + 8 : hdlr[0] + 12]).decode("latin-1")
+
+        self.trex = _full_box(
+            "trex", 0, 0, struct.pack(">IIIII", self.track_id, 1, 0, 0, 0)
+        )
+        self.defaults = (0, 0, 0)
+        mvex = find_box(data, ("mvex",), start, end)
+        if mvex is not None:
+            for box_type, box_start, payload, box_end in iter_boxes(data, *mvex):
+                if box_type != "trex":
+                    continue
+                values = struct.unpack_from(">IIIII", data, payload + 4)
+                if values[0] == self.track_id:
+                    self.trex = bytes(data[box_start:box_end])
+                    self.defaults = values[2:5]
+
+    def _parse_fragments(self, data, source: int):
+        fragment: Optional[_Fragment] = None
+        for box_type, start, payload, end in iter_boxes(data):
+            if box_type == "moof":
+                fragment = self._parse_moof(data, source, start, payload, end)
+            elif box_type == "mdat" and fragment is not None:
+                fragment.end = end
+                self.fragments.append(fragment)
+                fragment = None
+
+    def _parse_moof(
+        self, data, source: int, start: int, payload: int, end: int
+    ) -> _Fragment:
+        fragment = _Fragment(source, start, end, end, 0, 0, [])
+        first_time: Optional[int] = None
+        for box_type, _, child, child_end in iter_boxes(data, payload, end):
+            if box_type == "mfhd":
+                fragment.mfhd = child + 4 - start
+            elif box_type == "traf":
+                time = self._parse_traf(data, fragment, child, child_end)
+                first_time = time if first_time is None else first_time
+        fragment.time = first_time or 0
+        return fragment
+
+    def _parse_traf(self, data, fragment: _Fragment, start: int, end: int) -> int:
+        default_duration, default_size, default_flags = self.defaults
+        base = fragment.start
+        time = 0
+        next_offset: Optional[int] = None
+        for box_type, _, payload, _ in iter_boxes(data, start, end):
+            if box_type == "tfhd":
+                _, flags, pos = _full_header(data, payload)
+                id_pos, base_pos = pos, None
+                pos += 4
+                if flags & 0x1:
+                    base_pos = pos
+                    base = struct.unpack_from(">Q", data, pos)[0]
+                    pos += 8
+                if flags & 0x2:
+                    pos += 4
+                if flags & 0x8:
+                    default_duration = struct.unpack_from(">I", data, pos)[0]
+                    pos += 4
+                if flags & 0x10:
+                    default_size = struct.unpack_from(">I", data, pos)[0]
+                    pos += 4
+                if flags & 0x20:
+                    default_flags = struct.unpack_from(">I", data, pos)[0]
+                fragment.tfhd.append(
+                    (
+                        id_pos - fragment.start,
+                        None if base_pos is None else base_pos - fragment.start,
+                    )
+                )
+            elif box_type == "tfdt":
+                version, _, pos = _full_header(data, payload)
+                time = struct.unpack_from(">Q" if version == 1 else ">I", data, pos)[0]
+            elif box_type == "trun":
+                run = self._parse_trun(
+                    data,
+                    payload,
+                    fragment.source,
+                    base,
+                    next_offset,
+                    time,
+                    (default_duration, default_size, default_flags),
+                )
+                fragment.runs.append(run)
+                next_offset = run.offset + run.size
+                time += sum(run.durations)
+        return fragment.runs[0].time if fragment.runs else time
+
+    @staticmethod
+    def _parse_trun(
+        data,
+        payload: int,
+        source: int,
+        base: int,
+        next_offset: Optional[int],
+        time: int,
+        defaults: Tuple[int, int, int],
+    ) -> _Run:
+        version, flags, pos = _full_header(data, payload)
+        count = struct.unpack_from(">I", data, pos)[0]
+        pos += 4
+        offset = next_offset if next_offset is not None else base
+        if flags & 0x1:
+            offset = base + struct.unpack_from(">i", data, pos)[0]
+            pos += 4
+        first_flags = None
+        if flags & 0x4:
+            first_flags = struct.unpack_from(">I", data, pos)[0]
+            pos += 4
+
+        present = [bool(flags & f) for f in (0x100, 0x200, 0x400, 0x800)]
+        stride = sum(present)
+        values = struct.unpack_from(f">{stride * count}I", data, pos) if stride else ()
+        columns = []
+        column = 0
+        for index, default in enumerate(defaults + (0,)):
+            if present[index]:
+                columns.append(list(values[column::stride]))
+                column += 1
+            else:
+                columns.append([default] * count)
+        durations, sizes, sample_flags, ctos = columns
+        if first_flags is not None and count:
+            sample_flags[0] = first_flags
+        if version == 1 and present[3]:
+            ctos = [c - (1 << 32) if c & 0x80000000 else c for c in ctos]
+        return _Run(
+            source, offset, sum(sizes), time, durations, sizes, sample_flags, ctos
+        )
+
+
+class _Writer:
+    """Salida secuencial; los datos de muestras se copian en el kernel si se puede."""
+
+    def __init__(self, path: Path, size: int, throttle: Throttle = None):
+        self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | O_BINARY, 0o644)
+        preallocate(self.fd, size)
+        self.position = 0
+        self.throttle = throttle
+        self._sources: Dict[Path, int] = {}
+        self._kernel_copy = hasattr(os, "copy_file_range")
+
+    def write(self, data: bytes):
+        view = memoryview(data)
+        while view:
+            n = os.write(self.fd, view)
+            view = view[n:]
+            if self.throttle is not None:
+                self.throttle(n)
+        self.position += len(data)
+
+    def _source(self, path: Path) -> int:
+        fd = self._sources.get(path)
+        if fd is None:
+            # Se mantiene abierto a lo sumo un archivo por pista a la vez.
+            for other in [p for p in self._sources if p.parent == path.parent]:
+                os.close(self._sources.pop(other))
+            fd = self._sources[path] = os.open(path, os.O_RDONLY | O_BINARY)
+        return fd
+
+    def copy(self, path: Path, offset: int, size: int):
+        src = self._source(path)
+        end = offset + size
+        # Con throttle se copia por bloques para descontar a medida que se avanza.
+        step = CHUNK_SIZE if self.throttle is not None else size
+        while offset < end:
+            if self._kernel_copy:
+                try:
+                    n = os.copy_file_range(
+                        src, self.fd, min(step, end - offset), offset
+                    )
+                except OSError as e:
+                    if e.errno not in UNSUPPORTED_ERRNOS:
+                        raise
+                    self._kernel_copy = False
+                    continue
+                self.position += n
+                if self.throttle is not None:
+                    self.throttle(n)
+            else:
+                data = read_at(src, min(CHUNK_SIZE, end - offset), offset)
+                self.write(data)
+                n = len(data)
+            if n == 0:
+                raise ValueError(f"{path.name}: datos cortos en el byte {offset}")
+            offset += n
+
+    def close(self):
+        for fd in self._sources.values():
+            os.close(fd)
+        os.ftruncate(self.fd, self.position)
+        os.close(self.fd)
+
+
+def _patch_u32(data: bytearray, pos: int, value: int):
+    struct.pack_into(">I", data, pos, value)
+
+
+def _version1(box: bytes, time_fields: int, mid: int, duration: int) -> bytes:
+    """
+    Reescribe mvhd/tkhd/mdhd en versión 1 con otra duración. `time_fields`
+    es la cantidad de campos de fecha (2) y `mid` los bytes fijos entre las
+    fechas y la duración (timescale o track_ID + reservado).
+    """
+    kind = box[4:8].decode()
+    version, flags = box[8], int.from_bytes(box[9:12], "big")
+    pos = 12
+    width = 8 if version == 1 else 4
+    dates = [
+        int.from_bytes(box[pos + i * width : pos + (i + 1) * width], "big")
+        for i in range(time_fields)
+    ]
+    pos += time_fields * width
+    middle = box[pos : pos + mid]
+    rest = box[pos + mid + width :]
+    payload = b"".join(d.to_bytes(8, "big") for d in dates) + middle
+    return _full_box(kind, 1, flags, payload + duration.to_bytes(8, "big") + rest)
+
+
+def _interleave(tracks: List[_Track]) -> List[Tuple[int, _Fragment]]:
+    """
+    Orden de salida: cada pista conserva el orden de sus archivos y entre
+    pistas se intercala por tiempo de decodificación en segundos. Si el tfdt
+    de una pista retrocede (por ejemplo, al reiniciarse en un cambio de
+    Period) no hay orden fiable y se deja el trabajo a FFmpeg.
+    """
+    queues = []
+    for index, track in enumerate(tracks):
+        previous = None
+        for fragment in track.fragments:
+            if previous is not None and fragment.time < previous:
+                raise ValueError(
+                    f"{track.files[0].parent.name}: el tfdt retrocede "
+                    f"({previous} -> {fragment.time})."
+                )
+            previous = fragment.time
+        queues.append([(f.time / track.timescale, index, f) for f in track.fragments])
+    merged = heapq.merge(*queues, key=lambda item: (item[0], item[1]))
+    return [(index, fragment) for _, index, fragment in merged]
+
+
+def _ftyp(fragmented: bool) -> bytes:
+    brands = [b"iso6", b"isom", b"mp41"] if fragmented else [b"isom", b"iso2", b"mp41"]
+    major = brands[0]
+    return _box("ftyp", major + struct.pack(">I", 0x200) + b"".join(brands))
+
+
+def _mvhd(track: _Track, next_track_id: int, duration: Optional[int] = None) -> bytes:
+    box = track.mvhd
+    if duration is not None:
+        box = _version1(box, 2, 4, duration)
+    data = bytearray(box)
+    _patch_u32(data, len(data) - 4, next_track_id)
+    return bytes(data)
+
+
+def _write_fragmented(
+    tracks: List[_Track], output: Path, throttle: Throttle = None
+) -> int:
+    traks, trexes = [], []
+    for new_id, track in enumerate(tracks, start=1):
+        trak = bytearray(track.trak)
+        _patch_u32(trak, track.tkhd_id_pos, new_id)
+        traks.append(bytes(trak))
+        trex = bytearray(track.trex)
+        _patch_u32(trex, 12, new_id)
+        trexes.append(bytes(trex))
+    moov = _box(
+        "moov",
+        _mvhd(tracks[0], len(tracks) + 1)
+        + b"".join(traks)
+        + _box("mvex", b"".join(trexes)),
+    )
+    header = _ftyp(True) + moov
+    total = len(header) + sum(f.end - f.start for t in tracks for f in t.fragments)
+
+    writer = _Writer(output, total, throttle)
+    try:
+        writer.write(header)
+        for sequence, (index, fragment) in enumerate(_interleave(tracks), start=1):
+            track = tracks[index]
+            path = track.files[fragment.source]
+            with open(path, "rb") as f:
+                f.seek(fragment.start)
+                moof = bytearray(f.read(fragment.moof_end - fragment.start))
+            _patch_u32(moof, fragment.mfhd, sequence)
+            for id_pos, base_pos in fragment.tfhd:
+                _patch_u32(moof, id_pos, index + 1)
+                if base_pos is not None:
+                    old = struct.unpack_from(">Q", moof, base_pos)[0]
+                    new = old - fragment.start + writer.position
+                    struct.pack_into(">Q", moof, base_pos, new)
+            writer.write(bytes(moof))
+            writer.copy(path, fragment.moof_end, fragment.end - fragment.moof_end)
+    finally:
+        writer.close()
+    return writer.position
+
+
+def _sample_tables(runs: List[_Run], offsets: List[int]) -> bytes:
+    """stbl sin stsd: stts, ctts, stss, stsc, stsz y stco/co64 (un chunk por trun)."""
+    durations = [d for run in runs for d in run.durations]
+    sizes = [s for run in runs for s in run.sizes]
+    flags = [f for run in runs for f in run.flags]
+    ctos = [c for run in runs for c in run.ctos]
+
+    stts = _run_length(durations)
+    boxes = [
+        _full_box(
+            "stts",
+            0,
+            0,
+            struct.pack(
+                f">I{2 * len(stts)}I", len(stts), *(v for e in stts for v in e)
+            ),
+        )
+    ]
+    if any(ctos):
+        ctts = _run_length(ctos)
+        version = 1 if any(c < 0 for c in ctos) else 0
+        fmt = "i" if version else "I"
+        boxes.append(
+            _full_box(
+                "ctts",
+                version,
+                0,
+                struct.pack(">I", len(ctts))
+                + b"".join(struct.pack(f">I{fmt}", n, v) for n, v in ctts),
+            )
+        )
+    sync = [i + 1 for i, f in enumerate(flags) if not f & _NON_SYNC]
+    if len(sync) != len(flags):
+        boxes.append(
+            _full_box("stss", 0, 0, struct.pack(f">I{len(sync)}I", len(sync), *sync))
+        )
+
+    stsc: List[Tuple[int, int]] = []
+    for chunk, run in enumerate(runs, start=1):
+        if not stsc or stsc[-1][1] != len(run.durations):
+            stsc.append((chunk, len(run.durations)))
+    boxes.append(
+        _full_box(
+            "stsc",
+            0,
+            0,
+            struct.pack(">I", len(stsc))
+            + b"".join(struct.pack(">III", c, n, 1) for c, n in stsc),
+        )
+    )
+    boxes.append(
+        _full_box("stsz", 0, 0, struct.pack(f">II{len(sizes)}I", 0, len(sizes), *sizes))
+    )
+    if offsets and max(offsets) > _U32:
+        boxes.append(
+            _full_box(
+                "co64", 0, 0, struct.pack(f">I{len(offsets)}Q", len(offsets), *offsets)
+            )
+        )
+    else:
+        boxes.append(
+            _full_box(
+                "stco", 0, 0, struct.pack(f">I{len(offsets)}I", len(offsets), *offsets)
+            )
+        )
+    return b"".join(boxes)
+
+
+def _faststart_trak(
+    track: _Track,
+    new_id: int,
+    runs: List[_Run],
+    offsets: List[int],
+    movie_timescale: int,
+    delay: float,
+) -> bytes:
+    """Reconstruye el trak del init con tablas de muestras en lugar de fragmentos."""
+    media_duration = sum(sum(run.durations) for run in runs)
+    movie_duration = round(media_duration * movie_timescale / track.timescale)
+    data = track.trak
+
+    # Edit list: retraso respecto de la pista que empieza antes y el
+    # desplazamiento de composición de la primera muestra (B-frames).
+    edits = []
+    if delay > 0:
+        edits.append(struct.pack(">Qqi", round(delay * movie_timescale), -1, 1 << 16))
+    first_cto = runs[0].ctos[0] if runs and runs[0].ctos else 0
+    edits.append(struct.pack(">Qqi", movie_duration, max(first_cto, 0), 1 << 16))
+    edts = _box(
+        "edts", _full_box("elst", 1, 0, struct.pack(">I", len(edits)) + b"".join(edits))
+    )
+
+    children = []
+    for box_type, start, payload, end in iter_boxes(data, 8, len(data)):
+        if box_type == "tkhd":
+            tkhd = bytearray(_version1(data[start:end], 2, 8, movie_duration))
+            _patch_u32(tkhd, 28, new_id)
+            children.append(bytes(tkhd) + edts)
+        elif box_type == "mdia":
+            children.append(
+                _box(
+                    "mdia",
+                    _faststart_mdia(data, payload, end, media_duration, runs, offsets),
+                )
+            )
+        elif box_type != "edts":
+            children.append(data[start:end])
+    return _box("trak", b"".join(children))
+
+
+def _faststart_mdia(
+    data: bytes,
+    start: int,
+    end: int,
+    duration: int,
+    runs: List[_Run],
+    offsets: List[int],
+) -> bytes:
+    children = []
+    for box_type, box_start, payload, box_end in iter_boxes(data, start, end):
+        if box_type == "mdhd":
+            children.append(_version1(data[box_start:box_end], 2, 4, duration))
+        elif box_type == "minf":
+            minf = []
+            for kind, s, p, e in iter_boxes(data, payload, box_end):
+                if kind != "stbl":
+                    minf.append(data[s:e])
+                    continue
+                stsd = find_box(data, ("stsd",), p, e)
+                if stsd is None:
+                    raise ValueError("stbl sin stsd.")
+                stsd_box = data[stsd[0] - 8 : stsd[1]]
+                minf.append(_box("stbl", stsd_box + _sample_tables(runs, offsets)))
+            children.append(_box("minf", b"".join(minf)))
+        else:
+            children.append(data[box_start:box_end])
+    return b"".join(children)
+
+
+def _write_faststart(
+    tracks: List[_Track], output: Path, throttle: Throttle = None
+) -> int:
+    order = _interleave(tracks)
+    runs_by_track: List[List[_Run]] = [[] for _ in tracks]
+    chunks: List[Tuple[int, _Run]] = []
+    for index, fragment in order:
+        for run in fragment.runs:
+            runs_by_track[index].append(run)
+            chunks.append((index, run))
+
+    mvhd = tracks[0].mvhd
+    movie_timescale = struct.unpack_from(">I", mvhd, 20 if mvhd[8] == 0 else 28)[0]
+    movie_timescale = movie_timescale or 1000
+    starts = [runs[0].time / t.timescale for t, runs in zip(tracks, runs_by_track)]
+    data_size = sum(run.size for _, run in chunks)
+    mdat_header = 16 if data_size + 8 > _U32 else 8
+
+    def build_moov(offsets_by_track: List[List[int]]) -> bytes:
+        movie_duration = max(
+            round(sum(sum(r.durations) for r in runs) * movie_timescale / t.timescale)
+            + round((start - min(starts)) * movie_timescale)
+            for t, runs, start in zip(tracks, runs_by_track, starts)
+        )
+        traks = [
+            _faststart_trak(
+                track,
+                number + 1,
+                runs_by_track[number],
+                offsets_by_track[number],
+                movie_timescale,
+                starts[number] - min(starts),
+            )
+            for number, track in enumerate(tracks)
+        ]
+        return _box(
+            "moov",
+            _mvhd(tracks[0], len(tracks) + 1, movie_duration) + b"".join(traks),
+        )
+
+    def layout(mdat_start: int) -> List[List[int]]:
+        offsets: List[List[int]] = [[] for _ in tracks]
+        position = mdat_start
+        for index, run in chunks:
+            offsets[index].append(position)
+            position += run.size
+        return offsets
+
+    ftyp = _ftyp(False)
+    # El tamaño del moov depende de si los offsets caben en 32 bits: se
+    # construye con offsets provisorios y luego con los definitivos.
+    moov = build_moov(layout(1 << 33 if data_size + 8 > _U32 else 0))
+    offsets = layout(len(ftyp) + len(moov) + mdat_header)
+    moov = build_moov(offsets)
+
+    if mdat_header == 16:
+        mdat = struct.pack(">I4sQ", 1, b"mdat", data_size + 16)
+    else:
+        mdat = struct.pack(">I4s", data_size + 8, b"mdat")
+    writer = _Writer(output, len(ftyp) + len(moov) + len(mdat) + data_size, throttle)
+    try:
+        writer.write(ftyp + moov + mdat)
+        for index, run in chunks:
+            writer.copy(tracks[index].files[run.source], run.offset, run.size)
+    finally:
+        writer.close()
+    return writer.position
+
+
+def remux(
+    tracks: Sequence[Sequence[Path]],
+    output_path: Path,
+    fragmented: bool = False,
+    throttle: Throttle = None,
+) -> int:
+    """
+    Une pistas fMP4 sin cifrar (cada una: init + segmentos, o un solo archivo
+    ya concatenado) en un MP4, sin recodificar y en una sola pasada de
+    escritura. Con `fragmented` se copian los moof/mdat intercalados por
+    tiempo; si no, se arma un MP4 con el moov al principio a partir de las
+    tablas `trun`. `throttle` recibe los bytes de cada bloque escrito.
+    Retorna los bytes escritos.
+
+    Lanza ValueError si la entrada no se puede remuxar aquí (cifrada, sin
+    init, varios tracks por init, datos cortos); FFmpeg queda como respaldo.
+    """
+    parsed = [_Track(files) for files in tracks]
+    logger.info(
+        f"Remux interno ({'fragmentado' if fragmented else 'faststart'}): "
+        + ", ".join(f"{t.handler} {len(t.fragments)} fragmentos" for t in parsed)
+    )
+    try:
+        if fragmented:
+            return _write_fragmented(parsed, output_path, throttle)
+        return _write_faststart(parsed, output_path, throttle)
+    except Exception:
+        Path(output_path).unlink(missing_ok=True)
+        raise
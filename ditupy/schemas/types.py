@@ -36,11 +36,25 @@ class DRMInfo(BaseModel):
     pssh_widevine: str
 
 
+class ClipInfo(BaseModel):
+    """Recorte [start, end) pedido y desfase de cada pista respecto a su primer segmento."""
+
+    start: float
+    end: float
+    video_offset: float
+    audio_offset: float
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
 class StreamInfo(BaseModel):
     height: int
     duration: float
     width: Optional[int] = None
     pssh: Optional[str] = None
+    estimated_bytes: Optional[int] = None
 
 
 # from typing import List, Optional
@@ -0,0 +1,135 @@
+import base64
+import binascii
+import logging
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCTE35_SCHEMES = (
+    "urn:scte:scte35:2013:xml",
+    "urn:scte:scte35:2013:bin",
+    "urn:scte:scte35:2014:xml+bin",
+)
+
+SPLICE_INSERT = 0x05
+TIME_SIGNAL = 0x06
+
+# segmentation_type_id que abren una pausa publicitaria (SCTE 35, tabla 22).
+AD_START_SEGMENTATION_TYPES = frozenset(
+    {0x22, 0x30, 0x32, 0x34, 0x36, 0x38, 0x3A, 0x3C, 0x44, 0x46}
+)
+# ... y los que marcan contenido de programa.
+PROGRAM_SEGMENTATION_TYPES = frozenset({0x10, 0x11, 0x14, 0x17, 0x19})
+
+
+@dataclass(frozen=True, slots=True)
+class SpliceSignal:
+    """Resumen de un splice_info_section: sólo lo necesario para clasificar."""
+
+    command_type: int
+    out_of_network: Optional[bool] = None
+    segmentation_type_ids: Tuple[int, ...] = ()
+
+    @property
+    def is_ad_start(self) -> bool:
+        if self.command_type == SPLICE_INSERT and self.out_of_network:
+            return True
+        return any(t in AD_START_SEGMENTATION_TYPES for t in self.segmentation_type_ids)
+
+    @property
+    def is_program(self) -> bool:
+        if self.command_type == SPLICE_INSERT and self.out_of_network is False:
+            return True
+        return any(t in PROGRAM_SEGMENTATION_TYPES for t in self.segmentation_type_ids)
+
+
+def parse_splice_info(data: bytes) -> Optional[SpliceSignal]:
+    """
+    Decodifica lo mínimo de un splice_info_section binario: tipo de comando,
+    out_of_network_indicator (splice_insert) y segmentation_type_id de los
+    descriptores (time_signal). Devuelve None si el payload no es válido.
+    """
+    try:
+        if len(data) < 14 or data[0] != 0xFC:
+            return None
+        command_length = ((data[11] & 0x0F) << 8) | data[12]
+        command_type = data[13]
+        pos = 14
+
+        out_of_network = None
+        if command_type == SPLICE_INSERT:
+            cancel = data[pos + 4] & 0x80
+            if not cancel:
+                out_of_network = bool(data[pos + 5] & 0x80)
+
+        if command_length == 0xFFF:
+            # Longitud no especificada: sólo se puede confiar en splice_insert.
+            return SpliceSignal(command_type, out_of_network)
+
+        pos += command_length
+        loop_length = (data[pos] << 8) | data[pos + 1]
+        pos += 2
+        end = pos + loop_length
+
+        types = []
+        while pos + 2 <= end:
+            tag, length = data[pos], data[pos + 1]
+            body = data[pos + 2 : pos + 2 + length]
+            pos += 2 + length
+            if tag != 0x02 or body[:4] != b"CUEI" or len(body) < 9:
+                continue
+            if body[8] & 0x80:  # segmentation_event_cancel_indicator
+                continue
+            flags = body[9]
+            offset = 10
+            if not flags & 0x80:  # program_segmentation_flag == 0
+                offset += 1 + 6 * body[offset]
+            if flags & 0x40:  # segmentation_duration_flag
+                offset += 5
+            upid_length = body[offset + 1]
+            offset += 2 + upid_length
+            if offset < len(body):
+                types.append(body[offset])
+
+        return SpliceSignal(command_type, out_of_network, tuple(types))
+    except IndexError:
+        logger.debug("splice_info_section truncado.")
+        return None
+
+
+def parse_event_signal(event: ET.Element) -> Optional[SpliceSignal]:
+    """
+    Extrae la señal SCTE-35 de un <Event> de un EventStream, ya sea en forma
+    XML (<SpliceInfoSection>) o binaria (<Binary> / @messageData en base64).
+    """
+    for el in event.iter():
+        tag = el.tag.rsplit("}", 1)[-1]
+        if tag == "Binary" and el.text:
+            return _decode_b64(el.text)
+        if tag == "SpliceInsert":
+            value = el.get("outOfNetworkIndicator")
+            return SpliceSignal(
+                SPLICE_INSERT,
+                None if value is None else value.lower() in ("true", "1"),
+            )
+        if tag == "TimeSignal":
+            types = tuple(
+                int(d.get("segmentationTypeId", "0"))
+                for d in event.iter()
+                if d.tag.rsplit("}", 1)[-1] == "SegmentationDescriptor"
+            )
+            return SpliceSignal(TIME_SIGNAL, None, types)
+
+    message = event.get("messageData") or (event.text or "").strip()
+    if message:
+        return _decode_b64(message)
+    return None
+
+
+def _decode_b64(text: str) -> Optional[SpliceSignal]:
+    try:
+        return parse_splice_info(base64.b64decode(text.strip()))
+    except (binascii.Error, ValueError):
+        return None
@@ -0,0 +1,226 @@
+import errno
+import logging
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Holgura sobre bandwidth x duración: el bitrate declarado es un promedio.
+ESTIMATE_MARGIN = 1.1
+
+
+def streaming_available() -> bool:
+    """
+    True si el post-procesado puede alimentar FFmpeg por FIFOs (ver
+    `PostProcessor._stream_keys`). Sin mkfifo (Windows) o sin ffmpeg, una
+    pista cifrada pasa por la ruta con archivos.
+    """
+    return hasattr(os, "mkfifo") and shutil.which("ffmpeg") is not None
+
+
+def peak_factor(
+    encrypted: bool, streaming: Optional[bool] = None, low_disk: bool = False
+) -> float:
+    """
+    Pico de disco de un trabajo completo (descarga + post-procesado) como
+    múltiplo del contenido. Remux interno, streaming y poco disco conviven con
+    los segmentos y la salida (2x); la ruta con archivos sin poco disco suma
+    la pista unida y la descifrada (4x). Sin `streaming` se usa lo que este
+    equipo permite (`streaming_available`).
+    """
+    if streaming is None:
+        streaming = streaming_available()
+    if not encrypted or streaming or low_disk:
+        return 2.0
+    return 4.0
+
+
+def estimate_job_bytes(
+    bandwidth: int,
+    duration: float,
+    factor: float = 2.0,
+    margin: float = ESTIMATE_MARGIN,
+) -> int:
+    """Bytes que necesita un trabajo: bandwidth (bps) x duración, por el pico y la holgura."""
+    return int(bandwidth * duration / 8 * factor * margin)
+
+
+def directory_size(path: Path) -> int:
+    """Bytes de los archivos bajo `path` (0 si no existe)."""
+    total = 0
+    stack = [Path(path)]
+    while stack:
+        try:
+            entries = list(os.scandir(stack.pop()))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(Path(entry.path))
+                elif entry.is_file(follow_symlinks=False):
+                    total += entry.stat().st_size
+            except OSError:
+                continue
+    return total
+
+
+def free_space(path: Path) -> int:
+    """Espacio libre en el sistema de archivos de `path` (o de su primer ancestro existente)."""
+    path = Path(path).absolute()
+    while not path.exists():
+        path = path.parent
+    return shutil.disk_usage(path).free
+
+
+def _no_space(message: str) -> OSError:
+    return OSError(errno.ENOSPC, message)
+
+
+def check_free_space(path: Path, needed: int, reserve: int = 0, label: str = ""):
+    """
+    Preflight de un trabajo suelto: lanza OSError(ENOSPC) si lo que falta
+    escribir (`needed` menos lo que ya hay en `path`, p. ej. al reanudar) no
+    cabe en el espacio libre dejando `reserve` bytes.
+    """
+    remaining = max(0, needed - directory_size(path))
+    free = free_space(path)
+    if remaining + reserve > free:
+        raise _no_space(
+            f"{label or Path(path).name}: se necesitan ~{remaining / 1024**3:.2f} GB "
+            f"y hay {free / 1024**3:.2f} GB libres."
+        )
+    logger.info(
+        f"Espacio: ~{remaining / 1024**3:.2f} GB necesarios, "
+        f"{free / 1024**3:.2f} GB libres."
+    )
+
+
+class DiskReservation:
+    """Espacio reservado para un trabajo hasta que termina su post-procesado."""
+
+    def __init__(self, budget: "DiskBudget", path: Path, nbytes: int):
+        self.budget = budget
+        self.path = Path(path)
+        self.nbytes = nbytes
+        self.released = False
+
+    def outstanding(self, used: Optional[int] = None) -> int:
+        """Lo que el trabajo todavía puede escribir: reserva menos lo ya escrito."""
+        used = directory_size(self.path) if used is None else used
+        return max(0, self.nbytes - used)
+
+    def release(self):
+        self.budget._release(self)
+
+    def release_when(self, future: Future):
+        """Libera la reserva al completarse `future` (p. ej. el de PostProcessExecutor)."""
+        future.add_done_callback(lambda _: self.release())
+
+    def __enter__(self) -> "DiskReservation":
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class DiskBudget:
+    """
+    Admisión de trabajos según el disco. Cada trabajo reserva su estimación
+    (ver `estimate_job_bytes`) y sólo entra si cabe en el espacio libre menos
+    lo que los trabajos ya admitidos todavía van a escribir y un margen fijo.
+    El espacio libre se relee en cada decisión, así que cuenta también lo que
+    otros procesos escriben o borran.
+    """
+
+    def __init__(
+        self, path: Union[Path, str], reserve: int = 1024**3, poll: float = 5.0
+    ):
+        """
+        :param path: Carpeta de descargas (cualquiera del sistema de archivos).
+        :param reserve: Bytes que siempre quedan libres.
+        :param poll: Cada cuántos segundos se reevalúa una admisión en espera
+                     aunque ninguna reserva se haya liberado.
+        """
+        self.path = Path(path)
+        self.reserve = reserve
+        self.poll = poll
+        self._active: List[DiskReservation] = []
+        self._cond = threading.Condition()
+
+    def _available(self) -> Tuple[int, int]:
+        """
+        (disponible ya, máximo alcanzable): lo libre menos lo que los trabajos
+        admitidos aún van a escribir, y lo libre si todos terminaran y
+        borraran lo suyo.
+        """
+        free = free_space(self.path) - self.reserve
+        committed = ceiling = 0
+        for reservation in self._active:
+            used = directory_size(reservation.path)
+            committed += reservation.outstanding(used)
+            ceiling += used
+        return free - committed, free + ceiling
+
+    def acquire(
+        self,
+        job_path: Union[Path, str],
+        nbytes: int,
+        wait: bool = True,
+        timeout: Optional[float] = None,
+    ) -> DiskReservation:
+        """
+        Reserva `nbytes` para el trabajo en `job_path`. Con `wait` espera a que
+        otros trabajos liberen espacio; lanza OSError(ENOSPC) si no cabe y no
+        se espera, si vence `timeout` o si no cabría ni con el disco sin otros
+        trabajos.
+        """
+        reservation = DiskReservation(self, Path(job_path), nbytes)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        waiting = False
+        with self._cond:
+            while True:
+                # Lo ya escrito en la carpeta (reanudación) no vuelve a pedirse.
+                needed = reservation.outstanding()
+                available, ceiling = self._available()
+                if needed <= available:
+                    self._active.append(reservation)
+                    logger.info(
+                        f"Admitido {reservation.path.name}: ~{needed / 1024**3:.2f} GB "
+                        f"de {available / 1024**3:.2f} GB disponibles."
+                    )
+                    return reservation
+                message = (
+                    f"{reservation.path.name}: se necesitan ~{needed / 1024**3:.2f} GB "
+                    f"y hay {available / 1024**3:.2f} GB disponibles"
+                )
+                if needed > ceiling:
+                    # Ni liberando todo lo de los demás trabajos alcanzaría.
+                    raise _no_space(f"{message}.")
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if not wait or (remaining is not None and remaining <= 0):
+                    raise _no_space(f"{message} ({len(self._active)} en curso).")
+                if not waiting:
+                    logger.info(f"En espera de disco: {message}.")
+                    waiting = True
+                self._cond.wait(
+                    self.poll if remaining is None else min(self.poll, remaining)
+                )
+
+    def _release(self, reservation: DiskReservation):
+        with self._cond:
+            if reservation.released:
+                return
+            reservation.released = True
+            self._active.remove(reservation)
+            self._cond.notify_all()
+
+    @property
+    def active(self) -> int:
+        with self._cond:
+            return len(self._active)
@@ -1,28 +1,380 @@
 import logging
-from concurrent.futures import ThreadPoolExecutor
+import re
+import threading
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from functools import partial
 from pathlib import Path
-from typing import Union
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
 from urllib.parse import urlparse
 
 import requests
+from requests.adapters import HTTPAdapter
+
+from ditupy.dash import Segment
+from ditupy.dash_model import RepresentationModel
+from ditupy.isobmff import check_fragment, find_sidx, iter_boxes
+from ditupy.services.hedging import HedgePolicy, Straggler
+from ditupy.services.http2 import HTTP2_AVAILABLE, Http2Adapter
+from ditupy.services.track_index import IndexEntry, TrackIndex
 
 logger = logging.getLogger(__name__)
 
 
+# Bytes leídos del inicio del archivo cuando el MPD no declara indexRange.
+_SIDX_PROBE_BYTES = 64 * 1024
+
+# Presupuesto por defecto de bytes en memoria de un descargador.
+_MEMORY_BUDGET = 128 * 1024 * 1024
+# Tamaño supuesto de un segmento antes de conocer ninguno de su pista.
+_DEFAULT_SEGMENT_BYTES = 2 * 1024 * 1024
+
+# Lectura por bloques de las peticiones cubiertas: si se abandonan a mitad,
+# lo recibido se descuenta del limitador.
+_HEDGE_CHUNK = 256 * 1024
+
+
+class BandwidthLimiter:
+    """
+    Token bucket compartido entre hilos: limita los bytes por segundo del
+    conjunto de descargas que lo usan. `burst` es lo que puede acumularse en
+    reposo (por defecto, un segundo de tasa).
+    """
+
+    def __init__(self, bytes_per_second: float, burst: Optional[float] = None):
+        self.rate = bytes_per_second
+        self.burst = burst if burst is not None else bytes_per_second
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, amount: int):
+        """Descuenta `amount` bytes y bloquea lo necesario para respetar la tasa."""
+        delay = self.reserve(amount)
+        if delay > 0:
+            time.sleep(delay)
+
+    def reserve(self, amount: int) -> float:
+        """
+        Descuenta `amount` bytes sin bloquear. Retorna los segundos que habría
+        que esperar para respetar la tasa (0 si alcanzaba el saldo).
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= amount
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+
+class MemoryReservation:
+    """Bytes de una descarga en curso descontados de un MemoryBudget."""
+
+    def __init__(self, budget: "MemoryBudget", nbytes: int):
+        self.budget = budget
+        self.nbytes = nbytes
+        self.released = False
+
+    def resize(self, nbytes: int):
+        """Ajusta la reserva al tamaño real (Content-Length) sin bloquear."""
+        self.budget._resize(self, nbytes)
+
+    def release(self):
+        self.budget._resize(self, 0, release=True)
+
+
+class MemoryBudget:
+    """
+    Tope de bytes de respuestas en memoria a la vez, compartido entre hilos y
+    descargadores. Quien encola trabajo reserva el tamaño estimado de cada
+    descarga y se bloquea mientras no quepa; al conocerse el Content-Length
+    la reserva se corrige, y se libera cuando el segmento está en disco.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.in_flight = 0
+        self.peak = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, nbytes: int) -> MemoryReservation:
+        """
+        Reserva `nbytes`, esperando a que se liberen otras reservas. Una
+        descarga mayor que el presupuesto entra sola, cuando no hay nada en curso.
+        """
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self.in_flight == 0 or self.in_flight + nbytes <= self.max_bytes
+            )
+            self.in_flight += nbytes
+            self.peak = max(self.peak, self.in_flight)
+        return MemoryReservation(self, nbytes)
+
+    def _resize(self, reservation: MemoryReservation, nbytes: int, release=False):
+        with self._cond:
+            # Una copia cubierta perdedora puede llegar tarde: ya no cuenta.
+            if reservation.released:
+                return
+            delta = nbytes - reservation.nbytes
+            reservation.nbytes = nbytes
+            reservation.released = release
+            self.in_flight += delta
+            self.peak = max(self.peak, self.in_flight)
+            if delta < 0:
+                self._cond.notify_all()
+
+
+def new_session(
+    pool_size: int = 10, http2: bool = False, max_streams: int = 100
+) -> requests.Session:
+    """
+    Sesión HTTP con los headers de la app y un pool de conexiones de `pool_size`.
+    Con `http2`, las URLs https van por Http2Adapter (hasta `max_streams`
+    peticiones multiplexadas); sin httpx[http2] instalado se avisa y se sigue
+    con HTTP/1.1.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if http2:
+        if HTTP2_AVAILABLE:
+            session.mount("https://", Http2Adapter(max_streams, pool_size))
+        else:
+            logger.warning(
+                "HTTP/2 pedido pero httpx[http2] no está instalado: se usa HTTP/1.1."
+            )
+    session.headers.update(
+        {"User-Agent": "okhttp/4.12.0", "Accept-Encoding": "gzip, deflate, br"}
+    )
+    return session
+
+
 class SegmentDownloader:
-    def __init__(self, output_dir: Union[Path, str], max_workers: int = 4):
+    def __init__(
+        self,
+        output_dir: Union[Path, str],
+        max_workers: int = 4,
+        max_range_bytes: int = 16 * 1024 * 1024,
+        max_range_gap: int = 0,
+        session: Optional[requests.Session] = None,
+        executor: Optional[Executor] = None,
+        limiter: Optional[BandwidthLimiter] = None,
+        verify_segments: bool = True,
+        hedge: Optional[HedgePolicy] = None,
+        memory_budget: Optional[MemoryBudget] = None,
+        http2: bool = False,
+    ):
+        """
+        :param max_range_bytes: Tamaño máximo de una petición Range agrupada.
+        :param max_range_gap: Bytes de separación tolerados al unir rangos vecinos
+                              (se descargan y descartan).
+        :param session: Sesión HTTP compartida. Por defecto se crea una propia.
+        :param executor: Pool compartido para las descargas. Por defecto se crea
+                         uno de `max_workers` hilos por lote.
+        :param limiter: Presupuesto de ancho de banda compartido.
+        :param verify_segments: Validar la estructura (moof/mdat) de cada
+                                segmento al llegar; uno inválido no se guarda
+                                y cuenta como fallido.
+        :param hedge: Duplica las peticiones de segmentos rezagadas (ver
+                      HedgePolicy). Sin él, cada segmento es una sola petición.
+        :param memory_budget: Tope de bytes descargándose a la vez (compartible
+                              entre descargadores). Por defecto, uno propio de
+                              128 MB.
+        :param http2: Con la sesión propia, multiplexar las descargas sobre
+                      HTTP/2 (ver `new_session`).
+        """
         output_dir = Path(output_dir) if isinstance(output_dir, str) else output_dir
 
         self.output_dir = output_dir
         self.max_workers = max_workers
-        self.session = requests.Session()
-        self.session.headers.update(
-            {"User-Agent": "okhttp/4.12.0", "Accept-Encoding": "gzip, deflate, br"}
+        self.max_range_bytes = max_range_bytes
+        self.max_range_gap = max_range_gap
+        self.session = session or new_session(max(max_workers, 10), http2=http2)
+        self.executor = executor
+        self.limiter = limiter
+        self.verify_segments = verify_segments
+        self.hedge = hedge
+        self.memory_budget = memory_budget or MemoryBudget(_MEMORY_BUDGET)
+        self._indexes: Dict[str, TrackIndex] = {}
+        # Tamaño esperado de un segmento por pista: media móvil de lo recibido.
+        self._segment_bytes: Dict[str, float] = {}
+        # Inicio de archivos SegmentBase ya leído (por URL), para no repetir el sondeo.
+        self._probes: Dict[str, Tuple[bytes, int]] = {}
+        # Archivos cuyo servidor ignora Range (respondió 200 a una petición Range).
+        self._ignores_range: Set[str] = set()
+
+    def index(self, subdir: str = "") -> TrackIndex:
+        """Índice de la pista guardada en `subdir` (ver TrackIndex)."""
+        if subdir not in self._indexes:
+            self._indexes[subdir] = TrackIndex(self.output_dir / subdir)
+        return self._indexes[subdir]
+
+    def _run_all(
+        self,
+        fn: Callable[[object, MemoryReservation], None],
+        items: Iterable,
+        size: Callable[[object], int],
+    ):
+        """
+        Ejecuta `fn(item, reserva)` sobre cada item en el pool (compartido o
+        propio) y espera. Los items se consumen de a uno: cada envío reserva
+        `size(item)` bytes del presupuesto de memoria y no hay más de
+        2 x `max_workers` trabajos pendientes, así que ni la memoria ni la
+        cantidad de futures crecen con el largo de `items`.
+        """
+        executor = self.executor or ThreadPoolExecutor(max_workers=self.max_workers)
+        pending: Set[Future] = set()
+
+        def run(item, reservation: MemoryReservation):
+            try:
+                fn(item, reservation)
+            finally:
+                reservation.release()
+
+        try:
+            for item in items:
+                if len(pending) >= 2 * self.max_workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for f in done:
+                        f.result()
+                reservation = self.memory_budget.acquire(size(item))
+                try:
+                    pending.add(executor.submit(run, item, reservation))
+                except BaseException:
+                    reservation.release()
+                    raise
+            for f in pending:
+                f.result()
+        finally:
+            if self.executor is None:
+                executor.shutdown(wait=True)
+
+    def _expected_bytes(self, subdir: str) -> int:
+        return int(self._segment_bytes.get(subdir, _DEFAULT_SEGMENT_BYTES))
+
+    def _observe_bytes(self, subdir: str, nbytes: int):
+        previous = self._segment_bytes.get(subdir)
+        self._segment_bytes[subdir] = (
+            nbytes if previous is None else previous * 0.9 + nbytes * 0.1
         )
 
-    def download_file(self, url: str, subdir: str = "") -> bool:
-        """Descarga un archivo si no existe. Retorna True si se descargó."""
-        filename = Path(urlparse(url).path).name
+    def _get(
+        self,
+        url: str,
+        headers: Dict[str, str],
+        timeout: float,
+        key: Optional[str] = None,
+        mirrors: Sequence[str] = (),
+        reservation: Optional[MemoryReservation] = None,
+    ) -> Tuple[int, bytes]:
+        """
+        GET con `raise_for_status`. Con `key` y `hedge`, la petición se cubre
+        contra rezagos (la copia va a `mirrors[0]` si hay, en este mismo
+        hilo). Con `reservation`, ésta se ajusta al Content-Length antes de
+        leer el cuerpo. Retorna (status, cuerpo).
+        """
+        if key is None or self.hedge is None:
+            with self.session.get(
+                url, headers=headers, timeout=timeout, stream=True
+            ) as resp:
+                resp.raise_for_status()
+                self._resize(resp, reservation)
+                return resp.status_code, resp.content
+        attempts = [
+            partial(self._attempt, target, headers, timeout, reservation)
+            for target in (url, *mirrors)
+        ]
+        return self.hedge.run(key, attempts)
+
+    @staticmethod
+    def _resize(resp: requests.Response, reservation: Optional[MemoryReservation]):
+        length = resp.headers.get("Content-Length")
+        if reservation is not None and length and length.isdigit():
+            reservation.resize(int(length))
+
+    def _attempt(
+        self,
+        url: str,
+        headers: Dict[str, str],
+        timeout: float,
+        reservation: Optional[MemoryReservation],
+        patience: Optional[float],
+    ) -> Tuple[int, bytes]:
+        """
+        Un intento de una petición cubierta. Con `patience`, el intento se
+        abandona con `Straggler` si no termina en ese tiempo total (aunque
+        los datos sigan llegando, lentos) o si la conexión se cae; lo ya
+        recibido se descuenta igual del limitador. Ninguna espera de red pasa
+        de `patience`, así que un socket mudo también se detecta a tiempo.
+        """
+        limit = timeout if patience is None else min(timeout, patience)
+        deadline = None if patience is None else time.monotonic() + patience
+        received = 0
+
+        def late() -> bool:
+            return deadline is not None and time.monotonic() > deadline
+
+        try:
+            with self.session.get(
+                url, headers=headers, timeout=(limit, limit), stream=True
+            ) as resp:
+                resp.raise_for_status()
+                self._resize(resp, reservation)
+                length = resp.headers.get("Content-Length")
+                expected = int(length) if length and length.isdigit() else None
+                chunks = []
+                if not late():
+                    for chunk in resp.iter_content(_HEDGE_CHUNK):
+                        chunks.append(chunk)
+                        received += len(chunk)
+                        # Con el cuerpo completo no se abandona aunque se pase.
+                        if late() and received != expected:
+                            break
+                    else:
+                        return resp.status_code, b"".join(chunks)
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            self._charge(received)
+            if patience is None:
+                raise
+            raise Straggler(str(e)) from e
+        self._charge(received)
+        raise Straggler(f"{url}: sin terminar tras {patience:.2f}s ({received} bytes)")
+
+    def _charge(self, received: int):
+        """Descuenta del limitador lo recibido por un intento abandonado."""
+        if self.limiter is not None and received:
+            self.limiter.consume(received)
+
+    def download_file(
+        self,
+        url: str,
+        subdir: str = "",
+        byte_range: Optional[Tuple[int, int]] = None,
+        filename: Optional[str] = None,
+        validate: Optional[Callable[[bytes], Optional[str]]] = None,
+        mirrors: Optional[Sequence[str]] = None,
+        reservation: Optional[MemoryReservation] = None,
+    ) -> bool:
+        """
+        Descarga un archivo (o un rango de bytes) si no existe. Retorna True si se descargó.
+        :param validate: Revisa el contenido antes de guardarlo; retorna el
+                         problema encontrado o None.
+        :param mirrors: La misma URL en otros hosts. Con None la descarga es
+                        una sola petición; con una secuencia (aunque vacía) se
+                        cubre con `hedge`.
+        :param reservation: Reserva del presupuesto de memoria para esta
+                            descarga; se ajusta al Content-Length.
+        """
+        filename = filename or Path(urlparse(url).path).name
         target_dir = self.output_dir / subdir
         target_dir.mkdir(parents=True, exist_ok=True)
         target_path = target_dir / filename
@@ -31,20 +383,363 @@ class SegmentDownloader:
             return False
 
         try:
-            resp = self.session.get(url, timeout=10)
-            resp.raise_for_status()
-            target_path.write_bytes(resp.content)
+            headers = {}
+            if byte_range is not None:
+                headers["Range"] = f"bytes={byte_range[0]}-{byte_range[1]}"
+            _, content = self._get(
+                url,
+                headers,
+                10,
+                key=None if mirrors is None else subdir,
+                mirrors=mirrors or (),
+                reservation=reservation,
+            )
+            if self.limiter is not None:
+                self.limiter.consume(len(content))
+            problem = validate(content) if validate else None
+            if problem:
+                logger.error(f"Segmento inválido {filename}: {problem}")
+                return False
+            target_path.write_bytes(content)
+            self._observe_bytes(subdir, len(content))
             return True
         except Exception as e:
             logger.error(f"Fallo descargando {filename}: {e}")
             return False
 
-    def download_batch(self, urls: list[str], subdir: str = ""):
-        """Descarga una lista de URLs en paralelo."""
-        if not urls:
+    def download_batch(
+        self,
+        urls: Iterable[str],
+        subdir: str = "",
+        validate: Optional[Callable[[bytes], Optional[str]]] = None,
+        mirrors: Optional[Callable[[str], Sequence[str]]] = None,
+        period: str = "",
+    ):
+        """
+        Descarga URLs en paralelo, tomándolas de `urls` a medida que hay lugar
+        en el presupuesto de memoria (cada una reserva el tamaño medio de los
+        segmentos de `subdir`). Las peticiones se cubren con `hedge`;
+        `mirrors(url)` da las alternativas de cada una en otros hosts.
+        Con `period`, los archivos se guardan prefijados (ver `local_name`).
+        """
+        self._run_all(
+            lambda url, reservation: self.download_file(
+                url,
+                subdir,
+                filename=self.local_name(Path(urlparse(url).path).name, period),
+                validate=validate,
+                mirrors=mirrors(url) if mirrors else (),
+                reservation=reservation,
+            ),
+            urls,
+            lambda _: self._expected_bytes(subdir),
+        )
+
+    def download_init(
+        self, rep: RepresentationModel, subdir: str = "", period: str = ""
+    ) -> bool:
+        """
+        Descarga el segmento de inicialización, sea un archivo o un rango, y lo
+        registra en el índice de la pista. En SegmentBase sin indexRange ni
+        <Initialization>, el init son los bytes previos al `sidx` del sondeo.
+        """
+        if not rep.initialization_url:
+            if rep.needs_index:
+                return self._download_probed_init(rep, subdir, period)
+            return False
+        path = self.init_path(rep, subdir, period)
+        downloaded = self.download_file(
+            rep.initialization_url,
+            subdir,
+            byte_range=rep.initialization_range,
+            filename=path.name,
+        )
+        if path.exists():
+            self.index(subdir).write_init(path.name, period)
+        return downloaded
+
+    def _download_probed_init(
+        self, rep: RepresentationModel, subdir: str, period: str
+    ) -> bool:
+        path = self.init_path(rep, subdir, period)
+        try:
+            data, offset = self._probe(rep)
+        except requests.RequestException as e:
+            logger.error(f"[{rep.id}] Fallo leyendo el inicio de {rep.base_url}: {e}")
+            return False
+        # El sondeo se reutiliza en fetch_segment_index.
+        self._probes[rep.base_url] = (data, offset)
+        sidx = next(
+            (start for kind, start, _, _ in iter_boxes(data) if kind == "sidx"), None
+        )
+        if offset != 0 or not sidx:
+            logger.error(
+                f"[{rep.id}] SegmentBase sin inicialización y sin sidx al inicio del archivo."
+            )
+            return False
+        downloaded = not path.exists()
+        if downloaded:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data[:sidx])
+        self.index(subdir).write_init(path.name, period)
+        return downloaded
+
+    def _probe(self, rep: RepresentationModel) -> Tuple[bytes, int]:
+        """Bloque del archivo SegmentBase donde está el `sidx`: (datos, offset)."""
+        cached = self._probes.pop(rep.base_url, None)
+        if cached is not None:
+            return cached
+        base = rep.segment_base
+        index_range = base.index_range if base else None
+        probe = index_range or (0, _SIDX_PROBE_BYTES - 1)
+
+        resp = self.session.get(
+            rep.base_url, headers={"Range": f"bytes={probe[0]}-{probe[1]}"}, timeout=10
+        )
+        resp.raise_for_status()
+        data = resp.content
+        if resp.status_code == 200:
+            # El servidor ignoró el Range y envió el archivo completo: los
+            # fragmentos se bajarán con una sola petición.
+            self._ignores_range.add(rep.base_url)
+            data = data[probe[0] : probe[1] + 1]
+        return data, probe[0]
+
+    def fetch_segment_index(self, rep: RepresentationModel) -> List[Segment]:
+        """
+        Lee el `sidx` de una Representation SegmentBase (una sola petición) y
+        devuelve sus fragmentos como segmentos con rango de bytes.
+        """
+        data, offset = self._probe(rep)
+        index = find_sidx(data, offset)
+        if index is None:
+            raise ValueError(f"No se encontró sidx en {rep.base_url}")
+        segments = rep.segments_from_index(index)
+        logger.info(f"[{rep.id}] sidx: {len(segments)} fragmentos indexados.")
+        return segments
+
+    @staticmethod
+    def local_name(name: str, period: str = "") -> str:
+        """
+        Nombre local de un archivo de la pista. Con `period`, va prefijado con
+        su id: los Periods de una emisión en vivo comparten carpeta y suelen
+        repetir nombres (init.mp4, seg_1.m4s) que de otro modo se pisarían.
+        """
+        if not period:
+            return name
+        prefix = re.sub(r"[^\w.-]", "_", period)
+        return f"{prefix}_{name}"
+
+    def init_path(
+        self, rep: RepresentationModel, subdir: str = "", period: str = ""
+    ) -> Path:
+        """Ruta local donde `download_init` guarda la inicialización de `rep`."""
+        if rep.initialization_range is not None or (
+            rep.needs_index and not rep.initialization_url
+        ):
+            name = "init.mp4"
+        else:
+            name = Path(urlparse(rep.initialization_url).path).name
+        return self.output_dir / subdir / self.local_name(name, period)
+
+    def segment_path(
+        self, segment: Segment, subdir: str = "", period: str = ""
+    ) -> Path:
+        """Ruta local donde `download_segments` guarda `segment`."""
+        if segment.byte_range is not None:
+            name = self._range_filename(segment)
+        else:
+            name = Path(urlparse(segment.url).path).name
+        return self.output_dir / subdir / self.local_name(name, period)
+
+    def download_segments(
+        self,
+        segments: Sequence[Segment],
+        subdir: str = "",
+        period: str = "",
+        rep: Optional[RepresentationModel] = None,
+    ):
+        """
+        Descarga segmentos. Los que son archivos propios van por `download_batch`;
+        los que son rangos de un archivo mayor se agrupan en peticiones Range.
+        Al terminar, cada segmento queda registrado en el índice de la pista
+        (con su tamaño, o sin él si no llegó a disco).
+
+        Con `rep`, las copias de las peticiones rezagadas van a sus BaseURL
+        alternativas.
+        """
+        try:
+            self._download_segments(segments, subdir, rep, period)
+        finally:
+            self._write_index(segments, subdir, period)
+
+    def _write_index(self, segments: Sequence[Segment], subdir: str, period: str):
+        entries = []
+        for seg in segments:
+            path = self.segment_path(seg, subdir, period)
+            try:
+                size: Optional[int] = path.stat().st_size
+            except FileNotFoundError:
+                size = None
+            entries.append(
+                IndexEntry(
+                    seg.number,
+                    seg.time,
+                    seg.duration,
+                    seg.timescale,
+                    size,
+                    path.name,
+                    period,
+                )
+            )
+        self.index(subdir).write(entries)
+
+    @property
+    def _validate(self) -> Optional[Callable[[bytes], Optional[str]]]:
+        return check_fragment if self.verify_segments else None
+
+    def _download_segments(
+        self,
+        segments: Sequence[Segment],
+        subdir: str,
+        rep: Optional[RepresentationModel] = None,
+        period: str = "",
+    ):
+        mirrors = rep.mirrors if rep is not None else None
+        if (
+            rep is not None
+            and rep.bandwidth
+            and segments
+            and subdir not in self._segment_bytes
+        ):
+            # Hasta recibir el primero, el tamaño esperado sale del bitrate declarado.
+            first = segments[0]
+            self._segment_bytes[subdir] = (
+                rep.bandwidth * first.duration / first.timescale / 8
+            )
+        self.download_batch(
+            (s.url for s in segments if s.byte_range is None),
+            subdir,
+            self._validate,
+            mirrors,
+            period,
+        )
+
+        target_dir = self.output_dir / subdir
+        ranged = [
+            s
+            for s in segments
+            if s.byte_range is not None
+            and not self.segment_path(s, subdir, period).exists()
+        ]
+        if not ranged:
             return
 
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            futures = [executor.submit(self.download_file, url, subdir) for url in urls]
-            for f in futures:
-                f.result()
+        by_url: Dict[str, List[Segment]] = {}
+        for seg in ranged:
+            by_url.setdefault(seg.url, []).append(seg)
+        # Si el servidor ya ignoró un Range de un archivo, se lo pide entero una vez.
+        groups = self._coalesce(
+            [s for s in ranged if s.url not in self._ignores_range]
+        ) + [
+            sorted(segs, key=lambda s: s.byte_range)
+            for url, segs in by_url.items()
+            if url in self._ignores_range
+        ]
+        logger.info(
+            f"Rangos: {len(ranged)} fragmentos en {len(groups)} peticiones ({subdir})"
+        )
+        target_dir.mkdir(parents=True, exist_ok=True)
+        self._run_all(
+            lambda group, reservation: self._download_range_group(
+                group,
+                target_dir,
+                mirrors(group[0].url) if mirrors else (),
+                reservation,
+                period,
+                by_url[group[0].url],
+            ),
+            groups,
+            lambda group: group[-1].byte_range[1] - group[0].byte_range[0] + 1,
+        )
+
+    @staticmethod
+    def _range_filename(segment: Segment) -> str:
+        return f"segment_{segment.number}.m4s"
+
+    def _coalesce(self, segments: Sequence[Segment]) -> List[List[Segment]]:
+        """Agrupa rangos contiguos del mismo archivo respetando `max_range_bytes`."""
+        ordered = sorted(segments, key=lambda s: (s.url, s.byte_range))
+        groups: List[List[Segment]] = []
+        for seg in ordered:
+            first, last = seg.byte_range  # type: ignore
+            if groups:
+                group = groups[-1]
+                head, tail = group[0], group[-1]
+                if (
+                    tail.url == seg.url
+                    and 0 <= first - tail.byte_range[1] - 1 <= self.max_range_gap  # type: ignore
+                    and last - head.byte_range[0] + 1 <= self.max_range_bytes  # type: ignore
+                ):
+                    group.append(seg)
+                    continue
+            groups.append([seg])
+        return groups
+
+    def _download_range_group(
+        self,
+        group: List[Segment],
+        target_dir: Path,
+        mirrors: Sequence[str] = (),
+        reservation: Optional[MemoryReservation] = None,
+        period: str = "",
+        siblings: Sequence[Segment] = (),
+    ):
+        """
+        Descarga un grupo de rangos contiguos con una petición Range. Si el
+        servidor la ignora y responde 200 con el archivo completo, se guardan
+        de ahí todos los `siblings` (los fragmentos pendientes del mismo
+        archivo) y los demás grupos de ese archivo ya no se piden.
+        """
+        url = group[0].url
+        if url in self._ignores_range and len(group) < len(siblings):
+            # Otro grupo recibió el archivo completo y guarda estos fragmentos.
+            return
+        start = group[0].byte_range[0]  # type: ignore
+        end = group[-1].byte_range[1]  # type: ignore
+        try:
+            status, data = self._get(
+                url,
+                {"Range": f"bytes={start}-{end}"},
+                30,
+                key=f"{target_dir.name}:rangos",
+                mirrors=mirrors,
+                reservation=reservation,
+            )
+            if self.limiter is not None:
+                self.limiter.consume(len(data))
+            targets, base = group, start
+            if status == 200:
+                # Los offsets son absolutos y el archivo ya está entero en memoria.
+                self._ignores_range.add(url)
+                logger.warning(
+                    f"{url}: el servidor ignora Range; se usa la respuesta completa "
+                    f"para sus {len(siblings or group)} fragmentos."
+                )
+                targets, base = siblings or group, 0
+            view = memoryview(data)
+            for seg in targets:
+                name = self.local_name(self._range_filename(seg), period)
+                if seg not in group and (target_dir / name).exists():
+                    continue
+                first, last = seg.byte_range  # type: ignore
+                chunk = view[first - base : last - base + 1]
+                if len(chunk) != last - first + 1:
+                    raise ValueError(f"respuesta corta para bytes {first}-{last}")
+                problem = self._validate(chunk) if self._validate else None
+                if problem:
+                    logger.error(f"Segmento inválido (bytes {first}-{last}): {problem}")
+                    continue
+                (target_dir / name).write_bytes(chunk)
+        except Exception as e:
+            logger.error(f"Fallo descargando bytes {start}-{end} de {url}: {e}")
@@ -0,0 +1,142 @@
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Optional, Sequence, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Un intento de petición. Recibe la paciencia: segundos totales, desde que
+# empieza, antes de rendirse con `Straggler` (None: sin límite propio, el
+# timeout normal).
+Attempt = Callable[[Optional[float]], T]
+
+
+class Straggler(Exception):
+    """Un intento se rindió por falta de respuesta a tiempo: corresponde la copia."""
+
+
+class LatencyTracker:
+    """Percentiles sobre las últimas `window` latencias (en segundos)."""
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+@dataclass
+class HedgeStats:
+    requests: int = 0
+    hedges: int = 0
+    hedge_wins: int = 0
+
+    @property
+    def ratio(self) -> float:
+        """Fracción de peticiones que se duplicaron."""
+        return self.hedges / self.requests if self.requests else 0.0
+
+
+class HedgePolicy:
+    """
+    Peticiones "cubiertas" contra los rezagados: una petición que no termina
+    dentro del percentil `percentile` de las latencias recientes de su tipo
+    (tiempo total, aunque siga recibiendo datos lentos) se abandona y se
+    repite (a otro host si hay BaseURL alternativa). Todo ocurre en el hilo que pidió: la copia no suma hilos
+    ni conexiones, así que respeta el tope de concurrencia del pool, y sus
+    bytes pasan por el mismo limitador y presupuesto de memoria.
+
+    Las copias no pasan de `budget` (fracción) de las peticiones, así que el
+    tráfico duplicado queda acotado aunque el origen entero se vuelva lento.
+    Hasta juntar `min_samples` latencias de un tipo no se duplica nada.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        budget: float = 0.05,
+        window: int = 200,
+        min_samples: int = 20,
+        min_delay: float = 0.05,
+    ):
+        """
+        :param percentile: Percentil de latencia a partir del cual se duplica.
+        :param budget: Fracción máxima de peticiones duplicadas.
+        :param window: Latencias recientes consideradas por tipo de petición.
+        :param min_samples: Latencias necesarias antes de duplicar.
+        :param min_delay: Espera mínima antes de duplicar, en segundos.
+        """
+        self.percentile = percentile
+        self.budget = budget
+        self.window = window
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.stats = HedgeStats()
+        self._trackers: Dict[str, LatencyTracker] = {}
+        self._lock = threading.Lock()
+
+    def tracker(self, key: str) -> LatencyTracker:
+        with self._lock:
+            if key not in self._trackers:
+                self._trackers[key] = LatencyTracker(self.window)
+            return self._trackers[key]
+
+    def delay(self, key: str) -> Optional[float]:
+        """Cuánto esperar antes de duplicar una petición de tipo `key` (None: no duplicar)."""
+        tracker = self.tracker(key)
+        if len(tracker) < self.min_samples:
+            return None
+        return max(self.min_delay, tracker.percentile(self.percentile) or 0.0)
+
+    def _start(self) -> bool:
+        """Cuenta una petición; False si no podría duplicarse aunque se rezague."""
+        with self._lock:
+            self.stats.requests += 1
+            return self.stats.hedges + 1 <= self.budget * self.stats.requests
+
+    def _count_hedge(self):
+        with self._lock:
+            self.stats.hedges += 1
+
+    def _hedge_won(self):
+        with self._lock:
+            self.stats.hedge_wins += 1
+
+    def run(self, key: str, attempts: Sequence[Attempt]) -> T:
+        """
+        Ejecuta `attempts[0]` con la paciencia de `delay(key)` y, si se rinde,
+        la siguiente de `attempts` (en rotación) sin límite propio. Retorna el
+        resultado de la que termine bien; los errores que no son `Straggler`
+        se propagan sin copia.
+        """
+        tracker = self.tracker(key)
+        delay = self.delay(key)
+        patience = delay if self._start() else None
+        started = time.monotonic()
+        try:
+            result = attempts[0](patience)
+        except Straggler:
+            # Sólo se llega aquí con paciencia, es decir, con presupuesto.
+            self._count_hedge()
+            logger.debug(f"[{key}] Petición rezagada (> {delay:.2f}s): se repite.")
+            result = attempts[1 % len(attempts)](None)
+            self._hedge_won()
+        # Latencia vista por quien pidió, copia incluida.
+        tracker.record(time.monotonic() - started)
+        return result
@@ -0,0 +1,242 @@
+import logging
+import os
+import ssl
+import threading
+from http.client import HTTPMessage
+from types import SimpleNamespace
+from typing import Dict, Iterator, Optional, Union
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.cookies import extract_cookies_to_jar
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+try:
+    import h2  # noqa: F401  (httpx lo necesita para http2=True)
+    import httpx
+except ImportError:
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+HTTP2_AVAILABLE = httpx is not None
+
+# Cabeceras propias de una conexión HTTP/1.1; en HTTP/2 son un error de protocolo.
+_HOP_BY_HOP = {
+    "connection",
+    "keep-alive",
+    "proxy-connection",
+    "transfer-encoding",
+    "upgrade",
+}
+
+
+def _timeout(timeout) -> "httpx.Timeout":
+    """Traduce el `timeout` de requests (segundos o (conexión, lectura))."""
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return httpx.Timeout(read, connect=connect)
+    return httpx.Timeout(timeout)
+
+
+def _translate(error: Exception, reading: bool = False) -> Exception:
+    """Error de httpx como el equivalente de requests, para que los llamadores no cambien."""
+    if isinstance(error, httpx.ConnectTimeout):
+        return requests.exceptions.ConnectTimeout(error)
+    if isinstance(error, httpx.TimeoutException):
+        if reading:
+            return requests.exceptions.ConnectionError(error)
+        return requests.exceptions.ReadTimeout(error)
+    if isinstance(error, httpx.RemoteProtocolError) and reading:
+        return requests.exceptions.ChunkedEncodingError(error)
+    return requests.exceptions.ConnectionError(error)
+
+
+class _Body:
+    """
+    Cuerpo de una respuesta de httpx con la interfaz que `requests.Response`
+    espera de `raw` (read/stream/close). Libera el stream al agotarse o cerrarse.
+    """
+
+    def __init__(self, response: "httpx.Response", release):
+        self._response = response
+        self._release = release
+        self._chunks: Optional[Iterator[bytes]] = None
+        self._buffer = b""
+        self._closed = False
+        # Para que requests extraiga las cookies como con urllib3.
+        msg = HTTPMessage()
+        for name, value in response.headers.multi_items():
+            msg[name] = value
+        self._original_response = SimpleNamespace(msg=msg)
+
+    def _next(self, amt: int) -> bytes:
+        """Siguiente bloque del cuerpo, o b"" al terminar (y se libera el stream)."""
+        if self._chunks is None:
+            self._chunks = self._response.iter_bytes(amt)
+        try:
+            return next(self._chunks)
+        except StopIteration:
+            self.close()
+            return b""
+        except httpx.HTTPError as e:
+            self.close()
+            raise _translate(e, reading=True) from e
+
+    def stream(self, amt: int = 65536, decode_content: bool = True) -> Iterator[bytes]:
+        if self._buffer:
+            data, self._buffer = self._buffer, b""
+            yield data
+        while not self._closed:
+            chunk = self._next(amt)
+            if chunk:
+                yield chunk
+
+    def read(self, amt: Optional[int] = None, **kwargs) -> bytes:
+        parts = [self._buffer]
+        size = len(self._buffer)
+        while (amt is None or size < amt) and not self._closed:
+            chunk = self._next(amt or 65536)
+            parts.append(chunk)
+            size += len(chunk)
+        data = b"".join(parts)
+        if amt is not None and len(data) > amt:
+            data, self._buffer = data[:amt], data[amt:]
+        else:
+            self._buffer = b""
+        return data
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._response.close()
+        self._release()
+
+    release_conn = close
+
+
+class Http2Adapter(BaseAdapter):
+    """
+    Transporte de `requests` sobre httpx con HTTP/2: las peticiones a un mismo
+    host se multiplexan como streams de unas pocas conexiones en vez de abrir
+    una conexión TCP+TLS por descarga concurrente. Si el servidor no negocia
+    h2 por ALPN, httpx sigue en HTTP/1.1 con un pool de `max_connections`.
+
+    Las peticiones con proxy o certificado de cliente van por el adaptador
+    HTTP/1.1 normal. Requiere `httpx[http2]` (ver `HTTP2_AVAILABLE`).
+    """
+
+    def __init__(self, max_streams: int = 100, max_connections: int = 10):
+        """
+        :param max_streams: Peticiones en curso a la vez por este adaptador
+                            (streams simultáneos; el servidor puede fijar menos
+                            por conexión con SETTINGS_MAX_CONCURRENT_STREAMS).
+        :param max_connections: Conexiones por host si se cae a HTTP/1.1.
+        """
+        if not HTTP2_AVAILABLE:
+            raise ImportError(
+                "HTTP/2 requiere httpx[http2] (pip install 'httpx[http2]')."
+            )
+        super().__init__()
+        self.max_streams = max_streams
+        self.max_connections = max_connections
+        self.protocols: Dict[str, str] = {}
+        self._streams = threading.BoundedSemaphore(max_streams)
+        self._clients: Dict[Union[bool, str], "httpx.Client"] = {}
+        self._lock = threading.Lock()
+        self._http1 = HTTPAdapter(
+            pool_connections=max_connections, pool_maxsize=max_connections
+        )
+
+    def _client(self, verify: Union[bool, str]) -> "httpx.Client":
+        with self._lock:
+            client = self._clients.get(verify)
+            if client is None:
+                context: Union[bool, ssl.SSLContext] = verify  # type: ignore
+                if isinstance(verify, str):
+                    # Ruta a un bundle de CAs (o directorio), como en requests.
+                    context = (
+                        ssl.create_default_context(capath=verify)
+                        if os.path.isdir(verify)
+                        else ssl.create_default_context(cafile=verify)
+                    )
+                client = httpx.Client(
+                    http2=True,
+                    verify=context,
+                    trust_env=False,
+                    follow_redirects=False,
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_connections,
+                    ),
+                )
+                self._clients[verify] = client
+            return client
+
+    def _note_protocol(self, url: str, version: str):
+        host = urlparse(url).netloc
+        if self.protocols.get(host) == version:
+            return
+        self.protocols[host] = version
+        if version == "HTTP/2":
+            logger.info(f"{host}: HTTP/2 negociado; las descargas se multiplexan.")
+        else:
+            logger.info(f"{host}: sin HTTP/2 ({version}); se sigue en HTTP/1.1.")
+
+    def send(
+        self,
+        request: requests.PreparedRequest,
+        stream: bool = False,
+        timeout=None,
+        verify: Union[bool, str] = True,
+        cert=None,
+        proxies=None,
+    ) -> requests.Response:
+        if cert or (proxies and proxies.get(urlparse(request.url).scheme)):
+            return self._http1.send(request, stream, timeout, verify, cert, proxies)
+
+        client = self._client(verify)
+        headers = [
+            (k, v) for k, v in request.headers.items() if k.lower() not in _HOP_BY_HOP
+        ]
+        self._streams.acquire()
+        try:
+            sent = client.send(
+                client.build_request(
+                    request.method,
+                    request.url,
+                    headers=headers,
+                    content=request.body,
+                    timeout=_timeout(timeout),
+                ),
+                stream=True,
+            )
+        except httpx.HTTPError as e:
+            self._streams.release()
+            raise _translate(e) from e
+        except BaseException:
+            self._streams.release()
+            raise
+        self._note_protocol(request.url, sent.http_version)
+
+        response = requests.Response()
+        response.status_code = sent.status_code
+        response.headers = CaseInsensitiveDict(sent.headers.items())
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.raw = _Body(sent, self._streams.release)
+        response.reason = sent.reason_phrase
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        extract_cookies_to_jar(response.cookies, request, response.raw)
+        return response
+
+    def close(self):
+        with self._lock:
+            clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            client.close()
+        self._http1.close()
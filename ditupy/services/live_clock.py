@@ -0,0 +1,174 @@
+import logging
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from ditupy.dash import Segment
+from ditupy.dash_model import ManifestModel, PeriodModel
+
+logger = logging.getLogger(__name__)
+
+
+class LiveClock:
+    """
+    Reloj de la presentación live. Aplica la corrección de desfase contra el
+    header `Date` del servidor y traduce los atributos de tiempo del MPD
+    (availabilityStartTime, minimumUpdatePeriod, timeShiftBufferDepth,
+    suggestedPresentationDelay) a instantes concretos para programar refrescos
+    del manifiesto y descargas de segmentos.
+    """
+
+    def __init__(
+        self,
+        fallback_interval: float = 4.0,
+        min_interval: float = 0.5,
+        max_interval: float = 30.0,
+    ):
+        """
+        :param fallback_interval: Cadencia usada si el MPD no permite calcular nada.
+        :param min_interval: Espera mínima entre despertares (evita busy-loops).
+        :param max_interval: Espera máxima, para no perder eventos del MPD.
+        """
+        self.fallback_interval = fallback_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.offset = 0.0  # servidor - local, en segundos
+        self._synced = False
+
+    def sync(
+        self, date_header: Optional[str], sent_at: float, received_at: float
+    ) -> None:
+        """
+        Ajusta el desfase usando el header `Date`. Se toma el punto medio de la
+        petición como instante local; `Date` sólo tiene resolución de 1s, así que
+        desfases menores se ignoran para no introducir ruido.
+        """
+        if not date_header:
+            return
+        try:
+            server = parsedate_to_datetime(date_header).timestamp()
+        except (TypeError, ValueError):
+            logger.debug(f"Header Date inválido: {date_header}")
+            return
+
+        offset = server - (sent_at + received_at) / 2
+        if not self._synced or abs(offset - self.offset) > 1.0:
+            if abs(offset) > 1.0:
+                logger.info(f"Desfase de reloj con el servidor: {offset:+.2f}s")
+            self.offset = offset
+            self._synced = True
+
+    def now(self) -> float:
+        """Hora actual del servidor (epoch)."""
+        return time.time() + self.offset
+
+    def to_local(self, server_ts: float) -> float:
+        return server_ts - self.offset
+
+    def period_elapsed(
+        self, manifest: ManifestModel, period: PeriodModel
+    ) -> Optional[float]:
+        """Segundos transcurridos desde el inicio del Period (el live edge)."""
+        if manifest.availability_start_time is None:
+            return None
+        return self.now() - manifest.availability_start_time - period.start
+
+    def live_window(self, manifest: ManifestModel, period: PeriodModel):
+        """
+        (inicio, fin) de la ventana disponible en segundos relativos al Period.
+        Sin timeShiftBufferDepth se usa suggestedPresentationDelay como margen
+        de entrada; sin availabilityStartTime devuelve (None, None).
+        """
+        edge = self.period_elapsed(manifest, period)
+        if edge is None:
+            return None, None
+        depth = manifest.time_shift_buffer_depth
+        if depth is None:
+            depth = manifest.suggested_presentation_delay or 0.0
+        return max(0.0, edge - depth), edge
+
+    def segment_available_at(
+        self, manifest: ManifestModel, period: PeriodModel, segment_end: float
+    ) -> Optional[float]:
+        """
+        Hora del servidor en la que está disponible un segmento que termina en
+        `segment_end` (segundos relativos al Period).
+        """
+        if manifest.availability_start_time is None:
+            return None
+        return manifest.availability_start_time + period.start + segment_end
+
+    def manifest_expired(self, manifest: ManifestModel, fetched_at: float) -> bool:
+        """
+        True si el MPD pudo haber cambiado desde `fetched_at` (hora local).
+        Un MPD dinámico sin minimumUpdatePeriod no se actualiza, pero por
+        prudencia se sigue refrescando con la cadencia de respaldo.
+        """
+        if not manifest.is_dynamic:
+            return False
+        period = manifest.minimum_update_period
+        if period is None:
+            period = self.fallback_interval
+        return time.time() >= fetched_at + period
+
+    def next_wakeup(
+        self,
+        manifest: ManifestModel,
+        period: PeriodModel,
+        fetched_at: float,
+        last_segment: Optional[Segment] = None,
+        timeline_addressed: bool = True,
+    ) -> float:
+        """
+        Calcula cuándo (hora local, epoch) vale la pena volver a actuar.
+
+        Con SegmentTimeline los segmentos nuevos sólo se conocen refrescando el
+        MPD, que no cambia antes de `minimumUpdatePeriod`; se despierta en el
+        mayor entre ese plazo y la disponibilidad del siguiente segmento
+        (availabilityStartTime + inicio del Period + fin del segmento).
+        Con plantillas por @duration los segmentos se calculan sin el MPD, así
+        que se despierta en el menor de ambos.
+
+        :param fetched_at: Hora local en que se obtuvo el manifiesto.
+        :param last_segment: Último segmento conocido de la pista de referencia.
+        :param timeline_addressed: False si la pista usa direccionamiento por @duration.
+        """
+        refresh_at = None
+        if manifest.minimum_update_period is not None:
+            refresh_at = fetched_at + manifest.minimum_update_period
+
+        segment_at = None
+        if last_segment is not None:
+            next_end = last_segment.end_seconds + last_segment.duration_seconds
+            available = self.segment_available_at(manifest, period, next_end)
+            if available is not None:
+                segment_at = self.to_local(available)
+            else:
+                segment_at = fetched_at + last_segment.duration_seconds
+
+        candidates = [c for c in (refresh_at, segment_at) if c is not None]
+        if not candidates:
+            interval = manifest.max_segment_duration or self.fallback_interval
+            wake = fetched_at + interval
+        elif timeline_addressed:
+            wake = max(candidates)
+        else:
+            wake = min(candidates)
+
+        now = time.time()
+        return min(max(wake, now + self.min_interval), now + self.max_interval)
+
+    def sleep_until(
+        self, local_ts: float, stop_event: Optional[threading.Event] = None
+    ) -> bool:
+        """
+        Duerme hasta `local_ts` (hora local). Si se pasa `stop_event`, despierta
+        en cuanto se activa. Retorna True si se interrumpió por el evento.
+        """
+        delay = local_ts - time.time()
+        if stop_event is not None:
+            return stop_event.wait(delay) if delay > 0 else stop_event.is_set()
+        if delay > 0:
+            time.sleep(delay)
+        return False
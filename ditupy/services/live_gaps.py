@@ -0,0 +1,236 @@
+import json
+import logging
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+from ditupy.dash import Segment
+from ditupy.services.live_timeline import TimelineEvent
+
+logger = logging.getLogger(__name__)
+
+GAPS_REPORT = "gaps.json"
+
+
+@dataclass(frozen=True, slots=True)
+class MissingRange:
+    """
+    Tramo que no se pudo grabar, en segundos relativos al Period.
+
+    reason:
+        - "window": salió del timeShiftBufferDepth antes de descargarse.
+        - "download": se agotaron los reintentos dentro de la ventana.
+        - "timeline": el manifiesto ya no lo publicaba (hueco en la línea de tiempo).
+    """
+
+    track: str
+    period_id: str
+    start: float
+    end: float
+    reason: str
+
+    @property
+    def seconds(self) -> float:
+        return self.end - self.start
+
+
+@dataclass(slots=True)
+class _Pending:
+    segment: Segment
+    attempts: int = 0
+
+
+def _split_key(key: str):
+    """'video@p1' -> ('video', 'p1')."""
+    track, _, period_id = key.partition("@")
+    return track, period_id
+
+
+class GapTracker:
+    """
+    Lleva, por pista, los segmentos esperados que aún no están en disco.
+
+    Los que fallan quedan en una cola de reintento que se atiende antes que los
+    segmentos nuevos de cada ciclo, mientras sigan dentro de la ventana de
+    timeshift. Los que salen de la ventana (o agotan los reintentos) pasan al
+    informe final como tramos perdidos.
+    """
+
+    def __init__(self, max_attempts: int = 5, keep_order: bool = False):
+        """
+        :param max_attempts: Reintentos por segmento antes de darlo por perdido.
+        :param keep_order: Retener los segmentos descargados tras un hueco
+                           pendiente para entregarlos en orden con `ready()`
+                           (lo necesita la salida continua).
+        """
+        self.max_attempts = max_attempts
+        self.keep_order = keep_order
+        self.recovered = 0
+        self.missing: List[MissingRange] = []
+        self._pending: Dict[str, Dict[int, _Pending]] = {}
+        self._ordered: Dict[str, List[Segment]] = {}
+
+    @property
+    def has_pending(self) -> bool:
+        return any(self._pending.values())
+
+    def _lose(self, key: str, segment: Segment, reason: str):
+        track, period_id = _split_key(key)
+        self.missing.append(
+            MissingRange(
+                track, period_id, segment.start_seconds, segment.end_seconds, reason
+            )
+        )
+
+    def on_timeline_event(self, event: TimelineEvent):
+        """Los huecos del manifiesto ya no son recuperables: van directo al informe."""
+        if event.kind != "gap":
+            return
+        track, period_id = _split_key(event.track)
+        self.missing.append(
+            MissingRange(
+                track,
+                period_id,
+                event.expected_time / event.timescale,
+                event.found_time / event.timescale,
+                "timeline",
+            )
+        )
+
+    def schedule(
+        self, key: str, new: Sequence[Segment], window_start: Optional[float]
+    ) -> List[Segment]:
+        """
+        Segmentos a descargar en este ciclo: primero los pendientes (del más
+        antiguo, el más próximo a salir de la ventana) y luego los nuevos.
+        Lo que ya terminó antes de `window_start` se da por perdido.
+        """
+        pending = self._pending.setdefault(key, {})
+        if window_start is not None:
+            for number, item in list(pending.items()):
+                if item.segment.end_seconds < window_start:
+                    del pending[number]
+                    self._lose(key, item.segment, "window")
+
+        batch = [item.segment for item in sorted(pending.values(), key=_by_time)]
+        for segment in new:
+            if window_start is not None and segment.end_seconds < window_start:
+                self._lose(key, segment, "window")
+            else:
+                batch.append(segment)
+        if batch and pending:
+            logger.info(f"[{key}] Reintentando {len(pending)} segmento(s) pendientes.")
+        return batch
+
+    def settle(
+        self, key: str, attempted: Sequence[Segment], exists: Callable[[Segment], bool]
+    ):
+        """Tras descargar `attempted`, separa los que quedaron en disco de los que no."""
+        pending = self._pending.setdefault(key, {})
+        ordered = self._ordered.setdefault(key, [])
+        for segment in attempted:
+            item = pending.get(segment.number)
+            if exists(segment):
+                if item is not None:
+                    del pending[segment.number]
+                    self.recovered += 1
+                if self.keep_order:
+                    ordered.append(segment)
+                continue
+
+            if item is None:
+                item = pending[segment.number] = _Pending(segment)
+            item.attempts += 1
+            if item.attempts >= self.max_attempts:
+                del pending[segment.number]
+                self._lose(key, segment, "download")
+        ordered.sort(key=lambda s: s.time)
+
+    def ready(self, key: str) -> List[Segment]:
+        """
+        Segmentos descargados que ya pueden entregarse en orden: los anteriores
+        al pendiente más antiguo de la pista.
+        """
+        ordered = self._ordered.get(key, [])
+        pending = self._pending.get(key)
+        if pending:
+            limit = min(item.segment.time for item in pending.values())
+            count = next(
+                (i for i, s in enumerate(ordered) if s.time >= limit), len(ordered)
+            )
+        else:
+            count = len(ordered)
+        released, self._ordered[key] = ordered[:count], ordered[count:]
+        return released
+
+    @property
+    def keys(self) -> List[str]:
+        return list(self._pending.keys() | self._ordered.keys())
+
+    def drop(self, key: str, reason: str = "window"):
+        """Da por perdidos los pendientes de la pista (p. ej. su Period salió del MPD)."""
+        pending = self._pending.pop(key, {})
+        for item in sorted(pending.values(), key=_by_time):
+            self._lose(key, item.segment, reason)
+
+    def finish(self):
+        """Lo que sigue pendiente al terminar la grabación se da por perdido."""
+        for key in list(self._pending):
+            self.drop(key, "download")
+
+    def missing_ranges(self) -> List[MissingRange]:
+        """Tramos perdidos por pista, fusionando los contiguos."""
+        merged: List[MissingRange] = []
+        for gap in sorted(
+            self.missing, key=lambda g: (g.track, g.period_id, g.start, g.end)
+        ):
+            if merged:
+                last = merged[-1]
+                if (
+                    last.track == gap.track
+                    and last.period_id == gap.period_id
+                    and gap.start <= last.end + 1e-3
+                ):
+                    reason = last.reason if last.reason == gap.reason else "mixed"
+                    merged[-1] = MissingRange(
+                        last.track,
+                        last.period_id,
+                        last.start,
+                        max(last.end, gap.end),
+                        reason,
+                    )
+                    continue
+            merged.append(gap)
+        return merged
+
+    def report(self, output_dir: Path) -> List[MissingRange]:
+        """Registra el informe de huecos y lo guarda en `gaps.json`."""
+        ranges = self.missing_ranges()
+        path = Path(output_dir) / GAPS_REPORT
+        if not ranges:
+            logger.info(f"Sin huecos ({self.recovered} segmento(s) recuperados).")
+            path.unlink(missing_ok=True)
+            return ranges
+
+        for track in sorted({g.track for g in ranges}):
+            lost = [g for g in ranges if g.track == track]
+            logger.warning(
+                f"[{track}] Faltan {sum(g.seconds for g in lost):.1f}s "
+                f"en {len(lost)} tramo(s)."
+            )
+        for gap in ranges:
+            logger.warning(
+                f"  {gap.track}@{gap.period_id}: {gap.start:.2f}s - {gap.end:.2f}s "
+                f"({gap.reason})"
+            )
+        payload = {
+            "recovered": self.recovered,
+            "missing": [dict(asdict(g), seconds=g.seconds) for g in ranges],
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(payload, indent=4), encoding="utf-8")
+        return ranges
+
+
+def _by_time(item: _Pending) -> int:
+    return item.segment.time
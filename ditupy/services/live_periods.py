@@ -0,0 +1,154 @@
+import logging
+import re
+from enum import Enum
+from typing import Dict, List, Optional, Tuple
+
+from ditupy.dash_model import ManifestModel, PeriodModel
+from ditupy.scte35 import SCTE35_SCHEMES
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodKind(str, Enum):
+    CONTENT = "content"
+    AD = "ad"
+    # Abierto y sin señales: todavía puede resultar un anuncio.
+    PENDING = "pending"
+
+
+class PeriodTracker:
+    """
+    Sigue los Periods de un MPD live entre refrescos y los clasifica como
+    contenido o publicidad.
+
+    Orden de señales:
+        1. EventStream SCTE-35 con un cue al inicio del Period (splice_insert
+           out-of-network o segmentation_type_id de pausa => anuncio).
+        2. `ad_id_pattern` sobre el id del Period, si se configura.
+        3. InbandEventStream SCTE-35: cuando unos Periods lo declaran y otros
+           no, los que no lo tienen suelen ser anuncios insertados (SSAI).
+        4. Heurística: un Period acotado más corto que `max_ad_duration`, con
+           otros Periods presentes, se considera anuncio.
+
+    Un Period abierto (en el live edge, sin duración) y sin señales queda
+    pendiente: no se captura hasta que se conoce su duración o lleva más de
+    `max_ad_duration` en emisión. Sus segmentos siguen en la ventana de
+    timeshift, así que al confirmarse como contenido se toma desde el inicio.
+    Si el timeShiftBufferDepth es menor, se decide al llenarse la ventana para
+    no perder el comienzo.
+
+    Toda clasificación definitiva (señal, duración o antigüedad) se recuerda
+    por id de Period y no vuelve a cambiar.
+    """
+
+    def __init__(
+        self,
+        max_ad_duration: float = 180.0,
+        ad_id_pattern: Optional[str] = None,
+        cue_tolerance: float = 0.5,
+    ):
+        self.max_ad_duration = max_ad_duration
+        self.ad_id_pattern = re.compile(ad_id_pattern) if ad_id_pattern else None
+        self.cue_tolerance = cue_tolerance
+        self._sticky: Dict[str, PeriodKind] = {}
+        self._seen: Dict[str, PeriodKind] = {}
+        self.removed: List[str] = []
+
+    def _signal_kind(self, period: PeriodModel) -> Optional[Tuple[PeriodKind, str]]:
+        for stream in period.event_streams:
+            if stream.scheme_id_uri not in SCTE35_SCHEMES:
+                continue
+            for event in stream.events:
+                if event.signal is None:
+                    continue
+                if event.presentation_time > self.cue_tolerance:
+                    continue
+                if event.signal.is_ad_start:
+                    return PeriodKind.AD, "cue SCTE-35 de pausa"
+                if event.signal.is_program:
+                    return PeriodKind.CONTENT, "cue SCTE-35 de programa"
+
+        if self.ad_id_pattern and self.ad_id_pattern.search(period.id):
+            return PeriodKind.AD, "id de Period"
+        return None
+
+    def classify(
+        self, period: PeriodModel, manifest: ManifestModel, now: Optional[float] = None
+    ) -> Tuple[PeriodKind, str]:
+        """`now` es la hora del servidor (epoch), para medir un Period abierto."""
+        if period.id in self._sticky:
+            return self._sticky[period.id], "recordado"
+
+        signal = self._signal_kind(period)
+        if signal is None:
+            inband = [
+                any(s in SCTE35_SCHEMES for s in p.inband_event_schemes)
+                for p in manifest.periods
+            ]
+            if any(inband) and not all(inband):
+                has_inband = any(
+                    s in SCTE35_SCHEMES for s in period.inband_event_schemes
+                )
+                signal = (
+                    (PeriodKind.CONTENT, "InbandEventStream SCTE-35")
+                    if has_inband
+                    else (PeriodKind.AD, "sin InbandEventStream SCTE-35")
+                )
+
+        if signal is None:
+            signal = self._heuristic_kind(period, manifest, now)
+            if signal is None:
+                return PeriodKind.PENDING, "Period abierto sin señales"
+        self._sticky[period.id] = signal[0]
+        return signal
+
+    def _heuristic_kind(
+        self, period: PeriodModel, manifest: ManifestModel, now: Optional[float]
+    ) -> Optional[Tuple[PeriodKind, str]]:
+        """Clasificación por duración, o None si todavía no se puede saber."""
+        if period.duration is not None:
+            if len(manifest.periods) > 1 and period.duration <= self.max_ad_duration:
+                return PeriodKind.AD, f"Period corto ({period.duration:.1f}s)"
+            return PeriodKind.CONTENT, "heurística"
+
+        if now is None or manifest.availability_start_time is None:
+            # Sin reloj no hay cómo medirlo: se graba como antes.
+            return PeriodKind.CONTENT, "heurística (sin reloj)"
+        elapsed = now - manifest.availability_start_time - period.start
+        if elapsed > self.max_ad_duration:
+            return PeriodKind.CONTENT, f"Period abierto de {elapsed:.0f}s"
+        depth = manifest.time_shift_buffer_depth
+        if depth is not None and elapsed >= depth:
+            return (
+                PeriodKind.CONTENT,
+                f"Period abierto de {elapsed:.0f}s; la ventana de timeshift "
+                f"({depth:.0f}s) no permite esperar más",
+            )
+        return None
+
+    def update(
+        self, manifest: ManifestModel, now: Optional[float] = None
+    ) -> List[PeriodModel]:
+        """
+        Clasifica los Periods del manifiesto y devuelve los de contenido en
+        orden; los pendientes no se incluyen hasta confirmarse. Los ids que
+        desaparecieron desde el último refresco quedan en `removed` para que
+        el llamador libere su estado.
+        """
+        current: Dict[str, PeriodKind] = {}
+        content = []
+        for period in manifest.periods:
+            kind, reason = self.classify(period, manifest, now)
+            current[period.id] = kind
+            if self._seen.get(period.id) != kind:
+                logger.info(
+                    f"Period '{period.id}' (inicio {period.start:.1f}s): {kind.value} ({reason})"
+                )
+            if kind == PeriodKind.CONTENT:
+                content.append(period)
+
+        self.removed = [pid for pid in self._seen if pid not in current]
+        for pid in self.removed:
+            self._sticky.pop(pid, None)
+        self._seen = current
+        return content
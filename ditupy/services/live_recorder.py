@@ -1,102 +1,420 @@
 import logging
+import signal
+import threading
 import time
 from pathlib import Path
-from typing import Union
+from typing import Callable, Dict, Optional, Set, Tuple, Union
 
-import requests
-
-from ditupy.dash import DashManifest
-from ditupy.schemas.simple_schedule import SimpleSchedule
+from ditupy.dash import Segment
+from ditupy.dash_model import ManifestModel, PeriodModel, RepresentationModel
+from ditupy.schemas.simple_schedule import CurrentSchedule, SimpleSchedule
+from ditupy.services.disk_budget import (
+    DiskBudget,
+    DiskReservation,
+    check_free_space,
+    estimate_job_bytes,
+    peak_factor,
+)
 from ditupy.services.downloader import SegmentDownloader
+from ditupy.services.hedging import HedgePolicy
+from ditupy.services.live_clock import LiveClock
+from ditupy.services.live_gaps import GapTracker
+from ditupy.services.live_periods import PeriodTracker
+from ditupy.services.live_timeline import LiveTimelineTracker
+from ditupy.services.manifest_poller import ManifestPoller
+from ditupy.services.rolling_output import RollingOutput
+from ditupy.track_selection import TrackPolicy, select_tracks
 
 logger = logging.getLogger(__name__)
 
+EpgLookup = Callable[[], Optional[Union[SimpleSchedule, CurrentSchedule]]]
+
 
 class LiveRecorder:
     def __init__(
-        self, manifest_url: str, schedule: SimpleSchedule, output_base: Union[Path, str]
+        self,
+        manifest_url: str,
+        schedule: SimpleSchedule,
+        output_base: Union[Path, str],
+        max_ad_duration: float = 180.0,
+        ad_id_pattern: Optional[str] = None,
+        policy: Optional[TrackPolicy] = None,
+        pre_roll: float = 60.0,
+        post_roll: float = 120.0,
+        epg_lookup: Optional[EpgLookup] = None,
+        epg_interval: float = 60.0,
+        downloader: Optional[SegmentDownloader] = None,
+        rolling: bool = False,
+        rotate_every: Optional[float] = None,
+        max_attempts: int = 5,
+        retry_delay: float = 1.0,
+        disk_budget: Optional[DiskBudget] = None,
     ):
+        """
+        :param policy: Criterios de selección de pistas. Por defecto, la mejor calidad.
+        :param pre_roll: Segundos que se graban antes del inicio según el EPG.
+        :param post_roll: Segundos que se graban después del fin según el EPG.
+        :param epg_lookup: Consulta del programa en emisión (p. ej.
+                           `lambda: client.get_current_live_program(channel_id)`).
+                           Si sigue siendo el mismo y su fin se movió, la
+                           grabación se extiende.
+        :param epg_interval: Cada cuántos segundos se consulta `epg_lookup`.
+        :param downloader: Descargador a usar; por defecto uno propio sobre
+                           `output_path`. `RecordingHost` inyecta uno que
+                           comparte sesión, pool y presupuesto de ancho de banda.
+        :param rolling: Anexar cada segmento a archivos fMP4 por pista mientras
+                        se graba (ver RollingOutput) en vez de dejarlos sueltos.
+        :param rotate_every: Con `rolling`, abrir una parte nueva cada N segundos.
+        :param max_attempts: Intentos por segmento antes de darlo por perdido.
+        :param retry_delay: Con segmentos pendientes, el siguiente ciclo no se
+                            demora más que esto (siguen en la ventana de timeshift).
+        :param disk_budget: Admisión por disco compartida (ver `RecordingHost`):
+                            la grabación sólo arranca si su estimación cabe.
+                            Sin él se comprueba el espacio libre y sólo se avisa.
+        :param max_ad_duration: Periods acotados más cortos que esto se tratan como
+                                anuncio cuando el MPD no trae señales SCTE-35.
+        :param ad_id_pattern: Regex opcional sobre el id del Period que marca anuncios.
+        """
         self.schedule = schedule
         self.manifest_url = manifest_url
-        output_base = Path(output_base) if isinstance(output_base, str) else output_base
-        self.output_path = output_base / f"{schedule.title_slug}_{schedule.content_id}"
-        self.downloader = SegmentDownloader(self.output_path)
+        self.output_path = self.recording_path(output_base, schedule)
+        self.downloader = downloader or SegmentDownloader(
+            self.output_path, hedge=HedgePolicy()
+        )
+        self.gaps = GapTracker(max_attempts, keep_order=rolling)
+        self.tracker = LiveTimelineTracker(on_event=self.gaps.on_timeline_event)
+        self.retry_delay = retry_delay
+        self.clock = LiveClock()
+        self.poller = ManifestPoller(
+            manifest_url, session=self.downloader.session, clock=self.clock
+        )
+        self.periods = PeriodTracker(max_ad_duration, ad_id_pattern)
+        self.policy = policy
+        self.disk_budget = disk_budget
+        self.reservation: Optional[DiskReservation] = None
+        self.output: Optional[RollingOutput] = None
+        if rolling:
+            self.output = RollingOutput(self.output_path, rotate_every=rotate_every)
+        self._started_periods: Set[str] = set()
+        self._fetched_at = 0.0
 
-    def _is_content_period(self, manifest: DashManifest) -> bool:
-        """Logica 'magica' para saber si es contenido o anuncio."""
-        # Si solo hay 1 periodo, asumimos que es contenido (logica magica que deberia cambiarse)
-        periods = manifest.get_periods()
-        return len(periods) == 1
+        self.pre_roll = pre_roll
+        self.post_roll = post_roll
+        self.epg_lookup = epg_lookup
+        self.epg_interval = epg_interval
+        self.start_at = schedule.airingStartTime / 1000 - pre_roll
+        self.end_at = schedule.airingEndTime / 1000 + post_roll
+        self._epg_checked_at = 0.0
+        self._stop_event = threading.Event()
 
-    def record(self):
-        logger.info(f"Iniciando grabación: {self.schedule.title}")
+        self._running = False
+        self._manifest: Optional[ManifestModel] = None
+        self._last_video: Optional[Segment] = None
+        self._last_period: Optional[PeriodModel] = None
 
-        # 1. Esperar contenido real
-        while True:
-            try:
-                xml = requests.get(self.manifest_url).text
-                manifest = DashManifest(xml, source_url=self.manifest_url)
+    @staticmethod
+    def recording_path(output_base: Union[Path, str], schedule: SimpleSchedule) -> Path:
+        """Carpeta donde se guarda la grabación de `schedule`."""
+        return Path(output_base) / f"{schedule.title_slug}_{schedule.content_id}"
 
-                if self._is_content_period(manifest):
-                    break
+    def _fetch_manifest(self) -> ManifestModel:
+        """Refresca el MPD (GET condicional); sólo se recompila si cambió."""
+        manifest = self.poller.fetch()
+        self._fetched_at = self.poller.fetched_at
+        return manifest
 
-                logger.info("Comerciales detectados... esperando.")
-                time.sleep(5)
-            except Exception as e:
-                logger.error(f"Error obteniendo manifiesto: {e}")
-                time.sleep(2)
+    def _poll_track(
+        self,
+        track: str,
+        manifest: ManifestModel,
+        period: PeriodModel,
+        rep: RepresentationModel,
+    ):
+        """
+        Segmentos nuevos de la pista, acotados al live edge si la plantilla no
+        tiene fin.
+        """
+        window_start, window_end = self.clock.live_window(manifest, period)
+        end = window_end if rep.is_open_ended else None
 
-        # 2. Configurar representaciones iniciales
-        period = manifest.get_content_period()
-        video_rep = period.get_adaptation_sets(type_filter="video")[
-            0
-        ].get_best_representation()
-        audio_rep = period.get_adaptation_sets(type_filter="audio")[
-            0
-        ].get_best_representation()
+        # En el primer poll se entra por el inicio de la grabación (con pre-roll)
+        # y no por el comienzo del timeshift, que puede ser de horas.
+        start = window_start
+        if manifest.availability_start_time is not None:
+            floor = self.start_at - manifest.availability_start_time - period.start
+            start = max(start or 0.0, floor)
+        return self.tracker.poll(track, rep, start=start, end=end)
 
-        if not video_rep or not audio_rep:
-            raise ValueError("No se encontraron representaciones de video o audio.")
+    def _select_tracks(
+        self, period: PeriodModel
+    ) -> Tuple[Optional[RepresentationModel], Optional[RepresentationModel]]:
+        try:
+            selection = select_tracks(period, self.policy)
+        except ValueError:
+            return None, None
+        return selection.video, selection.audio
 
+    def _preflight(
+        self, video_rep: RepresentationModel, audio_rep: RepresentationModel
+    ) -> bool:
+        """
+        Estima el disco de lo que queda de grabación (hasta el fin del EPG más
+        el post-roll), incluido el post-procesado. Con `disk_budget` la
+        grabación sólo se admite si cabe; sin él se avisa y se graba igual:
+        una grabación parcial vale más que ninguna.
+        """
+        bandwidth = video_rep.bandwidth + audio_rep.bandwidth
+        seconds = max(0.0, self.end_at - self.clock.now())
         logger.info(
-            f"Calidad seleccionada: Video {video_rep.height}p | Audio {audio_rep.bandwidth}"
+            "Tamaño estimado de la grabación: "
+            f"{bandwidth * seconds / 8 / 1024 / 1024:.1f} MB"
         )
+        if self.output is not None:
+            self.output.set_bitrate("video", video_rep.bandwidth, seconds)
+            self.output.set_bitrate("audio", audio_rep.bandwidth, seconds)
 
-        # Descargar inits
-        self.downloader.download_file(video_rep.initialization_url, "video")
-        self.downloader.download_file(audio_rep.initialization_url, "audio")
-
-        # 3. Bucle de captura principal
-        for _ in range(5):
-            start_loop = time.time()
-
-            # Refrescar manifiesto
-            xml = requests.get(self.manifest_url).text
-            manifest = DashManifest(xml, source_url=self.manifest_url)
-            period = manifest.get_content_period()
-            # Asumo que el ID se mantiene o re-buscas por calidad.
-
-            current_video = period.get_adaptation_sets(type_filter="video")[
-                0
-            ].get_best_representation()
-            current_audio = period.get_adaptation_sets(type_filter="audio")[
-                0
-            ].get_best_representation()
-            if not current_video or not current_audio:
-                logger.warning(
-                    "No se encontraron representaciones actuales. Saltando ciclo."
+        factor = peak_factor(encrypted=bool(video_rep.widevine_pssh))
+        needed = estimate_job_bytes(bandwidth, seconds, factor)
+        if self.disk_budget is not None:
+            try:
+                self.reservation = self.disk_budget.acquire(
+                    self.output_path, needed, wait=False
                 )
-                time.sleep(2)
-                continue
+            except OSError as e:
+                logger.error(f"Grabación no admitida por espacio: {e.strerror}")
+                return False
+            return True
+        try:
+            check_free_space(self.output_path, needed)
+        except OSError as e:
+            logger.warning(f"{e.strerror} Se graba igual.")
+        return True
+
+    def _forget_periods(self):
+        """Libera el estado de los Periods que salieron de la ventana del MPD."""
+        for period_id in self.periods.removed:
+            for track in ("video", "audio"):
+                key = f"{track}@{period_id}"
+                self.tracker.reset(key)
+                self.gaps.drop(key)
+                self._release(key)
+            self._started_periods.discard(period_id)
+
+    def _capture_period(
+        self, manifest: ManifestModel, period: PeriodModel
+    ) -> Optional[Segment]:
+        """Descarga lo nuevo de un Period de contenido. Retorna el último segmento de video."""
+        video_rep, audio_rep = self._select_tracks(period)
+        if not video_rep or not audio_rep:
+            logger.warning(
+                f"Period '{period.id}' sin representaciones de video o audio. Saltando."
+            )
+            return None
+
+        if period.id not in self._started_periods:
+            logger.info(
+                f"Period '{period.id}': Video {video_rep.height}p | Audio {audio_rep.bandwidth}"
+            )
+            if not self._started_periods and not self._preflight(video_rep, audio_rep):
+                self.stop()
+                return None
+            self.downloader.download_init(video_rep, "video", period.id)
+            self.downloader.download_init(audio_rep, "audio", period.id)
+            self._started_periods.add(period.id)
+
+        # Descargar en paralelo los segmentos nuevos desde el último ciclo,
+        # precedidos de los pendientes que siguen dentro de la ventana.
+        window_start, _ = self.clock.live_window(manifest, period)
+        new_video = []
+        for track, rep in (("video", video_rep), ("audio", audio_rep)):
+            key = f"{track}@{period.id}"
+            new = self._poll_track(key, manifest, period, rep)
+            if track == "video":
+                new_video = new
+            batch = self.gaps.schedule(key, new, window_start)
+            self.downloader.download_segments(batch, track, period.id, rep)
+            self.gaps.settle(
+                key,
+                batch,
+                lambda seg, track=track: self.downloader.segment_path(
+                    seg, track, period.id
+                ).exists(),
+            )
+
+            if self.output is not None:
+                self.output.set_init(
+                    track, self.downloader.init_path(rep, track, period.id)
+                )
+                self._release(key)
+        return new_video[-1] if new_video else None
+
+    def _release(self, key: str):
+        """Anexa a la salida continua lo que ya no espera por un hueco anterior."""
+        if self.output is None:
+            return
+        track, _, period = key.partition("@")
+        ready = self.gaps.ready(key)
+        self.output.append(
+            track,
+            [self.downloader.segment_path(seg, track, period) for seg in ready],
+            sum(seg.duration_seconds for seg in ready),
+        )
+
+    def stop(self):
+        """Pide detener la grabación; el ciclo en curso termina y se sale."""
+        self._stop_event.set()
+
+    def _install_signal_handlers(self) -> Dict[int, object]:
+        """SIGINT/SIGTERM detienen la grabación limpiamente (sólo en el hilo principal)."""
+        if threading.current_thread() is not threading.main_thread():
+            return {}
+        previous = {}
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            previous[sig] = signal.signal(sig, lambda *_: self.stop())
+        return previous
+
+    def _check_overrun(self):
+        """Extiende el fin si el EPG indica que el programa se alargó."""
+        if self.epg_lookup is None:
+            return
+        now = time.time()
+        if now - self._epg_checked_at < self.epg_interval:
+            return
+        self._epg_checked_at = now
+
+        try:
+            current = self.epg_lookup()
+        except Exception as e:
+            logger.warning(f"No se pudo consultar el EPG: {e}")
+            return
+        if current is None or current.contentId != self.schedule.contentId:
+            return
+
+        end_at = current.airingEndTime / 1000 + self.post_roll
+        if end_at > self.end_at:
+            logger.info(
+                f"El programa se extendió {end_at - self.end_at:.0f}s según el EPG."
+            )
+            self.end_at = end_at
+
+    def _capture_cycle(
+        self, manifest: ManifestModel
+    ) -> Tuple[Optional[Segment], Optional[PeriodModel]]:
+        """Un ciclo de captura. Retorna el último segmento de video y su Period."""
+        content_periods = self.periods.update(manifest, self.clock.now())
+        self._forget_periods()
+
+        # Sólo se espera cuando no hay ningún Period de contenido en la ventana.
+        if not content_periods:
+            logger.info("Sin Periods de contenido confirmados... esperando.")
+            return None, None
+
+        last_video, last_period = None, content_periods[-1]
+        for period in content_periods:
+            segment = self._capture_period(manifest, period)
+            if segment is not None:
+                last_video, last_period = segment, period
+        return last_video, last_period
+
+    def record(self):
+        previous_handlers = self._install_signal_handlers()
+        try:
+            wake_at: Optional[float] = self.scheduled_start()
+            while wake_at is not None:
+                self.clock.sleep_until(wake_at, self._stop_event)
+                wake_at = self.step()
+        finally:
+            for sig, handler in previous_handlers.items():
+                signal.signal(sig, handler)  # type: ignore
+
+    def scheduled_start(self) -> float:
+        """Hora local del primer ciclo: el inicio del EPG menos el pre-roll."""
+        logger.info(
+            f"Programando grabación: {self.schedule.title} "
+            f"({self.schedule.start_time_as_12hours} - {self.schedule.end_time_as_12hours})"
+        )
+        # El EPG está en hora del servidor.
+        return self.clock.to_local(self.start_at)
+
+    def step(self) -> Optional[float]:
+        """
+        Ejecuta un ciclo de captura y devuelve la hora local a la que conviene
+        el siguiente, o None si la grabación terminó. No duerme: así un mismo
+        hilo (o `RecordingHost`) puede intercalar muchas grabaciones.
+        """
+        if self._should_stop():
+            if self._running:
+                logger.info(f"Grabación finalizada: {self.schedule.title}")
+                logger.info(f"Manifiesto: {self.poller.stats}")
+            self._finish_gaps()
+            if self.output is not None:
+                self.output.close()
+            if self.reservation is not None:
+                self.reservation.release()
+            self._running = False
+            return None
+        if not self._running:
+            logger.info(f"Iniciando grabación: {self.schedule.title}")
+            self._running = True
+
+        cycle_started = time.time()
+        manifest = self._manifest
+        if manifest is None or self.clock.manifest_expired(manifest, self._fetched_at):
+            try:
+                manifest = self._manifest = self._fetch_manifest()
+            except Exception as e:
+                logger.error(f"Error obteniendo manifiesto: {e}")
+                return time.time() + 2
+
+        try:
+            segment, period = self._capture_cycle(manifest)
+            if self.output is not None:
+                self.output.maybe_rotate()
+        except Exception as e:
+            # Una falla puntual no debe tumbar una grabación de horas.
+            logger.error(f"Error en el ciclo de captura: {e}")
+            segment, period = None, None
+
+        if segment is not None:
+            self._last_video, self._last_period = segment, period
+        last_video, last_period = self._last_video, self._last_period
+        reference = period or last_period or manifest.periods[-1]
+
+        # El despertar se calcula sobre instantes absolutos (fetch del MPD y
+        # disponibilidad de segmentos), así un ciclo lento no acumula deriva.
+        video_rep, _ = self._select_tracks(reference)
+        wake_at = self.clock.next_wakeup(
+            manifest,
+            reference,
+            self._fetched_at,
+            (
+                last_video
+                if last_period is not None and reference.id == last_period.id
+                else None
+            ),
+            timeline_addressed=not (video_rep and video_rep.is_open_ended),
+        )
+        if self.gaps.has_pending:
+            wake_at = min(wake_at, time.time() + self.retry_delay)
+        elapsed = time.time() - cycle_started
+        if elapsed > self.clock.max_interval:
+            logger.warning(f"Ciclo lento: {elapsed:.1f}s.")
+        return min(wake_at, self.clock.to_local(self.end_at))
 
-            # Descargar segmentos en paralelo
-            self.downloader.download_batch(current_video.get_segments(), "video")
-            self.downloader.download_batch(current_audio.get_segments(), "audio")
+    def _finish_gaps(self):
+        """Da por perdidos los pendientes y escribe el informe de huecos."""
+        self.gaps.finish()
+        for key in self.gaps.keys:
+            self._release(key)
+        self.gaps.report(self.output_path)
 
-            # Control de ciclo
-            elapsed = time.time() - start_loop
-            sleep_time = max(0, 4 - elapsed)
-            time.sleep(sleep_time)
+    @property
+    def stopping(self) -> bool:
+        return self._stop_event.is_set()
 
     def _should_stop(self) -> bool:
-        return False
+        if self._stop_event.is_set():
+            logger.info("Detención solicitada.")
+            return True
+        self._check_overrun()
+        return self.clock.now() >= self.end_at
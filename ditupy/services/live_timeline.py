@@ -0,0 +1,229 @@
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from ditupy.dash import Segment
+from ditupy.dash_model import RepresentationModel
+
+logger = logging.getLogger(__name__)
+
+# Segmentos entregados que se recuerdan por pista para reconocer un MPD atrasado.
+_RECENT = 64
+
+
+@dataclass(frozen=True, slots=True)
+class TimelineEvent:
+    """
+    Incidencia detectada al comparar dos refrescos del manifiesto.
+
+    kind:
+        - "gap": faltan segmentos entre el último visto y el primero disponible.
+        - "renumber": el tiempo es continuo pero la numeración saltó (startNumber).
+        - "reset": la línea de tiempo retrocedió (reinicio del encoder/origen).
+    """
+
+    kind: str
+    track: str
+    expected_number: int
+    found_number: int
+    expected_time: int
+    found_time: int
+    timescale: int
+
+    @property
+    def missing_seconds(self) -> float:
+        return max(0, self.found_time - self.expected_time) / self.timescale
+
+
+@dataclass(slots=True)
+class _TrackState:
+    representation_id: str
+    timescale: int
+    last_number: int
+    end_time: int
+    # (número, fin) de los últimos segmentos entregados.
+    recent: Deque[Tuple[int, int]] = field(
+        default_factory=lambda: deque(maxlen=_RECENT)
+    )
+
+
+class LiveTimelineTracker:
+    """
+    Recuerda, por pista, el último segmento entregado y en cada refresco del
+    manifiesto devuelve sólo los posteriores. Los segmentos ya vistos se saltan
+    aritméticamente sobre las entradas <S>, así que el coste por ciclo depende
+    del contenido nuevo y no del tamaño de la ventana de timeshift.
+    """
+
+    def __init__(
+        self,
+        max_events: int = 100,
+        on_event: Optional[Callable[[TimelineEvent], None]] = None,
+    ):
+        """:param on_event: Se invoca con cada incidencia detectada."""
+        self._tracks: Dict[str, _TrackState] = {}
+        self.events: Deque[TimelineEvent] = deque(maxlen=max_events)
+        self.on_event = on_event
+
+    def reset(self, track: Optional[str] = None):
+        if track is None:
+            self._tracks.clear()
+        else:
+            self._tracks.pop(track, None)
+
+    def last_number(self, track: str) -> Optional[int]:
+        state = self._tracks.get(track)
+        return state.last_number if state else None
+
+    def poll(
+        self,
+        track: str,
+        rep: RepresentationModel,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+    ) -> List[Segment]:
+        """
+        Devuelve los segmentos nuevos de `rep` desde el último `poll` de la pista.
+        :param start: Punto de entrada (segundos relativos al Period) para el
+                      primer `poll`; después se continúa desde el último segmento.
+        :param end: Live edge (segundos relativos al Period). Sólo se entregan
+                    segmentos completos antes de ese instante. Necesario para
+                    plantillas sin fin como las basadas en @duration en vivo.
+        """
+        if end is None and rep.is_open_ended:
+            logger.warning(
+                f"[{track}] Plantilla sin fin y sin límite de ventana; se omite el ciclo."
+            )
+            return []
+
+        state = self._tracks.get(track)
+        if state is not None and state.timescale != rep.timescale:
+            logger.info(f"[{track}] Cambió el timescale; reiniciando seguimiento.")
+            state = None
+
+        if state is not None:
+            verdict = self._check_window(track, state, rep)
+            if verdict == "stale":
+                return []
+            if verdict == "reset":
+                # Se retoma desde el punto de entrada, como en el primer poll,
+                # y no desde el comienzo de la nueva ventana.
+                state = None
+
+        if state is None:
+            new = list(rep.iter_segments(start=start, end=end))
+        else:
+            new = list(rep.iter_segments(end=end, from_time=state.end_time))
+            if new:
+                self._check_continuity(track, state, new[0])
+
+        if end is not None:
+            while new and new[-1].end_seconds > end:
+                new.pop()
+
+        if new:
+            last = new[-1]
+            recent = state.recent if state else deque(maxlen=_RECENT)
+            recent.extend((s.number, s.time + s.duration) for s in new[-_RECENT:])
+            self._tracks[track] = _TrackState(
+                representation_id=rep.id,
+                timescale=last.timescale,
+                last_number=last.number,
+                end_time=last.time + last.duration,
+                recent=recent,
+            )
+        return new
+
+    def _check_window(
+        self, track: str, state: _TrackState, rep: RepresentationModel
+    ) -> Optional[str]:
+        """
+        Compara la ventana publicada con lo ya entregado. Retorna "stale" si el
+        MPD está atrasado (su último segmento es uno ya entregado, con el mismo
+        número y tiempo), "reset" si la línea de tiempo retrocedió de verdad,
+        o None si la ventana sigue más allá de lo entregado.
+        """
+        window = rep.timeline_window()
+        if window is None:
+            return None
+        _, window_end = window
+        if window_end is None or window_end > state.end_time:
+            return None
+
+        last = next(rep.iter_segments(from_time=window_end - 1), None)
+        if last is not None and self._delivered(state, last):
+            if window_end < state.end_time:
+                logger.debug(
+                    f"[{track}] MPD atrasado (termina en el segmento {last.number}, "
+                    f"ya se entregó hasta el {state.last_number}); se espera al próximo."
+                )
+            return "stale"
+
+        self._record(
+            TimelineEvent(
+                kind="reset",
+                track=track,
+                expected_number=state.last_number + 1,
+                found_number=-1 if last is None else last.number,
+                expected_time=state.end_time,
+                found_time=window_end,
+                timescale=state.timescale,
+            )
+        )
+        del self._tracks[track]
+        return "reset"
+
+    @staticmethod
+    def _delivered(state: _TrackState, segment: Segment) -> bool:
+        """True si `segment` coincide en número y tiempo con uno ya entregado."""
+        end = segment.time + segment.duration
+        if (segment.number, end) in state.recent:
+            return True
+        # Antes de lo recordado (p. ej. tras el primer poll): con duración
+        # constante número y tiempo avanzan a la par. Un MPD no se atrasa más
+        # de unos pocos segmentos; más allá se trata como reinicio.
+        behind = state.last_number - segment.number
+        return 0 <= behind <= _RECENT and (
+            state.end_time - end == behind * segment.duration
+        )
+
+    def _check_continuity(self, track: str, state: _TrackState, first: Segment):
+        expected_number = state.last_number + 1
+        if first.time > state.end_time:
+            kind = "gap"
+        elif first.number != expected_number:
+            kind = "renumber"
+        else:
+            return
+        self._record(
+            TimelineEvent(
+                kind=kind,
+                track=track,
+                expected_number=expected_number,
+                found_number=first.number,
+                expected_time=state.end_time,
+                found_time=first.time,
+                timescale=first.timescale,
+            )
+        )
+
+    def _record(self, event: TimelineEvent):
+        self.events.append(event)
+        if self.on_event is not None:
+            self.on_event(event)
+        if event.kind == "gap":
+            logger.warning(
+                f"[{event.track}] Hueco en la línea de tiempo: se esperaba el segmento "
+                f"{event.expected_number} y el primero disponible es {event.found_number} "
+                f"(~{event.missing_seconds:.2f}s perdidos)."
+            )
+        elif event.kind == "renumber":
+            logger.info(
+                f"[{event.track}] Salto de numeración: {event.expected_number} -> "
+                f"{event.found_number} con tiempo continuo."
+            )
+        else:
+            logger.warning(
+                f"[{event.track}] La línea de tiempo retrocedió; reiniciando seguimiento."
+            )
@@ -0,0 +1,167 @@
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from ditupy.concat import O_BINARY, Throttle, append_file
+
+logger = logging.getLogger(__name__)
+
+LOW_DISK_JOURNAL = "lowdisk.jsonl"
+
+# Bytes que se unen entre cada fdatasync + registro + borrado de segmentos.
+_SYNC_BYTES = 64 * 1024 * 1024
+
+# fdatasync no existe en Windows ni en macOS; fsync sincroniza igual.
+_datasync = getattr(os, "fdatasync", os.fsync)
+
+
+@dataclass
+class TrackProgress:
+    """Lo que el diario sabe de una pista: segmentos ya unidos y etapa."""
+
+    consumed: Set[str] = field(default_factory=set)
+    end: int = 0
+    complete: Optional[str] = None
+    decrypted: Optional[str] = None
+
+
+class ConsumeJournal:
+    """
+    Diario del modo de poco disco (`lowdisk.jsonl`). Los segmentos se borran
+    a medida que se unen, así que es la única constancia de qué parte de cada
+    pista ya está en el archivo temporal; con él, un post-procesado
+    interrumpido retoma donde quedó en lugar de fallar por segmentos
+    ausentes.
+
+    Una línea sólo se escribe después de que los datos que describe están
+    sincronizados en disco, y un segmento sólo se borra después de su línea.
+    """
+
+    def __init__(self, working_dir: Path):
+        self.path = Path(working_dir) / LOW_DISK_JOURNAL
+        self._lock = threading.Lock()
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def write(self, records: Iterable[dict]):
+        text = "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records)
+        if not text:
+            return
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def load(self) -> Tuple[Dict[str, TrackProgress], Dict[int, str]]:
+        """(progreso por pista, partes de la salida continua ya empaquetadas)."""
+        tracks: Dict[str, TrackProgress] = {}
+        parts: Dict[int, str] = {}
+        if not self.path.exists():
+            return tracks, parts
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Última línea a medio escribir: no llegó a contar.
+                    continue
+                if "part" in record:
+                    parts[record["part"]] = record["done"]
+                    continue
+                progress = tracks.setdefault(record["track"], TrackProgress())
+                if "file" in record:
+                    progress.consumed.add(record["file"])
+                    progress.end = record["end"]
+                elif "complete" in record:
+                    progress.complete = record["complete"]
+                    progress.end = record["end"]
+                elif "decrypted" in record:
+                    progress.decrypted = record["decrypted"]
+        return tracks, parts
+
+    def track(self, name: str) -> TrackProgress:
+        return self.load()[0].get(name, TrackProgress())
+
+    def clear(self):
+        self.path.unlink(missing_ok=True)
+
+
+def consume_concatenate(
+    files: Sequence[Path],
+    output_path: Path,
+    journal: ConsumeJournal,
+    track: str,
+    on_consumed: Optional[Callable[[int], None]] = None,
+    sync_bytes: int = _SYNC_BYTES,
+    throttle: Throttle = None,
+) -> int:
+    """
+    Une `files` en `output_path` borrando cada segmento una vez que su copia
+    está sincronizada y registrada: el disco ocupado por la pista no pasa de
+    su tamaño más un lote. Si el diario ya tiene progreso, se descarta lo
+    escrito después del último registro y se sigue desde ahí.
+
+    `on_consumed(bytes)` se llama con el tamaño de cada lote borrado y
+    `throttle(bytes)` con cada bloque copiado.
+    Retorna el tamaño final de la pista.
+    """
+    progress = journal.track(track)
+    if progress.complete == output_path.name and output_path.exists():
+        return progress.end
+    if progress.end and not output_path.exists():
+        raise FileNotFoundError(
+            f"{output_path.name}: el diario registra {len(progress.consumed)} "
+            "segmentos unidos pero la pista temporal no existe."
+        )
+    if progress.consumed:
+        logger.info(
+            f"[{track}] Reanudando unión: {len(progress.consumed)} segmentos "
+            f"ya unidos ({progress.end / 1024 / 1024:.1f} MB)."
+        )
+
+    fd_out = os.open(output_path, os.O_WRONLY | os.O_CREAT | O_BINARY, 0o644)
+    try:
+        os.ftruncate(fd_out, progress.end)
+        end = progress.end
+        batch: List[Tuple[Path, int, int]] = []
+        batch_bytes = 0
+
+        def flush():
+            nonlocal batch_bytes
+            if not batch:
+                return
+            _datasync(fd_out)
+            journal.write(
+                {"track": track, "file": p.name, "end": e} for p, e, _ in batch
+            )
+            for path, _, _ in batch:
+                path.unlink(missing_ok=True)
+            if on_consumed is not None:
+                on_consumed(sum(size for _, _, size in batch))
+            batch.clear()
+            batch_bytes = 0
+
+        for path in files:
+            if path.name in progress.consumed:
+                # Registrado antes de la interrupción pero sin llegar a borrarse.
+                path.unlink(missing_ok=True)
+                continue
+            start = end
+            end = append_file(path, fd_out, start, throttle)
+            batch.append((path, end, end - start))
+            batch_bytes += end - start
+            if batch_bytes >= sync_bytes:
+                flush()
+        flush()
+        os.ftruncate(fd_out, end)
+    finally:
+        os.close(fd_out)
+
+    journal.write([{"track": track, "complete": output_path.name, "end": end}])
+    return end
@@ -0,0 +1,120 @@
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import requests
+
+from ditupy.dash_model import ManifestModel
+from ditupy.services.downloader import new_session
+from ditupy.services.live_clock import LiveClock
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class PollStats:
+    requests: int = 0
+    not_modified: int = 0  # 304
+    unchanged: int = 0  # 200 con el mismo contenido
+    updated: int = 0
+    errors: int = 0
+    bytes_received: int = 0
+
+    @property
+    def useful_ratio(self) -> float:
+        """Fracción de peticiones que trajeron un manifiesto nuevo."""
+        return self.updated / self.requests if self.requests else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.requests} peticiones: {self.updated} con cambios, "
+            f"{self.not_modified} 304, {self.unchanged} iguales, {self.errors} errores, "
+            f"{self.bytes_received / 1024:.1f} KiB"
+        )
+
+
+class ManifestPoller:
+    """
+    Refresca un MPD live sobre una sesión persistente (keep-alive, gzip) con
+    GET condicional (If-None-Match / If-Modified-Since). Si el servidor no
+    soporta validadores, el hash del cuerpo evita volver a compilar un
+    manifiesto idéntico.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        session: Optional[requests.Session] = None,
+        clock: Optional[LiveClock] = None,
+        timeout: float = 10.0,
+        http2: bool = False,
+    ):
+        """
+        :param clock: Si se indica, se sincroniza con el header Date de cada respuesta.
+        :param http2: Con la sesión propia, pedir el MPD sobre HTTP/2 si el
+                      servidor lo negocia (ver `new_session`).
+        """
+        self.url = url
+        self.session = session or new_session(http2=http2)
+        self.clock = clock
+        self.timeout = timeout
+        self.stats = PollStats()
+        self.fetched_at = 0.0
+
+        self._etag: Optional[str] = None
+        self._last_modified: Optional[str] = None
+        self._digest: Optional[bytes] = None
+        self._manifest: Optional[ManifestModel] = None
+
+    @property
+    def manifest(self) -> Optional[ManifestModel]:
+        return self._manifest
+
+    def fetch(self) -> ManifestModel:
+        """
+        Devuelve el manifiesto vigente; sólo lo compila si cambió.
+        Los errores HTTP se propagan, igual que con `requests`.
+        """
+        headers = {}
+        if self._manifest is not None:
+            if self._etag:
+                headers["If-None-Match"] = self._etag
+            if self._last_modified:
+                headers["If-Modified-Since"] = self._last_modified
+
+        self.stats.requests += 1
+        sent_at = time.time()
+        try:
+            resp = self.session.get(self.url, headers=headers, timeout=self.timeout)
+            received_at = time.time()
+            if resp.status_code != 304:
+                resp.raise_for_status()
+        except requests.RequestException:
+            self.stats.errors += 1
+            raise
+
+        if self.clock is not None:
+            self.clock.sync(resp.headers.get("Date"), sent_at, received_at)
+        self.fetched_at = received_at
+
+        if resp.status_code == 304 and self._manifest is not None:
+            self.stats.not_modified += 1
+            return self._manifest
+
+        body = resp.content
+        self.stats.bytes_received += len(body)
+        self._etag = resp.headers.get("ETag")
+        self._last_modified = resp.headers.get("Last-Modified")
+
+        digest = hashlib.blake2b(body, digest_size=16).digest()
+        if digest == self._digest and self._manifest is not None:
+            self.stats.unchanged += 1
+            return self._manifest
+
+        # resp.url refleja redirecciones: las BaseURL relativas cuelgan de ahí.
+        self._manifest = ManifestModel.from_xml(resp.text, source_url=resp.url)
+        self._digest = digest
+        self.stats.updated += 1
+        return self._manifest
@@ -0,0 +1,139 @@
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+from ditupy.services.processor import PostProcessor, ResourceLimits
+
+logger = logging.getLogger(__name__)
+
+
+class PostProcessExecutor:
+    """
+    Cola de post-procesado: cada `submit` encola un episodio y retorna de
+    inmediato, así la descarga del siguiente se solapa con el muxing del
+    anterior.
+
+    Varios episodios se procesan a la vez y, dentro de cada uno, video y audio
+    se preparan en paralelo. Los procesos externos de todos ellos comparten
+    los cupos de `ResourceLimits` (CPU y ancho de banda de disco).
+    """
+
+    def __init__(
+        self,
+        max_episodes: int = 2,
+        max_processes: Optional[int] = None,
+        disk_bandwidth: Optional[float] = None,
+    ):
+        """
+        :param max_episodes: Episodios en proceso simultáneo.
+        :param max_processes: Procesos externos simultáneos; por defecto, uno por CPU.
+        :param disk_bandwidth: Bytes por segundo de disco para el conjunto; None = sin límite.
+        """
+        self.limits = ResourceLimits(max_processes, disk_bandwidth)
+        self.episode_pool = ThreadPoolExecutor(
+            max_workers=max_episodes, thread_name_prefix="postproc"
+        )
+        # Pool aparte para las pistas: un episodio espera a las suyas sin
+        # ocupar los hilos de los demás episodios.
+        self.track_pool = ThreadPoolExecutor(
+            max_workers=2 * max_episodes, thread_name_prefix="track"
+        )
+        self._futures: Dict[Path, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        working_dir: Union[Path, str],
+        output_filename: str,
+        keys: Optional[Dict[str, str]] = None,
+        expected_duration: Optional[float] = None,
+        cleanup: bool = True,
+        streaming: bool = True,
+        allow_missing: bool = False,
+        remux_mode: Optional[str] = "faststart",
+        low_disk: bool = False,
+    ) -> "Future[bool]":
+        """
+        Encola el post-procesado de una carpeta. El Future resuelve a True si
+        se generó el archivo final (y, con `expected_duration`, si pasó
+        `verify_integrity`).
+        """
+        working_dir = Path(working_dir)
+        future = self.episode_pool.submit(
+            self._run,
+            working_dir,
+            output_filename,
+            keys,
+            expected_duration,
+            cleanup,
+            streaming,
+            allow_missing,
+            remux_mode,
+            low_disk,
+        )
+        with self._lock:
+            self._futures[working_dir] = future
+        return future
+
+    def _run(
+        self,
+        working_dir: Path,
+        output_filename: str,
+        keys: Optional[Dict[str, str]],
+        expected_duration: Optional[float],
+        cleanup: bool,
+        streaming: bool,
+        allow_missing: bool,
+        remux_mode: Optional[str],
+        low_disk: bool,
+    ) -> bool:
+        processor = PostProcessor(
+            working_dir, limits=self.limits, track_pool=self.track_pool
+        )
+        logger.info(f"Post-procesando {working_dir.name}...")
+        if not processor.process(
+            output_filename,
+            keys=keys,
+            cleanup=cleanup,
+            streaming=streaming,
+            allow_missing=allow_missing,
+            remux_mode=remux_mode,
+            low_disk=low_disk,
+        ):
+            return False
+        if expected_duration is None:
+            return True
+        return processor.verify_integrity(
+            working_dir / output_filename, expected_duration
+        )
+
+    @property
+    def pending(self) -> int:
+        """Episodios encolados o en proceso."""
+        with self._lock:
+            return sum(1 for f in self._futures.values() if not f.done())
+
+    def wait(self) -> Dict[Path, bool]:
+        """Espera a todo lo encolado. Un episodio que lanzó excepción cuenta como False."""
+        with self._lock:
+            futures = dict(self._futures)
+        results = {}
+        for working_dir, future in futures.items():
+            try:
+                results[working_dir] = future.result()
+            except Exception as e:
+                logger.error(f"Post-procesado fallido en {working_dir.name}: {e}")
+                results[working_dir] = False
+        return results
+
+    def shutdown(self, wait: bool = True):
+        self.episode_pool.shutdown(wait=wait)
+        self.track_pool.shutdown(wait=wait)
+
+    def __enter__(self) -> "PostProcessExecutor":
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
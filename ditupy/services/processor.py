@@ -1,17 +1,261 @@
+import errno
+import json
 import logging
+import os
 import re
 import shutil
+import signal
+import struct
 import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, List, Optional, Union
+from typing import Callable, Collection, Dict, List, Optional, Tuple, Union
+
+from ditupy.concat import Throttle, concatenate_files, stream_files
+from ditupy.isobmff import MediaInfo, find_protection, inspect_file, read_init
+from ditupy.remux import remux
+from ditupy.schemas.types import ClipInfo
+from ditupy.services.disk_budget import streaming_available
+from ditupy.services.downloader import BandwidthLimiter
+from ditupy.services.live_gaps import GAPS_REPORT
+from ditupy.services.low_disk import ConsumeJournal, TrackProgress, consume_concatenate
+from ditupy.services.rolling_output import (
+    ROLLING_DIR,
+    ROLLING_INDEX,
+    trim_preallocated,
+)
+from ditupy.services.track_index import TrackIndex
 
 logger = logging.getLogger(__name__)
 
+# /proc/<pid>/io: bytes que cada proceso mueve de disco (sólo Linux).
+_PROC_IO = os.path.exists("/proc/self/io")
+
+
+def _storage_io(pid: int) -> Optional[int]:
+    """read_bytes + write_bytes de `pid`; None si ya terminó o no se puede leer."""
+    try:
+        with open(f"/proc/{pid}/io", encoding="ascii") as f:
+            fields = dict(line.split(":", 1) for line in f)
+        return int(fields["read_bytes"]) + int(fields["write_bytes"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _feed_fifo(fifo: Path, files: List[Path], throttle: Throttle = None):
+    """Escribe los segmentos de una pista en su FIFO; FFmpeg lee del otro lado."""
+    try:
+        with open(fifo, "wb", buffering=0) as out:
+            stream_files(files, out.fileno(), throttle)
+    except BrokenPipeError:
+        # FFmpeg cerró la entrada (error o recorte que no necesita el resto).
+        pass
+    except OSError as e:
+        logger.error(f"Error alimentando {fifo.name}: {e}")
+
+
+class _DiskPeak:
+    """
+    Pico de espacio ocupado en `path` durante el bloque: los segmentos de
+    entrada (`segments` bytes, menos los que se van borrando) más los archivos
+    de primer nivel (pistas temporales, descifradas y la salida). Se muestrea
+    en segundo plano y en los puntos donde se llama a `sample()`.
+
+    `content` es el tamaño del contenido para expresar el pico como múltiplo;
+    por defecto, `segments`.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        segments: int = 0,
+        content: Optional[int] = None,
+        interval: float = 0.2,
+    ):
+        self.path = path
+        self.segments = segments
+        self.content = segments if content is None else content
+        self.interval = interval
+        self.peak = 0
+        self._consumed = 0
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def consumed(self, nbytes: int):
+        """Descuenta segmentos ya borrados (modo de poco disco)."""
+        with self._lock:
+            self._consumed += nbytes
+
+    def sample(self):
+        used = 0
+        for entry in os.scandir(self.path):
+            try:
+                if entry.is_file():
+                    used += entry.stat().st_size
+            except OSError:
+                continue
+        with self._lock:
+            # Lectura tras el listado: un lote borrado entre medio no se cuenta dos veces.
+            used += self.segments - self._consumed
+            self.peak = max(self.peak, used)
+
+    @property
+    def ratio(self) -> float:
+        """Pico relativo al tamaño del contenido."""
+        return self.peak / self.content if self.content else 0.0
+
+    def _run(self):
+        while not self._done.wait(self.interval):
+            self.sample()
+
+    def __enter__(self) -> "_DiskPeak":
+        self.sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._done.set()
+        self._thread.join()
+        self.sample()
+
+
+class ResourceLimits:
+    """
+    Cupos compartidos entre post-procesos: procesos externos simultáneos
+    (ffmpeg, ffprobe, mp4decrypt; por defecto uno por CPU) y, opcionalmente,
+    un presupuesto de bytes por segundo de disco.
+
+    Las copias propias (unión, remux interno, alimentación de FIFOs) descuentan
+    el presupuesto bloque a bloque con `throttle`. Los procesos externos
+    lanzados con `run` (o vigilados con `metered`) se miden mientras corren
+    por `/proc/<pid>/io`, y se detienen mientras el presupuesto está agotado.
+    Sin /proc sólo se puede espaciar su admisión según lo que van a mover.
+    """
+
+    def __init__(
+        self,
+        max_processes: Optional[int] = None,
+        disk_bandwidth: Optional[float] = None,
+    ):
+        self.max_processes = max_processes or os.cpu_count() or 1
+        self._processes = threading.BoundedSemaphore(self.max_processes)
+        self.disk = BandwidthLimiter(disk_bandwidth) if disk_bandwidth else None
+
+    def io(self, nbytes: int):
+        """Descuenta `nbytes` del presupuesto de disco, esperando si se agotó."""
+        if self.disk is not None and nbytes > 0:
+            self.disk.consume(nbytes)
+
+    @property
+    def throttle(self) -> Throttle:
+        """`io` para pasar a las copias por bloques, o None si no hay límite."""
+        return self.io if self.disk is not None else None
+
+    @contextmanager
+    def process(self):
+        """Reserva un cupo para un proceso externo (o un trabajo propio pesado)."""
+        with self._processes:
+            yield
+
+    def run(
+        self,
+        cmd: List[str],
+        io_bytes: int = 0,
+        check: bool = False,
+        capture_output: bool = False,
+        **kwargs,
+    ) -> subprocess.CompletedProcess:
+        """
+        `subprocess.run` dentro de un cupo y con el disco medido (`metered`).
+        `io_bytes` (lo que moverá de disco) sólo se usa sin /proc: se descuenta
+        antes de admitir el proceso.
+        """
+        if capture_output:
+            kwargs["stdout"] = kwargs["stderr"] = subprocess.PIPE
+        if not _PROC_IO:
+            self.io(io_bytes)
+        with self.process(), subprocess.Popen(cmd, **kwargs) as proc:
+            try:
+                with self.metered(proc):
+                    stdout, stderr = proc.communicate()
+            except BaseException:
+                proc.kill()
+                raise
+        if check and proc.returncode:
+            raise subprocess.CalledProcessError(proc.returncode, cmd, stdout, stderr)
+        return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+
+    @contextmanager
+    def metered(self, proc: subprocess.Popen, interval: float = 0.1):
+        """
+        Mientras dura el bloque, descuenta lo que `proc` lee y escribe en el
+        almacenamiento (read_bytes + write_bytes: no cuenta lecturas de la
+        caché ni de pipes, que ya pagó quien las alimenta). Si el presupuesto
+        se agota, el proceso queda detenido (SIGSTOP) lo que indique la tasa.
+        """
+        if self.disk is None or not _PROC_IO:
+            yield
+            return
+        done = threading.Event()
+        meter = threading.Thread(
+            target=self._meter, args=(proc, done, interval), daemon=True
+        )
+        meter.start()
+        try:
+            yield
+        finally:
+            done.set()
+            meter.join()
+
+    def _meter(self, proc: subprocess.Popen, done: threading.Event, interval: float):
+        charged = 0
+        while not done.wait(interval):
+            moved = _storage_io(proc.pid)
+            if moved is None:
+                return
+            if moved <= charged:
+                continue
+            delay = self.disk.reserve(moved - charged)
+            charged = moved
+            if delay <= 0 or proc.returncode is not None:
+                continue
+            try:
+                os.kill(proc.pid, signal.SIGSTOP)
+            except ProcessLookupError:
+                return
+            try:
+                # Si el bloque termina antes (error, interrupción) se reanuda ya.
+                done.wait(delay)
+            finally:
+                try:
+                    os.kill(proc.pid, signal.SIGCONT)
+                except ProcessLookupError:
+                    return
+
 
 class PostProcessor:
-    def __init__(self, working_dir: Union[str, Path]):
+    def __init__(
+        self,
+        working_dir: Union[str, Path],
+        limits: Optional[ResourceLimits] = None,
+        track_pool: Optional[Executor] = None,
+    ):
+        """
+        :param limits: Cupos de procesos y disco; sin ellos no hay límite.
+        :param track_pool: Pool donde se preparan las pistas en paralelo. Debe
+                           ser distinto del que ejecuta `process` para no
+                           bloquearse esperando a sus propias tareas.
+        """
         working_dir = Path(working_dir) if isinstance(working_dir, str) else working_dir
         self.working_dir = working_dir
+        self.limits = limits or ResourceLimits()
+        self.remux_mode: Optional[str] = "faststart"
+        self.track_pool = track_pool
         self.video_dir = working_dir / "video"
         self.audio_dir = working_dir / "audio"
 
@@ -45,16 +289,57 @@ class PostProcessor:
 
         return files
 
+    def _track_files(
+        self,
+        directory: Path,
+        allow_missing: bool = False,
+        consumed: Collection[str] = (),
+    ) -> Optional[List[Path]]:
+        """
+        Archivos de la pista en orden (init primero) según el índice que
+        escribió el descargador. Si faltan entradas se listan y se retorna None,
+        salvo con `allow_missing`; con inits incompatibles entre Periods
+        siempre se retorna None. Carpetas sin índice (descargas anteriores)
+        se ordenan por nombre como antes.
+        """
+        index = TrackIndex(directory)
+        if not index.exists():
+            if directory.exists():
+                logger.warning(f"{directory.name}: sin índice; se ordena por nombre.")
+            return self._get_sorted_segments(directory, "segment_init.mp4")
+
+        try:
+            files, problems = index.resolve(consumed)
+        except ValueError as e:
+            logger.error(f"{directory.name}: {e}")
+            return None
+        if problems:
+            log = logger.warning if allow_missing else logger.error
+            log(f"{directory.name}: {len(problems)} problema(s) en el índice:")
+            for problem in problems:
+                log(f"  {problem}")
+            if not allow_missing:
+                logger.error("No se empaqueta una pista incompleta.")
+                return None
+        return files
+
     def _concatenate_binary(self, files: List[Path], output_path: Path):
         """Une archivos a nivel de bytes."""
         if not files:
             return
 
         logger.info(f"Uniendo {len(files)} segmentos en {output_path.name}...")
-        with open(output_path, "wb") as outfile:
-            for f in files:
-                with open(f, "rb") as readfile:
-                    shutil.copyfileobj(readfile, outfile)
+        written, method = concatenate_files(
+            files, output_path, throttle=self.limits.throttle
+        )
+        logger.info(f"Unidos {written / 1024 / 1024:.1f} MB ({method}).")
+
+    def _load_clip(self) -> Optional[ClipInfo]:
+        """Recorte pedido al descargar (clip.json), si lo hay."""
+        clip_path = self.working_dir / "clip.json"
+        if not clip_path.exists():
+            return None
+        return ClipInfo.model_validate_json(clip_path.read_text(encoding="utf-8"))
 
     def _decrypt_track(
         self, encrypted_path: Path, keys: Dict[str, str]
@@ -84,8 +369,12 @@ class PostProcessor:
 
         try:
             logger.info(f"Desencriptando {encrypted_path.name}...")
-            subprocess.run(
-                cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+            self.limits.run(
+                cmd,
+                io_bytes=encrypted_path.stat().st_size,
+                check=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
             )
             return decrypted_path
         except subprocess.CalledProcessError as e:
@@ -102,67 +391,484 @@ class PostProcessor:
         output_filename: str,
         keys: Optional[Dict[str, str]] = None,
         cleanup: bool = True,
-    ):
+        streaming: bool = True,
+        allow_missing: bool = False,
+        remux_mode: Optional[str] = "faststart",
+        low_disk: bool = False,
+    ) -> bool:
         """
-        Orquesta la unión, (desencriptación) y el muxing final.
+        Orquesta la unión, (desencriptación) y el muxing final. Retorna True si
+        se generó el archivo final.
+        Si la grabación usó salida continua (rolling.json), no hay nada que unir.
+
+        :param streaming: Alimentar a FFmpeg con los segmentos por FIFOs (y
+                          descifrar con -decryption_key) sin pistas temporales
+                          en disco. Si no aplica (sin mkfifo, esquema distinto
+                          de cenc, KID sin llave) se usa la ruta con archivos.
+        :param allow_missing: Unir lo que haya aunque el índice de la pista
+                              registre segmentos faltantes (p. ej. una
+                              grabación live con huecos ya conocidos).
+        :param remux_mode: Muxing en proceso (`ditupy.remux`) para pistas en
+                           claro o ya descifradas: "faststart" (moov al
+                           principio), "fragmented" o None para usar siempre
+                           FFmpeg. Con recorte (clip.json) o si el remuxer no
+                           soporta la entrada se usa FFmpeg.
+        :param low_disk: En la ruta con archivos, borrar cada segmento en
+                         cuanto está unido y cada pista intermedia en cuanto
+                         la siguiente etapa la reemplaza, para no pasar de ~2x
+                         el contenido. El avance queda en `lowdisk.jsonl`; si
+                         se interrumpe, otra llamada con `low_disk` retoma.
+                         El remux interno y el streaming ya ocupan ~2x y
+                         conservan los segmentos hasta terminar.
         """
-        temp_video_enc = self.working_dir / "temp_video_enc.mp4"
-        temp_audio_enc = self.working_dir / "temp_audio_enc.mp4"
-
+        if remux_mode not in (None, "faststart", "fragmented"):
+            raise ValueError(f"remux_mode desconocido: {remux_mode}")
+        self.remux_mode = remux_mode
+        if (self.working_dir / ROLLING_INDEX).exists():
+            return self._process_rolling(output_filename, keys, cleanup, low_disk)
+
+        journal = ConsumeJournal(self.working_dir) if low_disk else None
+        progress = journal.load()[0] if journal else {}
         final_output = self.working_dir / output_filename
+        tracks: List[List[Path]] = []
+        for name, directory in (("video", self.video_dir), ("audio", self.audio_dir)):
+            done = progress.get(name, TrackProgress())
+            files = self._track_files(directory, allow_missing, done.consumed)
+            if files is None:
+                return False
+            if not files and not done.end:
+                if name == "video":
+                    logger.error("No se encontraron segmentos de video.")
+                    return False
+                continue
+            tracks.append(files)
+
+        # Al reanudar, los segmentos ya unidos no existen: sólo sirve la ruta
+        # con archivos, que sigue desde el diario.
+        resuming = any(p.end for p in progress.values())
+        encrypted = (
+            not resuming
+            and bool(keys)
+            and any(
+                find_protection(read_init(files[0])) is not None for files in tracks
+            )
+        )
+        stream_keys = None
+        if streaming and not resuming:
+            stream_keys = self._stream_keys(tracks, keys)
+        mode = "streaming" if stream_keys is not None else "archivos"
+        # Al reanudar, lo ya unido está en las pistas temporales (y cuenta como
+        # archivo de primer nivel), pero sigue siendo parte del contenido.
+        segments = sum(f.stat().st_size for files in tracks for f in files)
+        content = segments + sum(p.end for p in progress.values())
+        started = time.perf_counter()
+        with _DiskPeak(self.working_dir, segments, content) as disk:
+            ok = False
+            if resuming:
+                logger.info("Reanudando post-procesado con poco disco.")
+            elif not encrypted and self._remux(tracks, final_output):
+                ok, mode = True, "remux"
+            elif stream_keys is not None:
+                ok = self._process_streaming(tracks, final_output, stream_keys)
+                if not ok:
+                    logger.warning(
+                        "Falló el modo streaming; reintentando con archivos."
+                    )
+                    mode = "archivos"
+            if not ok:
+                ok = self._process_files(tracks, final_output, keys, disk, journal)
+        if mode == "archivos" and journal is not None:
+            mode = "archivos con poco disco"
+        logger.info(
+            f"Modo {mode}: {time.perf_counter() - started:.1f}s, "
+            f"pico de disco {disk.peak / 1024 / 1024:.1f} MB "
+            f"({disk.ratio:.2f}x el contenido)"
+        )
 
-        video_files = self._get_sorted_segments(self.video_dir, "segment_init.mp4")
-        video_track = None
+        if ok:
+            logger.info(f"¡Éxito! Video final creado en: {final_output}")
+            if cleanup:
+                logger.info("Limpiando temporales...")
+                self._cleanup_garbage([])
+        return ok
 
-        if video_files:
-            self._concatenate_binary(video_files, temp_video_enc)
-            if keys:
-                video_track = self._decrypt_track(temp_video_enc, keys)
-                if not video_track:
-                    logger.error("Fallo crítico en desencriptación de video.")
-                    return
-            else:
-                video_track = temp_video_enc
+    def _mux_command(
+        self,
+        inputs: List[Path],
+        output: Path,
+        decryption_keys: Optional[List[Optional[str]]] = None,
+    ) -> List[str]:
+        """Comando de FFmpeg que une las pistas sin recodificar (con recorte si lo hay)."""
+        clip = self._load_clip()
+        cmd = ["ffmpeg", "-y"]
+
+        # En modo recorte cada pista empieza en su primer segmento descargado:
+        # se busca el desfase en cada entrada y se limita la duración, sin recodificar.
+        if clip:
+            logger.info(
+                f"Recortando a [{clip.start:.2f}s, {clip.end:.2f}s) ({clip.duration:.2f}s)"
+            )
+        offsets = [clip.video_offset, clip.audio_offset] if clip else []
+        for number, path in enumerate(inputs):
+            if clip:
+                cmd.extend(["-ss", f"{offsets[number]:.3f}"])
+            if decryption_keys and decryption_keys[number]:
+                cmd.extend(["-decryption_key", decryption_keys[number]])  # type: ignore
+            cmd.extend(["-i", str(path)])
+
+        if clip:
+            cmd.extend(["-t", f"{clip.duration:.3f}"])
+        cmd.extend(["-c", "copy", "-movflags", "+faststart", str(output)])
+        return cmd
+
+    def _prepare_track(
+        self,
+        name: str,
+        files: List[Path],
+        keys: Optional[Dict[str, str]],
+        disk: Optional[_DiskPeak] = None,
+        journal: Optional[ConsumeJournal] = None,
+    ) -> Tuple[Optional[Path], List[Path]]:
+        """Concatena (y descifra) una pista. Retorna (pista lista, temporales creados)."""
+        temp_enc = self.working_dir / f"temp_{name}_enc.mp4"
+        if journal is None:
+            self._concatenate_binary(files, temp_enc)
         else:
-            logger.error("No se encontraron segmentos de video.")
-            return
-
-        audio_files = self._get_sorted_segments(self.audio_dir, "segment_init.mp4")
-        audio_track = None
-
-        if audio_files:
-            self._concatenate_binary(audio_files, temp_audio_enc)
-            if keys:
-                audio_track = self._decrypt_track(temp_audio_enc, keys)
-            else:
-                audio_track = temp_audio_enc
-
-        logger.info("Empaquetando contenedor final con FFmpeg...")
-        cmd = ["ffmpeg", "-y", "-i", str(video_track)]
-
-        if audio_track:
-            cmd.extend(["-i", str(audio_track)])
+            decrypted = journal.track(name).decrypted
+            if decrypted and (self.working_dir / decrypted).exists():
+                logger.info(f"[{name}] Pista ya descifrada: {decrypted}")
+                return self.working_dir / decrypted, [self.working_dir / decrypted]
+            if files:
+                logger.info(
+                    f"Uniendo {len(files)} segmentos en {temp_enc.name} (poco disco)..."
+                )
+            consume_concatenate(
+                files,
+                temp_enc,
+                journal,
+                name,
+                on_consumed=disk.consumed if disk is not None else None,
+                throttle=self.limits.throttle,
+            )
+        if not keys:
+            return temp_enc, [temp_enc]
+        decrypted = self._decrypt_track(temp_enc, keys)
+        if journal is not None and decrypted is not None and decrypted != temp_enc:
+            # La pista cifrada ya no hace falta: se libera antes del muxing.
+            journal.write([{"track": name, "decrypted": decrypted.name}])
+            temp_enc.unlink()
+            return decrypted, [decrypted]
+        return decrypted, [p for p in (temp_enc, decrypted) if p is not None]
+
+    def _map_tracks(self, fn: Callable, tracks: List[List[Path]], *args) -> list:
+        """Ejecuta `fn(nombre, archivos, *args)` por pista, en paralelo."""
+        names = ("video", "audio")[: len(tracks)]
+        if self.track_pool is not None:
+            futures = [
+                self.track_pool.submit(fn, name, files, *args)
+                for name, files in zip(names, tracks)
+            ]
+            return [f.result() for f in futures]
+        with ThreadPoolExecutor(max_workers=len(tracks)) as pool:
+            return list(pool.map(lambda nf: fn(*nf, *args), zip(names, tracks)))
+
+    def _remux(
+        self, tracks: List[List[Path]], output: Path, fragmented: bool = False
+    ) -> bool:
+        """
+        Mux en proceso, sin FFmpeg. False si está desactivado, hay recorte o
+        la entrada no es soportable: el llamador sigue con FFmpeg.
+        """
+        if self.remux_mode is None or self._load_clip() is not None:
+            return False
+        fragmented = fragmented or self.remux_mode == "fragmented"
+        try:
+            # Cupo de proceso sin bytes: el disco se descuenta al escribir.
+            with self.limits.process():
+                written = remux(
+                    tracks,
+                    output,
+                    fragmented=fragmented,
+                    throttle=self.limits.throttle,
+                )
+        except (ValueError, OSError) as e:
+            # Sin espacio, FFmpeg tampoco podría escribir la salida.
+            if isinstance(e, OSError) and e.errno == errno.ENOSPC:
+                raise
+            logger.warning(f"Remux interno no aplicable ({e}); se usa FFmpeg.")
+            return False
+        logger.info(
+            f"Contenedor final escrito sin FFmpeg ({written / 1024 / 1024:.1f} MB)."
+        )
+        return True
 
-        cmd.extend(["-c", "copy", "-movflags", "+faststart", str(final_output)])
+    def _process_files(
+        self,
+        tracks: List[List[Path]],
+        final_output: Path,
+        keys: Optional[Dict[str, str]] = None,
+        disk: Optional[_DiskPeak] = None,
+        journal: Optional[ConsumeJournal] = None,
+    ) -> bool:
+        """
+        Ruta clásica: pistas concatenadas en disco, mp4decrypt y FFmpeg. Video
+        y audio se preparan a la vez; el muxing espera a ambos.
 
+        Con `journal` (poco disco) los segmentos ya no existen después de
+        unirse: si algo falla se conservan las pistas intermedias y el diario
+        para reanudar.
+        """
+        temporary: List[Path] = []
+        ok = False
         try:
-            subprocess.run(
-                cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+            prepared = self._map_tracks(
+                self._prepare_track, tracks, keys, disk, journal
             )
-            logger.info(f"¡Éxito! Video final creado en: {final_output}")
+            inputs: List[Path] = []
+            for number, (track, created) in enumerate(prepared):
+                temporary.extend(created)
+                if track is None:
+                    if number == 0:
+                        logger.error("Fallo crítico en desencriptación de video.")
+                        return False
+                    continue
+                inputs.append(track)
+
+            if self._remux([[track] for track in inputs], final_output):
+                ok = True
+                return True
+            logger.info("Empaquetando contenedor final con FFmpeg...")
+            try:
+                self.limits.run(
+                    self._mux_command(inputs, final_output),
+                    io_bytes=sum(p.stat().st_size for p in inputs),
+                    check=True,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.PIPE,
+                )
+            except subprocess.CalledProcessError as e:
+                logger.error(f"Error en FFmpeg: {e}")
+                return False
+            ok = True
+            return True
+        finally:
+            if disk is not None:
+                disk.sample()
+            if journal is None or ok:
+                for path in temporary:
+                    path.unlink(missing_ok=True)
+            if journal is not None:
+                if ok:
+                    journal.clear()
+                else:
+                    logger.warning(
+                        f"Se conservan las pistas intermedias y {journal.path.name} "
+                        "para reanudar."
+                    )
+
+    def _stream_keys(
+        self, tracks: List[List[Path]], keys: Optional[Dict[str, str]]
+    ) -> Optional[List[Optional[str]]]:
+        """
+        Llave de -decryption_key por pista (None si la pista está en claro), o
+        None si el modo streaming no es posible y hay que usar archivos.
+        """
+        if not streaming_available():
+            return None
+        return self._ffmpeg_keys([files[0] for files in tracks], keys)
 
-            if cleanup:
-                logger.info("Limpiando temporales...")
-                files_to_remove = [temp_video_enc, temp_audio_enc]
-                if keys:
-                    files_to_remove.append(video_track)
-                    if audio_track:
-                        files_to_remove.append(audio_track)
+    def _ffmpeg_keys(
+        self, inits: List[Path], keys: Optional[Dict[str, str]]
+    ) -> Optional[List[Optional[str]]]:
+        """
+        Llave de -decryption_key por pista según su init (None si está en
+        claro), o None si FFmpeg no puede descifrarla y hace falta mp4decrypt.
+        """
+        ffmpeg_keys: List[Optional[str]] = []
+        for init in inits:
+            protection = find_protection(read_init(init)) if keys else None
+            if protection is None:
+                ffmpeg_keys.append(None)
+                continue
+            # El demuxer mov de FFmpeg sólo descifra cenc (AES-CTR) con una llave.
+            key = keys.get(protection.default_kid) if keys else None
+            if protection.scheme != "cenc" or key is None:
+                logger.info(
+                    f"FFmpeg no puede descifrar ({protection.scheme}, "
+                    f"KID {protection.default_kid}); se usa mp4decrypt."
+                )
+                return None
+            ffmpeg_keys.append(key)
+        return ffmpeg_keys
+
+    def _process_streaming(
+        self,
+        tracks: List[List[Path]],
+        final_output: Path,
+        stream_keys: List[Optional[str]],
+    ) -> bool:
+        """
+        Cada pista llega a FFmpeg por una FIFO que un hilo llena con los
+        segmentos en orden: no se escriben pistas intermedias.
+        """
+        fifo_dir = Path(tempfile.mkdtemp(prefix="mux_", dir=self.working_dir))
+        try:
+            fifos = []
+            for name in ("video", "audio")[: len(tracks)]:
+                fifo = fifo_dir / f"{name}.mp4"
+                os.mkfifo(fifo)
+                fifos.append(fifo)
+
+            logger.info("Empaquetando contenedor final con FFmpeg (streaming)...")
+            # La lectura de las FIFOs la paga quien las alimenta; a FFmpeg sólo
+            # se le mide la escritura de la salida.
+            with self.limits.process():
+                proc = subprocess.Popen(
+                    self._mux_command(fifos, final_output, stream_keys),
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.PIPE,
+                )
+                writers = [
+                    threading.Thread(
+                        target=_feed_fifo,
+                        args=(fifo, files, self.limits.throttle),
+                        daemon=True,
+                    )
+                    for fifo, files in zip(fifos, tracks)
+                ]
+                for writer in writers:
+                    writer.start()
+                with self.limits.metered(proc):
+                    _, stderr = proc.communicate()
+
+            for fifo, writer in zip(fifos, writers):
+                if writer.is_alive():
+                    # FFmpeg salió sin abrir esta FIFO: el escritor sigue
+                    # bloqueado en open(); se lo destraba abriéndola aquí.
+                    try:
+                        os.close(os.open(fifo, os.O_RDONLY | os.O_NONBLOCK))
+                    except OSError:
+                        pass
+                writer.join()
+
+            if proc.returncode != 0:
+                detail = stderr.decode(errors="replace").strip().splitlines()[-1:]
+                logger.error(f"Error en FFmpeg ({proc.returncode}): {detail}")
+                final_output.unlink(missing_ok=True)
+                return False
+            return True
+        finally:
+            shutil.rmtree(fifo_dir, ignore_errors=True)
+
+    def _process_rolling(
+        self,
+        output_filename: str,
+        keys: Optional[Dict[str, str]] = None,
+        cleanup: bool = True,
+        low_disk: bool = False,
+    ) -> bool:
+        """
+        Empaqueta las partes de la salida continua. Cada pista ya es un fMP4
+        completo, así que se omite la concatenación y se mezcla en una sola
+        pasada, manteniendo la salida fragmentada (sin la segunda pasada de
+        +faststart). Con varias partes se genera un archivo por parte.
+
+        No es sólo reescribir cabeceras: las pistas se graban por separado y
+        hay que intercalarlas en un archivo, así que cada parte se lee y se
+        escribe una vez. Con DRM cenc FFmpeg descifra en esa misma pasada;
+        sólo otros esquemas (o llaves que FFmpeg no acepta) suman la pasada
+        de mp4decrypt.
+
+        Con `low_disk` cada parte se borra en cuanto su archivo final está
+        escrito y registrado; al reanudar se saltan las ya empaquetadas.
+        """
+        journal = ConsumeJournal(self.working_dir) if low_disk else None
+        done = journal.load()[1] if journal else {}
+        index = json.loads((self.working_dir / ROLLING_INDEX).read_text("utf-8"))
+        parts = [p for p in index["parts"] if "video" in p]
+        if not parts:
+            logger.error("La salida continua no tiene partes de video.")
+            return False
 
-                self._cleanup_garbage(files_to_remove)
+        final = Path(output_filename)
+        for number, part in enumerate(parts):
+            name = final.name
+            if len(parts) > 1:
+                name = f"{final.stem}_part{number:03d}{final.suffix}"
+            output = self.working_dir / name
+            if done.get(number) == name and output.exists():
+                logger.info(f"Parte {number + 1}/{len(parts)} ya empaquetada: {name}")
+                continue
 
-        except subprocess.CalledProcessError as e:
-            logger.error(f"Error en FFmpeg: {e}")
+            tracks = [self.working_dir / part["video"]]
+            if "audio" in part:
+                tracks.append(self.working_dir / part["audio"])
+            sources = list(tracks)
+            for track in tracks:
+                # Una grabación interrumpida deja la reserva sin recortar.
+                trim_preallocated(track)
+            # Con cenc, FFmpeg descifra al mezclar; si no, primero mp4decrypt.
+            decrypted: List[Path] = []
+            ffmpeg_keys: Optional[List[Optional[str]]] = [None] * len(tracks)
+            if keys:
+                ffmpeg_keys = (
+                    self._ffmpeg_keys(tracks, keys) if shutil.which("ffmpeg") else None
+                )
+                if ffmpeg_keys is None:
+                    prepared = [self._decrypt_track(t, keys) for t in tracks]
+                    if prepared[0] is None:
+                        logger.error("Fallo crítico en desencriptación de video.")
+                        return False
+                    tracks = [t for t in prepared if t is not None]
+                    decrypted = [t for t in tracks if t not in sources]
+                    ffmpeg_keys = [None] * len(tracks)
+            encrypted = any(ffmpeg_keys)  # type: ignore
+
+            logger.info(f"Empaquetando parte {number + 1}/{len(parts)}: {name}")
+            if encrypted or not self._remux(
+                [[t] for t in tracks], output, fragmented=True
+            ):
+                cmd = ["ffmpeg", "-y"]
+                for track, key in zip(tracks, ffmpeg_keys):  # type: ignore
+                    if key:
+                        cmd.extend(["-decryption_key", key])
+                    cmd.extend(["-i", str(track)])
+                cmd.extend(
+                    [
+                        "-c",
+                        "copy",
+                        "-movflags",
+                        "+frag_keyframe+empty_moov+default_base_moof",
+                        str(output),
+                    ]
+                )
+                try:
+                    self.limits.run(
+                        cmd,
+                        io_bytes=sum(t.stat().st_size for t in tracks),
+                        check=True,
+                        stdout=subprocess.DEVNULL,
+                        stderr=subprocess.PIPE,
+                    )
+                except subprocess.CalledProcessError as e:
+                    logger.error(f"Error en FFmpeg: {e}")
+                    return False
+            for track in decrypted:
+                track.unlink(missing_ok=True)
+            if journal is not None:
+                journal.write([{"part": number, "done": name}])
+                for source in sources:
+                    source.unlink(missing_ok=True)
+
+        if journal is not None:
+            journal.clear()
+        logger.info(f"¡Éxito! {len(parts)} archivo(s) final(es) en: {self.working_dir}")
+        if cleanup:
+            logger.info("Limpiando temporales...")
+            shutil.rmtree(self.working_dir / ROLLING_DIR, ignore_errors=True)
+            (self.working_dir / ROLLING_INDEX).unlink(missing_ok=True)
+            self._cleanup_garbage([])
+        return True
 
     def _cleanup_garbage(self, files_to_remove: List[Path]):
         if self.video_dir.exists():
@@ -174,6 +880,22 @@ class PostProcessor:
             if f and f.exists():
                 f.unlink()
 
+    def _inspect(self, file_path: Path) -> Optional[MediaInfo]:
+        """Cabeceras del MP4 (moov/moof) leídas en Python; None si no es un MP4 legible."""
+        try:
+            info = inspect_file(file_path)
+        except (OSError, struct.error) as e:
+            logger.warning(f"No se pudo inspeccionar {file_path.name}: {e}")
+            return None
+        if not info.tracks:
+            return None
+        for track in info.tracks:
+            logger.info(
+                f"Pista {track.track_id} ({track.handler}): "
+                f"{info.track_duration(track.track_id):.2f}s"
+            )
+        return info
+
     def _get_actual_duration(self, file_path: Path) -> float:
         """Obtiene la duración precisa usando ffprobe."""
         cmd = [
@@ -187,7 +909,7 @@ class PostProcessor:
             str(file_path),
         ]
         try:
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            result = self.limits.run(cmd, capture_output=True, text=True, check=True)
             return float(result.stdout.strip())
         except (subprocess.CalledProcessError, ValueError):
             logger.error("No se pudo obtener la duración del archivo.")
@@ -197,25 +919,81 @@ class PostProcessor:
         self, file_path: Path, expected_duration: float, tolerance: float = 5.0
     ) -> bool:
         """
-        Compara la duración del archivo con la esperada.
+        Compara la duración del archivo con la esperada y busca huecos entre
+        fragmentos y cajas truncadas.
         :param tolerance: Segundos de diferencia aceptables.
         """
         if expected_duration <= 0:
             logger.warning("Duración esperada inválida, omitiendo verificación.")
             return True
 
-        actual = self._get_actual_duration(file_path)
+        # Las cabeceras bastan para la duración y los huecos; ffprobe queda
+        # como respaldo para lo que el lector no entienda.
+        info = self._inspect(file_path)
+        actual = info.duration if info else self._get_actual_duration(file_path)
         diff = abs(actual - expected_duration)
 
         logger.info(
             f"Integridad: Esperado={expected_duration:.2f}s | Real={actual:.2f}s | Diff={diff:.2f}s"
         )
 
-        if diff > tolerance:
+        gaps = info.gaps() if info else []
+        for gap in gaps:
+            if gap.kind == "time":
+                where = f"falta de {gap.start:.2f}s a {gap.end:.2f}s"
+            else:
+                where = (
+                    f"faltan fragmentos {gap.expected_sequence}-"
+                    f"{gap.found_sequence - 1} en {gap.start:.2f}s"
+                )
+            logger.warning(f"Pista {gap.track_id}: {where} (byte {gap.offset}).")
+        if info and info.truncated_at is not None:
+            logger.error(
+                f"Archivo truncado: termina a mitad de una caja en el byte "
+                f"{info.truncated_at} de {info.size}."
+            )
+
+        short_tracks = []
+        if info:
+            short_tracks = [
+                t
+                for t in info.tracks
+                if expected_duration - info.track_duration(t.track_id) > tolerance
+            ]
+        for track in short_tracks:
             logger.error(
-                f"VERIFICACIÓN FALLIDA: El video está incompleto o corrupto (Faltan ~{diff:.2f}s)"
+                f"Pista {track.track_id} ({track.handler}) incompleta: "
+                f"{info.track_duration(track.track_id):.2f}s de {expected_duration:.2f}s."  # type: ignore
             )
+
+        missing = sum(g.seconds for g in gaps if g.kind == "time")
+        if (
+            diff > tolerance
+            or missing > tolerance
+            or short_tracks
+            or (info and info.truncated_at is not None)
+        ):
+            logger.error(
+                f"VERIFICACIÓN FALLIDA: El video está incompleto o corrupto (Faltan ~{max(diff, missing):.2f}s)"
+            )
+            self._log_known_gaps()
             return False
 
         logger.info("VERIFICACIÓN EXITOSA: El video está completo.")
         return True
+
+    def _log_known_gaps(self):
+        """Si la grabación dejó un informe de huecos, lo muestra como explicación."""
+        report = self.working_dir / GAPS_REPORT
+        if not report.exists():
+            return
+        missing = json.loads(report.read_text("utf-8"))["missing"]
+        total = sum(g["seconds"] for g in missing if g["track"] == "video")
+        logger.error(
+            f"La grabación registró {len(missing)} hueco(s), ~{total:.2f}s de video:"
+        )
+        for gap in missing:
+            logger.error(
+                f"  {gap['track']}@{gap['period_id']}: "
+                f"{gap['start']:.2f}s - {gap['end']:.2f}s ({gap['reason']})"
+            )
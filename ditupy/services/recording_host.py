@@ -0,0 +1,164 @@
+import heapq
+import itertools
+import logging
+import signal
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from ditupy.schemas.simple_schedule import SimpleSchedule
+from ditupy.services.disk_budget import DiskBudget
+from ditupy.services.downloader import (
+    BandwidthLimiter,
+    MemoryBudget,
+    SegmentDownloader,
+    new_session,
+)
+from ditupy.services.hedging import HedgePolicy
+from ditupy.services.live_recorder import LiveRecorder
+
+logger = logging.getLogger(__name__)
+
+
+class RecordingHost:
+    """
+    Ejecuta muchas grabaciones live en un solo proceso.
+
+    En lugar de un hilo dormido por canal, un único planificador mantiene una
+    cola por hora de despertar y despacha `LiveRecorder.step()` a un pool de
+    control pequeño. Las descargas de todas las grabaciones comparten una sesión
+    HTTP (pool de conexiones), un pool de hilos cuyo tamaño es la concurrencia
+    global y, opcionalmente, un presupuesto de ancho de banda.
+    """
+
+    def __init__(
+        self,
+        output_base: Union[Path, str],
+        max_concurrency: int = 16,
+        max_bandwidth: Optional[float] = None,
+        control_workers: int = 4,
+        disk_reserve: Optional[int] = None,
+        max_memory: int = 256 * 1024 * 1024,
+        http2: bool = False,
+    ):
+        """
+        :param max_concurrency: Descargas simultáneas entre todas las grabaciones.
+        :param max_bandwidth: Bytes por segundo para el conjunto; None = sin límite.
+        :param control_workers: Ciclos de captura (refresco de MPD + despacho)
+                                que pueden ejecutarse a la vez.
+        :param disk_reserve: Con un valor (bytes que siempre quedan libres),
+                             cada grabación reserva su estimación de disco al
+                             arrancar y no arranca si no cabe junto a las demás.
+        :param max_memory: Bytes de segmentos descargándose a la vez entre
+                           todas las grabaciones.
+        :param http2: Multiplexar segmentos y MPDs sobre HTTP/2 con los
+                      orígenes que lo negocien (requiere httpx[http2]).
+        """
+        self.output_base = Path(output_base)
+        self.session = new_session(max_concurrency, http2=http2)
+        self.segment_pool = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="segment"
+        )
+        self.control_pool = ThreadPoolExecutor(
+            max_workers=control_workers, thread_name_prefix="recorder"
+        )
+        self.limiter = BandwidthLimiter(max_bandwidth) if max_bandwidth else None
+        self.memory_budget = MemoryBudget(max_memory)
+        self.disk_budget: Optional[DiskBudget] = None
+        if disk_reserve is not None:
+            self.disk_budget = DiskBudget(self.output_base, reserve=disk_reserve)
+
+        self.recorders: List[LiveRecorder] = []
+        self._queue: List[Tuple[float, int, LiveRecorder]] = []
+        self._seq = itertools.count()
+        self._in_flight: Dict[int, Future] = {}
+        self._cond = threading.Condition()
+        self._stopping = False
+
+    def add(
+        self, manifest_url: str, schedule: SimpleSchedule, **kwargs
+    ) -> LiveRecorder:
+        """
+        Registra una grabación. `kwargs` se pasan a LiveRecorder (policy,
+        pre_roll, post_roll, epg_lookup, ...).
+        """
+        downloader = SegmentDownloader(
+            LiveRecorder.recording_path(self.output_base, schedule),
+            session=self.session,
+            executor=self.segment_pool,
+            limiter=self.limiter,
+            hedge=HedgePolicy(),
+            memory_budget=self.memory_budget,
+        )
+        kwargs.setdefault("disk_budget", self.disk_budget)
+        recorder = LiveRecorder(
+            manifest_url, schedule, self.output_base, downloader=downloader, **kwargs
+        )
+        with self._cond:
+            self.recorders.append(recorder)
+            self._push(recorder.scheduled_start(), recorder)
+            self._cond.notify()
+        return recorder
+
+    def _push(self, wake_at: float, recorder: LiveRecorder):
+        heapq.heappush(self._queue, (wake_at, next(self._seq), recorder))
+
+    def stop(self):
+        """Detiene todas las grabaciones; cada una cierra su ciclo en curso."""
+        with self._cond:
+            self._stopping = True
+            for recorder in self.recorders:
+                recorder.stop()
+            self._cond.notify()
+
+    def _run_step(self, recorder: LiveRecorder):
+        try:
+            wake_at = recorder.step()
+        except Exception as e:
+            logger.error(f"Error inesperado en {recorder.schedule.title}: {e}")
+            wake_at = time.time() + 2
+        with self._cond:
+            self._in_flight.pop(id(recorder), None)
+            if wake_at is not None:
+                self._push(wake_at, recorder)
+            self._cond.notify()
+
+    def _due(self) -> List[LiveRecorder]:
+        """Saca de la cola las grabaciones que deben ejecutar un ciclo ya."""
+        now = time.time()
+        due = []
+        while self._queue and (self._queue[0][0] <= now or self._stopping):
+            _, _, recorder = heapq.heappop(self._queue)
+            due.append(recorder)
+        return due
+
+    def run(self):
+        """Bloquea hasta que terminen todas las grabaciones registradas."""
+        previous = {}
+        if threading.current_thread() is threading.main_thread():
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                previous[sig] = signal.signal(sig, lambda *_: self.stop())
+
+        logger.info(f"Host de grabación: {len(self.recorders)} grabaciones.")
+        try:
+            with self._cond:
+                while self._queue or self._in_flight:
+                    for recorder in self._due():
+                        self._in_flight[id(recorder)] = self.control_pool.submit(
+                            self._run_step, recorder
+                        )
+                    timeout = None
+                    if self._queue:
+                        timeout = max(0.0, self._queue[0][0] - time.time())
+                    self._cond.wait(timeout)
+        finally:
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)  # type: ignore
+            self.close()
+
+    def close(self):
+        self.control_pool.shutdown(wait=True)
+        self.segment_pool.shutdown(wait=True)
+        self.session.close()
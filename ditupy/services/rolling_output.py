@@ -0,0 +1,182 @@
+import json
+import logging
+import mmap
+import os
+import shutil
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional
+
+from ditupy.concat import preallocate
+from ditupy.isobmff import iter_boxes
+
+logger = logging.getLogger(__name__)
+
+ROLLING_DIR = "rolling"
+ROLLING_INDEX = "rolling.json"
+
+
+# Holgura de la reserva de cada parte sobre bandwidth x duración.
+_PREALLOCATE_MARGIN = 1.1
+
+
+def trim_preallocated(path: Path) -> int:
+    """
+    Quita la cola reservada y nunca escrita de una parte que no se cerró bien
+    (grabación interrumpida): la primera caja de tipo nulo marca el fin de lo
+    escrito. Retorna el tamaño final.
+    """
+    with open(path, "r+b") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return 0
+        end = size
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for box_type, start, _, _ in iter_boxes(data):
+                if box_type == "\0\0\0\0":
+                    end = start
+                    break
+        if end < size:
+            logger.info(f"{path.name}: se recortan {size - end} bytes reservados.")
+            f.truncate(end)
+        return end
+
+
+class RollingOutput:
+    """
+    Salida fMP4 por pista que crece durante la grabación: cada parte es el
+    init seguido de los fragmentos en orden, así que es reproducible desde el
+    primer ciclo y al final no hay que concatenar miles de archivos.
+
+    Las pistas rotan juntas (parte N de video va con la parte N de audio):
+    cada `rotate_every` segundos de media o cuando cambia el init de alguna
+    pista (nuevo Period, otra Representation).
+    """
+
+    def __init__(
+        self,
+        output_dir: Path,
+        rotate_every: Optional[float] = None,
+        keep_segments: bool = False,
+    ):
+        """
+        :param rotate_every: Duración de cada parte en segundos; None = una sola parte.
+        :param keep_segments: Conservar los segmentos sueltos tras anexarlos.
+        """
+        self.output_dir = Path(output_dir)
+        self.rolling_dir = self.output_dir / ROLLING_DIR
+        self.rotate_every = rotate_every
+        self.keep_segments = keep_segments
+
+        self.parts: List[Dict[str, str]] = []
+        self._part = 0
+        self._part_seconds = 0.0
+        self._inits: Dict[str, Path] = {}
+        self._files: Dict[str, BinaryIO] = {}
+        self._reserve: Dict[str, int] = {}
+        self._load_index()
+
+    def _load_index(self):
+        """Al reanudar en la misma carpeta se continúa en una parte nueva."""
+        index = self.output_dir / ROLLING_INDEX
+        if index.exists():
+            self.parts = json.loads(index.read_text(encoding="utf-8"))["parts"]
+            self._part = len(self.parts)
+            for part in self.parts:
+                for name in part.values():
+                    if (self.output_dir / name).exists():
+                        trim_preallocated(self.output_dir / name)
+
+    def set_bitrate(self, track: str, bandwidth: int, seconds: Optional[float] = None):
+        """
+        Reserva espacio (posix_fallocate) para cada parte de la pista:
+        `bandwidth` (bps) x la duración de la parte, que es `rotate_every` o,
+        sin rotación, `seconds` (lo que queda de grabación). Al cerrar la
+        parte se recorta a lo escrito.
+        """
+        seconds = self.rotate_every or seconds
+        if bandwidth and seconds:
+            self._reserve[track] = int(bandwidth * seconds / 8 * _PREALLOCATE_MARGIN)
+
+    def _write_index(self):
+        index = self.output_dir / ROLLING_INDEX
+        index.write_text(json.dumps({"parts": self.parts}, indent=4), encoding="utf-8")
+
+    def set_init(self, track: str, init_path: Path):
+        """Registra el init de la pista; si cambia con una parte abierta, se rota."""
+        previous = self._inits.get(track)
+        if previous is not None and previous != init_path and self._files:
+            if previous.read_bytes() != init_path.read_bytes():
+                logger.info(f"[{track}] Cambió el init; nueva parte.")
+                self.rotate()
+        self._inits[track] = init_path
+
+    def _open(self, track: str) -> BinaryIO:
+        handle = self._files.get(track)
+        if handle is not None:
+            return handle
+
+        init = self._inits.get(track)
+        if init is None or not init.exists():
+            raise FileNotFoundError(f"[{track}] Sin init para la salida continua.")
+        if not self._files:
+            self.parts.append({})
+        self.rolling_dir.mkdir(parents=True, exist_ok=True)
+        path = self.rolling_dir / f"part_{self._part:03d}_{track}.mp4"
+        handle = open(path, "wb")
+        with open(init, "rb") as f:
+            shutil.copyfileobj(f, handle)
+        if self._reserve.get(track):
+            handle.flush()
+            try:
+                preallocate(handle.fileno(), self._reserve[track])
+            except OSError as e:
+                logger.warning(f"[{track}] Sin espacio para reservar la parte: {e}")
+        self._files[track] = handle
+        self.parts[-1][track] = str(path.relative_to(self.output_dir))
+        self._write_index()
+        return handle
+
+    def append(self, track: str, segment_files: List[Path], duration: float = 0.0):
+        """
+        Anexa los segmentos (ya descargados, en orden) a la parte abierta.
+        `duration` es la media añadida en segundos; cuenta para la rotación.
+        """
+        if not segment_files:
+            return
+        handle = self._open(track)
+        for path in segment_files:
+            if not path.exists():
+                logger.warning(f"[{track}] Falta {path.name}; se omite en la salida.")
+                continue
+            with open(path, "rb") as f:
+                shutil.copyfileobj(f, handle)
+            if not self.keep_segments:
+                path.unlink()
+        handle.flush()
+        if track == "video" or "video" not in self._inits:
+            self._part_seconds += duration
+
+    def maybe_rotate(self):
+        """Llamar una vez por ciclo, con todas las pistas ya anexadas."""
+        if self.rotate_every and self._part_seconds >= self.rotate_every:
+            self.rotate()
+
+    def rotate(self):
+        if not self._files:
+            return
+        for handle in self._files.values():
+            handle.flush()
+            # Lo reservado y no usado vuelve al disco.
+            handle.truncate(handle.tell())
+            handle.close()
+        self._files.clear()
+        self._part += 1
+        self._part_seconds = 0.0
+
+    def close(self):
+        self.rotate()
+        self._write_index()
+        if self.parts:
+            logger.info(
+                f"Salida continua: {len(self.parts)} parte(s) en {self.rolling_dir}"
+            )
@@ -0,0 +1,202 @@
+import json
+import logging
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Collection, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TRACK_INDEX = "index.jsonl"
+
+
+@dataclass(frozen=True, slots=True)
+class IndexEntry:
+    """
+    Un segmento de la pista: número, tiempo de presentación y duración (en
+    `timescale`), tamaño en bytes (None si no se pudo descargar) y archivo.
+    """
+
+    number: int
+    time: int
+    duration: int
+    timescale: int
+    size: Optional[int]
+    filename: str
+    period: str = ""
+
+    @property
+    def start_seconds(self) -> float:
+        return self.time / self.timescale
+
+    @property
+    def end_seconds(self) -> float:
+        return (self.time + self.duration) / self.timescale
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "n": self.number,
+                "t": self.time,
+                "d": self.duration,
+                "ts": self.timescale,
+                "size": self.size,
+                "file": self.filename,
+                "p": self.period,
+            },
+            separators=(",", ":"),
+        )
+
+    @classmethod
+    def from_json(cls, data: dict) -> "IndexEntry":
+        return cls(
+            data["n"],
+            data["t"],
+            data["d"],
+            data["ts"],
+            data["size"],
+            data["file"],
+            data.get("p", ""),
+        )
+
+
+class TrackIndex:
+    """
+    Índice de una pista (`<pista>/index.jsonl`) que escribe el descargador:
+    una línea por init y por segmento intentado. Sólo se agregan líneas, así
+    que una grabación o descarga interrumpida conserva lo ya registrado; si un
+    segmento aparece varias veces (reintentos, reanudación) vale la última.
+    Cada descarga VOD empieza su trabajo con `reset`.
+    """
+
+    def __init__(self, track_dir: Path):
+        self.track_dir = Path(track_dir)
+        self.path = self.track_dir / TRACK_INDEX
+        self._lock = threading.Lock()
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def reset(self):
+        """Descarta el índice; lo llama quien empieza un trabajo nuevo en la carpeta."""
+        with self._lock:
+            self.path.unlink(missing_ok=True)
+
+    def _append(self, lines: Iterable[str]):
+        text = "".join(f"{line}\n" for line in lines)
+        if not text:
+            return
+        with self._lock:
+            self.track_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(text)
+
+    def write_init(self, filename: str, period: str = ""):
+        self._append([json.dumps({"init": filename, "p": period})])
+
+    def write(self, entries: Iterable[IndexEntry]):
+        self._append(entry.to_json() for entry in entries)
+
+    def load(self) -> Tuple[Optional[str], List[IndexEntry]]:
+        """
+        (init, segmentos) en orden de reproducción: por Period, en el orden en
+        que aparecieron, y dentro de cada uno por tiempo.
+
+        Todos los segmentos van detrás de un único init, así que si un Period
+        registra un init con otro contenido (códec, timescale o base de tfdt
+        distintos tras un corte) lanza ValueError: unirlos daría un archivo
+        corrupto. La salida continua (`rolling`) abre una parte por init.
+        """
+        init: Optional[str] = None
+        entries: Dict[Tuple[str, int], IndexEntry] = {}
+        period_order: Dict[str, int] = {}
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    data = json.loads(line)
+                except json.JSONDecodeError:
+                    # Última línea a medio escribir (corte durante la descarga).
+                    continue
+                if "init" in data:
+                    if init is None:
+                        init = data["init"]
+                    elif data["init"] != init and self._differ(init, data["init"]):
+                        raise ValueError(
+                            f"{self.path}: el Period '{data['p']}' tiene otro init "
+                            f"({data['init']} frente a {init}); no se puede unir en "
+                            "una sola pista."
+                        )
+                    period_order.setdefault(data["p"], len(period_order))
+                    continue
+                entry = IndexEntry.from_json(data)
+                period_order.setdefault(entry.period, len(period_order))
+                entries[(entry.period, entry.number)] = entry
+
+        ordered = sorted(
+            entries.values(), key=lambda e: (period_order[e.period], e.time)
+        )
+        return init, ordered
+
+    def _differ(self, first: str, other: str) -> bool:
+        """True si los dos inits (cada Period guarda el suyo) tienen otro contenido."""
+        try:
+            return (self.track_dir / first).read_bytes() != (
+                self.track_dir / other
+            ).read_bytes()
+        except FileNotFoundError:
+            # Ya consumido o sin descargar: no hay con qué comparar.
+            return False
+
+    def resolve(self, consumed: Collection[str] = ()) -> Tuple[List[Path], List[str]]:
+        """
+        Archivos a concatenar (init primero) y la lista de problemas: segmentos
+        que no se descargaron, archivos ausentes o con otro tamaño y huecos de
+        tiempo entre segmentos consecutivos del mismo Period.
+
+        `consumed` son archivos que ya se unieron y borraron (modo de poco
+        disco): no se listan ni cuentan como ausentes.
+        """
+        init, entries = self.load()
+        problems: List[str] = []
+        files: List[Path] = []
+
+        if init is not None and init in consumed:
+            pass
+        elif init is None or not (self.track_dir / init).exists():
+            problems.append(f"init ausente ({init or 'sin registrar'})")
+        else:
+            files.append(self.track_dir / init)
+
+        previous: Optional[IndexEntry] = None
+        for entry in entries:
+            where = f"segmento {entry.number} ({entry.start_seconds:.2f}s)"
+            if entry.period:
+                where += f" @{entry.period}"
+            if (
+                previous is not None
+                and previous.period == entry.period
+                and previous.time + previous.duration < entry.time
+            ):
+                problems.append(
+                    f"hueco de {previous.end_seconds:.2f}s a {entry.start_seconds:.2f}s"
+                    f" antes del {where}"
+                )
+            previous = entry
+
+            path = self.track_dir / entry.filename
+            if entry.size is None:
+                problems.append(f"{where}: no se descargó")
+            elif entry.filename in consumed:
+                continue
+            elif not path.exists():
+                problems.append(f"{where}: falta {entry.filename}")
+            elif path.stat().st_size != entry.size:
+                problems.append(
+                    f"{where}: {entry.filename} mide {path.stat().st_size} bytes, "
+                    f"se esperaban {entry.size}"
+                )
+            else:
+                files.append(path)
+        return files, problems
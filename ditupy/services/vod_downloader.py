@@ -1,35 +1,122 @@
 import logging
+import time
+import xml.etree.ElementTree as ET
 from pathlib import Path
-from typing import Optional
+from typing import Callable, List, Optional, Union
 
 import requests
 
-from ditupy.dash import DashManifest, Representation
-from ditupy.schemas.types import DRMInfo, Manifest, StreamInfo
+from ditupy.dash import Segment
+from ditupy.dash_model import ManifestModel, RepresentationModel
+from ditupy.schemas.types import ClipInfo, DRMInfo, Manifest, StreamInfo
+from ditupy.services.disk_budget import (
+    check_free_space,
+    estimate_job_bytes,
+    peak_factor,
+)
 from ditupy.services.downloader import SegmentDownloader
+from ditupy.services.hedging import HedgePolicy
+from ditupy.track_selection import TrackPolicy, TrackSelection, select_tracks
+from ditupy.utils import jwt_expiry, url_expiry
 
 logger = logging.getLogger(__name__)
 
 
 class VodDownloader:
-    def __init__(self, manifest: Manifest):
+    def __init__(self, manifest: Manifest, policy: Optional[TrackPolicy] = None):
         """
         :param manifest: Objeto Manifest obtenido de client.get_stream_url()
-        :param output_path: Ruta base donde se guardará el contenido
+        :param policy: Criterios de selección de pistas. Por defecto, la mejor calidad.
         """
         self.manifest_data = manifest
+        self.policy = policy
 
         # Estado interno para no parsear dos veces
-        self._dash: Optional[DashManifest] = None
-        self._video_rep: Optional[Representation] = None
-        self._audio_rep: Optional[Representation] = None
+        self._dash: Optional[ManifestModel] = None
+        self._video_rep: Optional[RepresentationModel] = None
+        self._audio_rep: Optional[RepresentationModel] = None
+        self._selection: Optional[TrackSelection] = None
         self._xml_content: Optional[str] = None
         self._pssh: Optional[str] = None
+        self._stream_info: Optional[StreamInfo] = None
+
+    @classmethod
+    def from_folder(
+        cls, output_path: Union[Path, str], policy: Optional[TrackPolicy] = None
+    ) -> "VodDownloader":
+        """
+        Reconstruye el descargador desde una carpeta de salida previa
+        (manifest.mpd + drm_info.json) sin tocar la red.
+        Lanza FileNotFoundError si falta alguno de los archivos.
+        """
+        output_path = Path(output_path)
+        mpd_path = output_path / "manifest.mpd"
+        meta_path = output_path / "drm_info.json"
+        if not mpd_path.exists() or not meta_path.exists():
+            raise FileNotFoundError(f"No hay metadatos guardados en: {output_path}")
+
+        drm_info = DRMInfo.model_validate_json(meta_path.read_text(encoding="utf-8"))
+        manifest = Manifest(
+            src=drm_info.manifest_url, token=drm_info.token, cookies=drm_info.cookies
+        )
+        downloader = cls(manifest, policy=policy)
+        downloader._xml_content = mpd_path.read_text(encoding="utf-8")
+        return downloader
+
+    @classmethod
+    def resume(
+        cls,
+        output_path: Union[Path, str],
+        fetch_manifest: Callable[[], Manifest],
+        policy: Optional[TrackPolicy] = None,
+        margin: float = 300.0,
+    ) -> "VodDownloader":
+        """
+        Retoma un trabajo desde su carpeta si los metadatos guardados siguen
+        vigentes; sólo llama a `fetch_manifest` (la API) si faltan o vencieron.
+        :param fetch_manifest: p. ej. `lambda: client.get_stream_url(content_id)`.
+        :param margin: Segundos de vigencia mínima exigidos al token.
+        """
+        try:
+            downloader = cls.from_folder(output_path, policy=policy)
+            downloader.extract_info()
+        except (FileNotFoundError, ValueError, ET.ParseError) as e:
+            logger.info(f"Sin snapshot reutilizable ({e}). Consultando la API.")
+            return cls(fetch_manifest(), policy=policy)
+
+        if downloader.is_expired(margin):
+            logger.info("El token guardado venció. Consultando la API.")
+            return cls(fetch_manifest(), policy=policy)
+
+        logger.info(f"Reanudando desde snapshot local: {output_path}")
+        return downloader
+
+    @property
+    def expires_at(self) -> Optional[float]:
+        """
+        Vencimiento más próximo entre la URL del manifiesto, la de los segmentos
+        (si están firmadas) y el playback_token usado para la licencia.
+        """
+        candidates = [
+            url_expiry(self.manifest_data.src),
+            jwt_expiry(self.manifest_data.cookies.playback_token),
+        ]
+        if self._video_rep:
+            candidates.append(url_expiry(self._video_rep.initialization_url))
+        known = [c for c in candidates if c is not None]
+        return min(known) if known else None
+
+    def is_expired(self, margin: float = 0.0) -> bool:
+        expires_at = self.expires_at
+        return expires_at is not None and expires_at - margin <= time.time()
 
     def extract_info(self) -> StreamInfo:
         """
         Descarga el manifiesto, lo analiza y selecciona las mejores pistas y devuelve StreamInfo.
         """
+        if self._stream_info:
+            return self._stream_info
+
         logger.info(f"--- Analizando Manifiesto ---")
 
         if not self._xml_content:
@@ -37,35 +124,18 @@ class VodDownloader:
             resp.raise_for_status()
             self._xml_content = resp.text
 
-        self._dash = DashManifest(self._xml_content, source_url=self.manifest_data.src)
+        self._dash = ManifestModel.from_xml(
+            self._xml_content, source_url=self.manifest_data.src
+        )
         period = self._dash.get_content_period()
 
-        video_sets = period.get_adaptation_sets(type_filter="video")
-        audio_sets = period.get_adaptation_sets(type_filter="audio")
-        if not video_sets or not audio_sets:
-            raise ValueError("El manifiesto no contiene pistas válidas.")
+        self._selection = select_tracks(period, self.policy)
+        self._video_rep = self._selection.video
+        self._audio_rep = self._selection.audio
 
-        self._video_rep = video_sets[0].get_best_representation()
-        self._audio_rep = audio_sets[0].get_best_representation()
-        if not self._video_rep or not self._audio_rep:
-            raise ValueError("Fallo seleccionando calidades.")
-
-        protection_widevine = [
-            i
-            for i in self._video_rep.get_content_protections()
-            if "edef8ba9" in i.scheme_id_uri.lower()
-        ]
-        if not protection_widevine:
-            # Intentar buscar en el AdaptationSet si no está en la Representation
-            protection_widevine = [
-                i
-                for i in video_sets[0].get_content_protections()
-                if "edef8ba9" in i.scheme_id_uri.lower()
-            ]
-
-        if protection_widevine:
-            self._pssh = protection_widevine[0].pssh
-        else:
+        # Las protecciones del AdaptationSet ya vienen heredadas en el modelo.
+        self._pssh = self._video_rep.widevine_pssh
+        if not self._pssh:
             logger.warning(
                 "No se encontró PSSH de Widevine. El video no se podrá reproducir."
             )
@@ -73,14 +143,21 @@ class VodDownloader:
 
         logger.info(
             f"Calidad seleccionada: {self._video_rep.height}p ({self._video_rep.bandwidth} bps)"
+            f" | Audio {self._audio_rep.lang or '?'} ({self._audio_rep.bandwidth} bps)"
         )
 
-        return StreamInfo(
+        estimated = self._selection.estimated_bytes(self._dash.duration)
+        if estimated:
+            logger.info(f"Tamaño estimado: {estimated / 1024 / 1024:.1f} MB")
+
+        self._stream_info = StreamInfo(
             height=self._video_rep.height if self._video_rep.height else 0,
             width=self._video_rep.width,
-            duration=self._dash.duration_seconds,
+            duration=self._dash.duration,
             pssh=self._pssh,
+            estimated_bytes=estimated,
         )
+        return self._stream_info
 
     def _save_metadata(self, output_path: Path):
         """
@@ -102,10 +179,109 @@ class VodDownloader:
 
         logger.info(f"Metadatos DRM guardados en: {meta_path}")
 
-    def download(self, output_path: Path):
+    @staticmethod
+    def _segments(
+        seg_downloader: SegmentDownloader,
+        rep: RepresentationModel,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+    ) -> List[Segment]:
+        """
+        Segmentos de la pista que cubren [start, end). En SegmentBase se obtienen
+        leyendo el sidx; en plantillas y listas se calculan sin generar los previos.
+        """
+        if rep.needs_index:
+            segments = seg_downloader.fetch_segment_index(rep)
+            return [
+                s
+                for s in segments
+                if (start is None or s.end_seconds > start)
+                and (end is None or s.start_seconds < end)
+            ]
+        return list(rep.iter_segments(start=start, end=end))
+
+    def _save_clip(
+        self,
+        output_path: Path,
+        start: Optional[float],
+        end: Optional[float],
+        video_segments: List[Segment],
+        audio_segments: List[Segment],
+    ):
+        """
+        Guarda (o borra) clip.json para que PostProcessor recorte a los límites
+        exactos: los segmentos descargados empiezan antes de `start`.
+        """
+        clip_path = output_path / "clip.json"
+        if start is None or end is None or not video_segments:
+            clip_path.unlink(missing_ok=True)
+            return
+
+        clip = ClipInfo(
+            start=start,
+            end=end,
+            video_offset=max(0.0, start - video_segments[0].start_seconds),
+            audio_offset=(
+                max(0.0, start - audio_segments[0].start_seconds)
+                if audio_segments
+                else 0.0
+            ),
+        )
+        clip_path.write_text(clip.model_dump_json(indent=4), encoding="utf-8")
+
+    def _resolve_clip(self, start: Optional[float], end: Optional[float]):
+        """Valida el recorte contra la duración del contenido."""
+        if start is None and end is None:
+            return None, None
+        duration = self._dash.duration if self._dash else 0.0
+        start = max(0.0, start or 0.0)
+        if end is None or (duration and end > duration):
+            end = duration or end
+        if end is None or end <= start:
+            raise ValueError(f"Recorte inválido: [{start}, {end})")
+        return start, end
+
+    def required_bytes(
+        self,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        factor: Optional[float] = None,
+    ) -> Optional[int]:
+        """
+        Disco que necesita el trabajo completo (segmentos y post-procesado):
+        bandwidth de las pistas elegidas x duración (o la del recorte) x
+        `factor`, por defecto el de `peak_factor` según haya DRM. None si el
+        manifiesto no informa la duración.
+        """
+        if not self._selection:
+            self.extract_info()
+        start, end = self._resolve_clip(start, end)
+        duration = end - start if start is not None else self._dash.duration  # type: ignore
+        if not duration:
+            return None
+        if factor is None:
+            factor = peak_factor(encrypted=bool(self._pssh))
+        return estimate_job_bytes(self._selection.total_bandwidth, duration, factor)  # type: ignore
+
+    def download(
+        self,
+        output_path: Path,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        check_space: bool = True,
+        http2: bool = False,
+    ):
         """
         Ejecuta la descarga física de los segmentos.
         Requiere que extract_info() se haya ejecutado antes (o lo ejecuta si no).
+        :param start: Inicio del recorte en segundos. Con `start`/`end` sólo se
+                      descargan los segmentos que cubren ese intervalo.
+        :param end: Fin del recorte en segundos.
+        :param check_space: Antes de descargar, comprobar que lo estimado por
+                            `required_bytes` cabe en el disco (OSError ENOSPC
+                            si no). Desactivar si un `DiskBudget` ya lo admitió.
+        :param http2: Multiplexar los segmentos sobre HTTP/2 si el CDN lo
+                      negocia (requiere httpx[http2]).
         """
         output_path = Path(output_path)
         output_path.mkdir(parents=True, exist_ok=True)
@@ -113,8 +289,25 @@ class VodDownloader:
         if not self._video_rep:
             self.extract_info()
 
+        start, end = self._resolve_clip(start, end)
+        if start is not None:
+            logger.info(f"Modo recorte: [{start:.2f}s, {end:.2f}s)")
+
+        if check_space:
+            needed = self.required_bytes(start, end)
+            if needed:
+                check_free_space(output_path, needed)
+
         # # TODO: Comprobar si realmente este acoplamiento es necesario o lo inyectamos en el constructor
-        seg_downloader = SegmentDownloader(output_path, max_workers=8)
+        seg_downloader = SegmentDownloader(
+            output_path, max_workers=8, hedge=HedgePolicy(), http2=http2
+        )
+
+        # El índice describe un solo trabajo: lo de una corrida anterior en la
+        # misma carpeta (p. ej. la descarga completa antes de un recorte) no
+        # debe mezclarse con los offsets de esta.
+        for track in ("video", "audio"):
+            seg_downloader.index(track).reset()
 
         logger.info(f"--- Guardando Metadatos ---")
         self._save_metadata(output_path)
@@ -122,15 +315,16 @@ class VodDownloader:
         logger.info(f"--- Descargando Segmentos en: {output_path} ---")
 
         # Descargar inits
-        seg_downloader.download_file(self._video_rep.initialization_url, "video")  # type: ignore
-        seg_downloader.download_file(self._audio_rep.initialization_url, "audio")  # type: ignore
+        seg_downloader.download_init(self._video_rep, "video")  # type: ignore
+        seg_downloader.download_init(self._audio_rep, "audio")  # type: ignore
 
         # Descargar segmentos
-        video_segments = self._video_rep.get_segments()  # type: ignore
-        audio_segments = self._audio_rep.get_segments()  # type: ignore
+        video_segments = self._segments(seg_downloader, self._video_rep, start, end)  # type: ignore
+        audio_segments = self._segments(seg_downloader, self._audio_rep, start, end)  # type: ignore
+        self._save_clip(output_path, start, end, video_segments, audio_segments)
 
         logger.info(
             f"Cola: Video ({len(video_segments)}) + Audio ({len(audio_segments)})"
         )
-        seg_downloader.download_batch(video_segments, "video")
-        seg_downloader.download_batch(audio_segments, "audio")
+        seg_downloader.download_segments(video_segments, "video", rep=self._video_rep)
+        seg_downloader.download_segments(audio_segments, "audio", rep=self._audio_rep)
@@ -0,0 +1,161 @@
+import logging
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+from ditupy.dash_model import AdaptationSetModel, PeriodModel, RepresentationModel
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class TrackPolicy:
+    """
+    Criterios para elegir las pistas de un trabajo de descarga/grabación.
+    Se evalúan sobre todos los AdaptationSets del Period, no sólo el primero.
+
+    :param max_height: Altura máxima del video (p. ej. 720).
+    :param max_bandwidth: Bitrate máximo de la pista de video (bps).
+    :param max_total_bandwidth: Presupuesto de video + audio (bps).
+    :param video_codecs: Prefijos de codec en orden de preferencia ("hvc1", "avc1").
+    :param audio_codecs: Ídem para audio ("mp4a", "ec-3").
+    :param audio_languages: Idiomas en orden de preferencia ("es", "en").
+    :param audio_roles: Roles DASH en orden de preferencia ("main", "dub").
+    """
+
+    max_height: Optional[int] = None
+    max_bandwidth: Optional[int] = None
+    max_total_bandwidth: Optional[int] = None
+    video_codecs: Tuple[str, ...] = ()
+    audio_codecs: Tuple[str, ...] = ()
+    audio_languages: Tuple[str, ...] = ()
+    audio_roles: Tuple[str, ...] = ("main",)
+
+
+@dataclass(frozen=True, slots=True)
+class TrackSelection:
+    video: RepresentationModel
+    audio: RepresentationModel
+
+    @property
+    def total_bandwidth(self) -> int:
+        return self.video.bandwidth + self.audio.bandwidth
+
+    def estimated_bytes(self, duration: Optional[float]) -> Optional[int]:
+        """Tamaño aproximado de las pistas elegidas: bandwidth x duración."""
+        if not duration:
+            return None
+        return int(self.total_bandwidth * duration / 8)
+
+
+def _rank(value: str, preferences: Sequence[str]) -> int:
+    """Posición de `value` en las preferencias (por prefijo); sin match va al final."""
+    value = value.lower()
+    for i, pref in enumerate(preferences):
+        if value.startswith(pref.lower()):
+            return i
+    return len(preferences)
+
+
+def _codec_rank(rep: RepresentationModel, preferences: Sequence[str]) -> int:
+    return _rank(rep.codecs, preferences) if preferences else 0
+
+
+def _audio_set_rank(aset: AdaptationSetModel, policy: TrackPolicy) -> Tuple[int, int]:
+    lang = _rank(aset.lang, policy.audio_languages) if policy.audio_languages else 0
+    # Sin <Role> se asume "main", que es lo que indica la especificación.
+    roles = aset.roles or ("main",)
+    role = min(_rank(r, policy.audio_roles) for r in roles) if policy.audio_roles else 0
+    return lang, role
+
+
+def _video_candidates(
+    period: PeriodModel, policy: TrackPolicy
+) -> List[RepresentationModel]:
+    reps = [r for a in period.get_adaptation_sets("video") for r in a.representations]
+    if not reps:
+        return []
+    allowed = [
+        r
+        for r in reps
+        if (policy.max_height is None or (r.height or 0) <= policy.max_height)
+        and (policy.max_bandwidth is None or r.bandwidth <= policy.max_bandwidth)
+    ]
+    if not allowed:
+        lowest = min(reps, key=lambda r: r.bandwidth)
+        logger.warning(
+            f"Ninguna pista de video cumple la política; se usa la menor ({lowest.height}p)."
+        )
+        return [lowest]
+    return allowed
+
+
+def _audio_candidates(
+    period: PeriodModel, policy: TrackPolicy
+) -> List[RepresentationModel]:
+    sets = [a for a in period.get_adaptation_sets("audio") if a.representations]
+    if not sets:
+        return []
+    best = min(_audio_set_rank(a, policy) for a in sets)
+    if policy.audio_languages and best[0] == len(policy.audio_languages):
+        logger.warning(
+            f"No hay audio en {', '.join(policy.audio_languages)}; se usa el disponible."
+        )
+    preferred = [a for a in sets if _audio_set_rank(a, policy) == best]
+    return [r for a in preferred for r in a.representations]
+
+
+def _preferred_codec(
+    reps: List[RepresentationModel], codecs: Sequence[str]
+) -> List[RepresentationModel]:
+    top = min(_codec_rank(r, codecs) for r in reps)
+    return [r for r in reps if _codec_rank(r, codecs) == top]
+
+
+def _pick(
+    reps: List[RepresentationModel], codecs: Sequence[str], budget: Optional[int]
+) -> RepresentationModel:
+    """Mejor pista del codec preferido que quepa en `budget`; si ninguna cabe, la menor."""
+    reps = _preferred_codec(reps, codecs)
+    fitting = [r for r in reps if budget is None or r.bandwidth <= budget]
+    if not fitting:
+        return min(reps, key=lambda r: r.bandwidth)
+    return max(fitting, key=lambda r: (r.height or 0, r.bandwidth))
+
+
+def select_tracks(
+    period: PeriodModel, policy: Optional[TrackPolicy] = None
+) -> TrackSelection:
+    """
+    Elige video y audio del Period según `policy`. Sin política equivale a la
+    mejor calidad disponible. El presupuesto total reserva primero lo mínimo
+    para audio, asigna el video y deja el resto al audio: la calidad se nota
+    mucho más en el video.
+    """
+    policy = policy or TrackPolicy()
+    videos = _video_candidates(period, policy)
+    audios = _audio_candidates(period, policy)
+    if not videos or not audios:
+        raise ValueError("El manifiesto no contiene pistas válidas.")
+
+    video_budget = None
+    if policy.max_total_bandwidth is not None:
+        video_budget = policy.max_total_bandwidth - min(
+            r.bandwidth for r in _preferred_codec(audios, policy.audio_codecs)
+        )
+    video = _pick(videos, policy.video_codecs, video_budget)
+
+    audio_budget = None
+    if policy.max_total_bandwidth is not None:
+        audio_budget = policy.max_total_bandwidth - video.bandwidth
+    audio = _pick(audios, policy.audio_codecs, audio_budget)
+
+    selection = TrackSelection(video=video, audio=audio)
+    if (
+        policy.max_total_bandwidth is not None
+        and selection.total_bandwidth > policy.max_total_bandwidth
+    ):
+        logger.warning(
+            f"El presupuesto de {policy.max_total_bandwidth} bps no alcanza; "
+            f"se usan las pistas mínimas ({selection.total_bandwidth} bps)."
+        )
+    return selection
@@ -1,8 +1,11 @@
+import base64
+import json
 import logging
 import re
+from datetime import datetime, timezone
 from time import sleep
-from typing import Dict
-from urllib.parse import unquote
+from typing import Dict, Optional
+from urllib.parse import parse_qs, unquote, urlparse
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +33,26 @@ def parse_iso_duration(duration_str: str) -> float:
     )
 
 
+def parse_iso_datetime(value: str) -> Optional[float]:
+    """
+    Parsea una fecha xs:dateTime del MPD (ej: 2025-01-01T10:00:00Z) a epoch.
+    Si no trae zona horaria se asume UTC, como indica DASH.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        logger.warning(f"Fecha ISO inválida: '{value}'")
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
 def cookies_to_requests(raw: str, unquote_value=True) -> Dict[str, str]:
     """
     Convierte un header Cookie o Set-Cookie en un dict simple para requests. Esto implica unquote de los valores.
@@ -48,6 +71,36 @@ def cookies_to_requests(raw: str, unquote_value=True) -> Dict[str, str]:
     return cookies
 
 
+def jwt_expiry(token: str) -> Optional[float]:
+    """Lee el claim `exp` de un JWT (sin verificar la firma). None si no aplica."""
+    parts = token.split(".") if token else []
+    if len(parts) != 3:
+        return None
+    payload = parts[1] + "=" * (-len(parts[1]) % 4)
+    try:
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get("exp")
+    except (ValueError, AttributeError):
+        return None
+    return float(exp) if isinstance(exp, (int, float)) else None
+
+
+def url_expiry(url: str) -> Optional[float]:
+    """
+    Vencimiento de una URL firmada, si lo declara: `Expires=` (CloudFront),
+    `exp=`/`expires=` o `hdnts=...~exp=...` (Akamai).
+    """
+    query = parse_qs(urlparse(url).query)
+    for key in ("Expires", "expires", "exp"):
+        if key in query and query[key][0].isdigit():
+            return float(query[key][0])
+    for key in ("hdnts", "__token__"):
+        if key in query:
+            match = re.search(r"exp=(\d+)", query[key][0])
+            if match:
+                return float(match.group(1))
+    return None
+
+
 def normalize_windows_name(name: str) -> str:
     invalid_chars = r'[<>:"/\\|?*\x00-\x1F]'
     name = re.sub(invalid_chars, "_", name)
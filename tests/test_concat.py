@@ -0,0 +1,103 @@
+import errno
+import os
+import threading
+
+import pytest
+
+from ditupy import concat
+from ditupy.concat import append_file, concatenate_files, stream_files
+
+METHODS = [name for name, _, available in concat._METHODS if available]
+
+
+@pytest.fixture
+def segments(tmp_path):
+    files = []
+    for n, size in enumerate([3000, 0, 1, 70000, 4096]):
+        path = tmp_path / f"segment_{n}.m4s"
+        path.write_bytes(os.urandom(size))
+        files.append(path)
+    return files
+
+
+def joined(files):
+    return b"".join(f.read_bytes() for f in files)
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_concatenate_with_each_method(monkeypatch, tmp_path, segments, method):
+    only = [m for m in concat._METHODS if m[0] == method]
+    monkeypatch.setattr(concat, "_METHODS", only)
+    output = tmp_path / "out.mp4"
+    written, used = concatenate_files(segments, output, batch_size=2)
+    assert used == method
+    assert written == output.stat().st_size
+    assert output.read_bytes() == joined(segments)
+
+
+def test_unsupported_method_falls_back(monkeypatch, tmp_path, segments):
+    calls = []
+
+    def refuse(*args):
+        calls.append(args)
+        raise OSError(errno.EXDEV, "cross-device")
+
+    methods = [("refuse", refuse, True), concat._METHODS[-1]]
+    monkeypatch.setattr(concat, "_METHODS", methods)
+    output = tmp_path / "out.mp4"
+    concatenate_files(segments, output)
+    # Tras el primer fallo el método se descarta para el resto de archivos.
+    assert len(calls) == 1
+    assert output.read_bytes() == joined(segments)
+
+
+def test_other_errors_propagate(monkeypatch, tmp_path, segments):
+    def broken(*args):
+        raise OSError(errno.EIO, "I/O error")
+
+    monkeypatch.setattr(concat, "_METHODS", [("broken", broken, True)])
+    with pytest.raises(OSError):
+        concatenate_files(segments, tmp_path / "out.mp4")
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_throttle_is_charged_per_chunk(monkeypatch, tmp_path, segments, method):
+    monkeypatch.setattr(concat, "CHUNK_SIZE", 1024)
+    monkeypatch.setattr(
+        concat, "_METHODS", [m for m in concat._METHODS if m[0] == method]
+    )
+    charged = []
+    output = tmp_path / "out.mp4"
+    concatenate_files(segments, output, throttle=charged.append)
+    assert sum(charged) == sum(f.stat().st_size for f in segments)
+    assert max(charged) <= 1024
+    assert output.read_bytes() == joined(segments)
+
+
+def test_append_file_returns_new_end(tmp_path, segments):
+    output = tmp_path / "out.mp4"
+    fd = os.open(output, os.O_WRONLY | os.O_CREAT | concat.O_BINARY, 0o644)
+    try:
+        offset = 0
+        for f in segments:
+            offset = append_file(f, fd, offset)
+    finally:
+        os.close(fd)
+    assert offset == output.stat().st_size
+    assert output.read_bytes() == joined(segments)
+
+
+def test_stream_files_to_pipe(segments):
+    read_fd, write_fd = os.pipe()
+    received = []
+    reader = threading.Thread(
+        target=lambda: received.append(os.fdopen(read_fd, "rb").read())
+    )
+    reader.start()
+    try:
+        written = stream_files(segments, write_fd, throttle=lambda n: None)
+    finally:
+        os.close(write_fd)
+        reader.join()
+    assert written == len(received[0])
+    assert received[0] == joined(segments)
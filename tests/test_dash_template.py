@@ -0,0 +1,128 @@
+from itertools import islice
+
+import pytest
+
+from ditupy.dash import DashManifest, expand_template, iter_template_segments
+from ditupy.dash_model import ManifestModel
+
+
+def times(segments):
+    return [(s.number, s.time, s.duration) for s in segments]
+
+
+@pytest.mark.parametrize(
+    "pattern, expected",
+    [
+        ("seg_$Number$.m4s", "seg_42.m4s"),
+        ("seg_$Number%05d$.m4s", "seg_00042.m4s"),
+        ("$RepresentationID$/$Time$.m4s", "v1/90000.m4s"),
+        ("$Bandwidth%08d$_$Time%012d$", "00800000_000000090000"),
+        ("a$$b_{x}_$Number$", "a$b_{x}_42"),
+    ],
+)
+def test_expand_template(pattern, expected):
+    assert expand_template(pattern, "v1", 42, 90000, 800000) == expected
+
+
+def test_timeline_repeats_and_implicit_t():
+    segments = iter_template_segments(
+        "$Time$.m4s", "http://cdn/v/", "v1", timeline=[(0, 2, 2), (None, 3, 0)]
+    )
+    assert times(segments) == [(1, 0, 2), (2, 2, 2), (3, 4, 2), (4, 6, 3)]
+
+
+def test_negative_repeat_runs_until_next_t():
+    segments = list(
+        iter_template_segments(
+            "$Number$.m4s", "", "v1", timeline=[(0, 2, -1), (10, 3, 0)]
+        )
+    )
+    assert [s.time for s in segments] == [0, 2, 4, 6, 8, 10]
+    assert segments[-1].number == 6
+
+
+def test_negative_repeat_is_bounded_by_period_duration():
+    segments = iter_template_segments(
+        "$Number$.m4s", "", "v1", timeline=[(0, 2, -1)], period_duration=7
+    )
+    assert [s.time for s in segments] == [0, 2, 4, 6]
+
+
+def test_trailing_negative_repeat_without_end_is_unbounded():
+    segments = iter_template_segments("$Number$.m4s", "", "v1", timeline=[(0, 2, -1)])
+    assert [s.time for s in islice(segments, 100)][-1] == 198
+
+
+def test_duration_addressing_with_offset_and_window():
+    segments = iter_template_segments(
+        "$Number$_$Time$.m4s",
+        "http://cdn/a/",
+        "a1",
+        timescale=10,
+        start_number=5,
+        presentation_time_offset=100,
+        duration=20,
+        start=4,
+        end=9,
+    )
+    assert [(s.number, s.time, s.url) for s in segments] == [
+        (7, 40, "http://cdn/a/7_140.m4s"),
+        (8, 60, "http://cdn/a/8_160.m4s"),
+        (9, 80, "http://cdn/a/9_180.m4s"),
+    ]
+
+
+def test_from_time_skips_segments_ending_before_it():
+    timeline = [(0, 2, 9)]
+    segments = iter_template_segments(
+        "$Time$", "", "v1", timeline=timeline, from_time=4
+    )
+    assert [s.time for s in segments][:2] == [4, 6]
+    segments = iter_template_segments(
+        "$Time$", "", "v1", timeline=timeline, from_time=5
+    )
+    assert [s.time for s in segments][:2] == [4, 6]
+
+
+LIVE_MPD = """<?xml version="1.0"?>
+<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="dynamic"
+     availabilityStartTime="2024-01-01T00:00:00Z">
+  <BaseURL>http://cdn/live/</BaseURL>
+  <Period id="p0" start="PT0S">
+    <AdaptationSet contentType="video" mimeType="video/mp4">
+      <SegmentTemplate media="$RepresentationID$/$Time$.m4s"
+                       initialization="$RepresentationID$/init.mp4" timescale="90000">
+        <SegmentTimeline>
+          <S t="900000" d="180000" r="-1"/>
+        </SegmentTimeline>
+      </SegmentTemplate>
+      <Representation id="v1" bandwidth="800000" width="640" height="360"/>
+    </AdaptationSet>
+  </Period>
+</MPD>
+"""
+
+
+def representation():
+    period = DashManifest(LIVE_MPD).get_periods()[0]
+    return period.get_adaptation_sets()[0].get_representations()[0]
+
+
+def test_open_ended_template_requires_end():
+    rep = representation()
+    assert rep.is_open_ended
+    with pytest.raises(ValueError):
+        rep.get_segments()
+    assert rep.get_segments(end=14) == [
+        "http://cdn/live/v1/900000.m4s",
+        "http://cdn/live/v1/1080000.m4s",
+    ]
+
+
+def test_model_matches_wrappers():
+    rep = representation()
+    model = ManifestModel.from_xml(LIVE_MPD).periods[0]
+    compiled = model.adaptation_sets[0].representations[0]
+    assert compiled.initialization_url == rep.initialization_url
+    assert compiled.is_open_ended
+    assert list(compiled.iter_segments(end=30)) == list(rep.iter_segments(end=30))
@@ -0,0 +1,149 @@
+import struct
+
+import pytest
+
+from benchmarks.bench_remux import (
+    AUDIO_TIMESCALE,
+    VIDEO_TIMESCALE,
+    box,
+    full_box,
+    init_segment,
+    media_segment,
+)
+from ditupy.isobmff import (
+    check_fragment,
+    find_protection,
+    find_sidx,
+    inspect_boxes,
+    iter_boxes,
+    parse_sidx,
+    read_init,
+)
+
+FRAME = VIDEO_TIMESCALE // 25
+
+
+def video_segment(sequence, time, frames=50, size=64):
+    return media_segment(sequence, 1, time, [FRAME] * frames, size, video=True)
+
+
+def test_iter_boxes_sizes():
+    large = struct.pack(">I4sQ", 1, b"mdat", 16 + 4) + b"abcd"
+    data = box("ftyp", b"iso6") + large + struct.pack(">I4s", 0, b"free") + b"tail"
+    assert [(t, s, p, e) for t, s, p, e in iter_boxes(data)] == [
+        ("ftyp", 0, 8, 12),
+        ("mdat", 12, 28, 32),
+        ("free", 32, 40, 44),
+    ]
+
+
+def test_iter_boxes_stops_at_truncated_box():
+    data = box("ftyp", b"iso6") + box("moof", b"x" * 32)[:-1]
+    assert [t for t, *_ in iter_boxes(data)] == ["ftyp"]
+
+
+@pytest.mark.parametrize("version", [0, 1])
+def test_parse_sidx(version):
+    times = struct.pack(">II" if version == 0 else ">QQ", 9000, 100)
+    refs = struct.pack(">III", 5000, 180000, 0x90000000) + struct.pack(
+        ">III", (1 << 31) | 700, 90000, 0
+    )
+    sidx = full_box(
+        "sidx", version, 0, struct.pack(">II", 1, 90000) + times + b"\0\0\0\x02" + refs
+    )
+    index = parse_sidx(sidx, box_offset=1000)
+    first = 1000 + len(sidx) + 100
+    assert index.timescale == 90000
+    assert index.earliest_presentation_time == 9000
+    assert [(r.offset, r.size, r.time, r.is_index) for r in index.references] == [
+        (first, 5000, 9000, False),
+        (first + 5000, 700, 189000, True),
+    ]
+    assert index.references[0].byte_range == (first, first + 4999)
+
+    found = find_sidx(box("styp", b"msdh") + sidx, base_offset=1000)
+    assert found.references[0].offset == first + 12
+
+
+def test_inspect_track_durations_and_gaps():
+    init = init_segment(1, "vide", VIDEO_TIMESCALE)
+    step = FRAME * 50
+    data = (
+        init
+        + video_segment(1, 0)
+        + video_segment(2, step)
+        # Falta el segmento 3: hueco de tiempo y de secuencia.
+        + video_segment(4, 3 * step)
+    )
+    info = inspect_boxes(data)
+    assert [(t.track_id, t.handler, t.timescale) for t in info.tracks] == [
+        (1, "vide", VIDEO_TIMESCALE)
+    ]
+    assert [f.sequence for f in info.fragments] == [1, 2, 4]
+    assert all(f.samples == 50 and f.data_size == 50 * 64 for f in info.fragments)
+    assert info.track_duration(1) == pytest.approx(8.0)
+    assert info.truncated_at is None
+    gaps = info.gaps()
+    assert [(g.kind, g.start, g.end) for g in gaps] == [
+        ("time", 4.0, 6.0),
+        ("sequence", 4.0, 6.0),
+    ]
+    assert gaps[1].expected_sequence == 3 and gaps[1].found_sequence == 4
+
+
+def test_inspect_segment_with_tracks_from_init():
+    init_info = inspect_boxes(init_segment(2, "soun", AUDIO_TIMESCALE))
+    segment = media_segment(7, 2, 48000, [1024] * 10, 32, video=False)
+    info = inspect_boxes(segment, init_info.tracks)
+    assert info.fragments[0].base_time == 48000
+    assert info.track_duration(2) == pytest.approx(10 * 1024 / AUDIO_TIMESCALE)
+
+
+def test_inspect_reports_truncation():
+    data = init_segment(1, "vide", VIDEO_TIMESCALE) + video_segment(1, 0)
+    info = inspect_boxes(data[:-10])
+    assert info.truncated_at is not None and info.truncated_at < len(data) - 10
+
+
+def test_check_fragment():
+    segment = video_segment(1, 0)
+    assert check_fragment(segment) is None
+    assert "incompleta" in check_fragment(segment[:-1])
+    moof_end = next(e for t, _, _, e in iter_boxes(segment) if t == "moof")
+    assert check_fragment(segment[:moof_end]) == "moof sin mdat"
+    assert check_fragment(box("mdat", b"x")).startswith("mdat sin moof")
+    assert check_fragment(box("free", b"")) == "sin moof"
+    short = segment[:moof_end] + box("mdat", b"x" * 100)
+    assert check_fragment(short).startswith("mdat de 100 bytes")
+
+
+def encrypted_init(scheme: bytes, kid: bytes) -> bytes:
+    sinf = box(
+        "sinf",
+        box("frma", b"avc1")
+        + full_box("schm", 0, 0, scheme + struct.pack(">I", 0x10000))
+        + box("schi", full_box("tenc", 0, 0, b"\0\0\x01\x08" + kid)),
+    )
+    entry = box("encv", b"\0" * 78 + sinf)
+    stsd = full_box("stsd", 0, 0, struct.pack(">I", 1) + entry)
+    trak = box("trak", box("mdia", box("minf", box("stbl", stsd))))
+    return box("ftyp", b"iso6") + box("moov", trak)
+
+
+def test_find_protection():
+    kid = bytes(range(16))
+    info = find_protection(encrypted_init(b"cbcs", kid))
+    assert info.scheme == "cbcs"
+    assert info.default_kid == kid.hex()
+    assert find_protection(init_segment(1, "vide", VIDEO_TIMESCALE)) is None
+
+
+def test_read_init_stops_at_moov(tmp_path):
+    init = init_segment(1, "vide", VIDEO_TIMESCALE)
+    path = tmp_path / "track.mp4"
+    path.write_bytes(init + video_segment(1, 0))
+    assert read_init(path) == init
+    path.write_bytes(b"")
+    assert read_init(path) == b""
+    path.write_bytes(video_segment(1, 0))
+    assert read_init(path) == b""
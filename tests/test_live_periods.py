@@ -0,0 +1,117 @@
+from ditupy.dash_model import ManifestModel
+from ditupy.services.live_periods import PeriodKind, PeriodTracker
+
+AST = 1_700_000_000.0  # 2023-11-14T22:13:20Z
+
+# time_signal con segmentation_type_id 0x34 (inicio de oportunidad de colocación).
+PLACEMENT_START = (
+    "/DA0AAAAAAAA///wBQb+cr0AUAAeAhxDVUVJSAAAjn/PAAGlmbAICAAAAAAsoKGKNAIAmsnRfg=="
+)
+
+ADAPTATION = """
+    <AdaptationSet contentType="video" mimeType="video/mp4">{inband}
+      <SegmentTemplate media="$Number$.m4s" initialization="init.mp4" duration="2"/>
+      <Representation id="v" bandwidth="1000000"/>
+    </AdaptationSet>"""
+
+CUE = """
+    <EventStream schemeIdUri="urn:scte:scte35:2014:xml+bin" timescale="1">
+      <Event presentationTime="0" duration="30" id="1">
+        <Signal xmlns="http://www.scte.org/schemas/35/2016"><Binary>{0}</Binary></Signal>
+      </Event>
+    </EventStream>""".format(PLACEMENT_START)
+
+INBAND = '\n      <InbandEventStream schemeIdUri="urn:scte:scte35:2013:bin" value="1"/>'
+
+
+def manifest(*periods, depth=None):
+    """periods: (id, inicio, duración o None, extras del Period, inband)."""
+    body = []
+    for pid, start, duration, extra, inband in periods:
+        length = f' duration="PT{duration}S"' if duration is not None else ""
+        body.append(
+            f'  <Period id="{pid}" start="PT{start}S"{length}>{extra}'
+            + ADAPTATION.format(inband=INBAND if inband else "")
+            + "\n  </Period>"
+        )
+    shift = f' timeShiftBufferDepth="PT{depth}S"' if depth is not None else ""
+    return ManifestModel.from_xml(
+        '<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="dynamic" '
+        f'availabilityStartTime="2023-11-14T22:13:20Z"{shift}>\n'
+        + "\n".join(body)
+        + "\n</MPD>"
+    )
+
+
+def kinds(tracker, mpd, now=None):
+    return [tracker.classify(p, mpd, now)[0] for p in mpd.periods]
+
+
+def test_scte35_cue_marks_ad_and_sticks():
+    tracker = PeriodTracker()
+    mpd = manifest(("main", 0, 600, "", False), ("ad1", 600, None, CUE, False))
+    assert kinds(tracker, mpd, AST + 610) == [PeriodKind.CONTENT, PeriodKind.AD]
+    # El cue ya salió de la ventana y el Period lleva mucho en emisión.
+    later = manifest(("main", 0, 600, "", False), ("ad1", 600, None, "", False))
+    assert kinds(tracker, later, AST + 2000)[1] == PeriodKind.AD
+
+
+def test_open_period_waits_until_it_outlasts_an_ad():
+    tracker = PeriodTracker(max_ad_duration=120)
+    mpd = manifest(("main", 0, 600, "", False), ("next", 600, None, "", False))
+    assert [p.id for p in tracker.update(mpd, AST + 660)] == ["main"]
+    assert tracker.classify(mpd.periods[1], mpd, AST + 660)[0] == PeriodKind.PENDING
+    assert [p.id for p in tracker.update(mpd, AST + 721)] == ["main", "next"]
+    # Confirmado: una duración corta posterior no lo cambia.
+    bounded = manifest(("main", 0, 600, "", False), ("next", 600, 30, "", False))
+    assert kinds(tracker, bounded, AST + 2000)[1] == PeriodKind.CONTENT
+
+
+def test_open_period_decided_when_timeshift_window_fills():
+    tracker = PeriodTracker(max_ad_duration=180)
+    mpd = manifest(("a", 0, 600, "", False), ("b", 600, None, "", False), depth=60)
+    assert kinds(tracker, mpd, AST + 630)[1] == PeriodKind.PENDING
+    assert kinds(tracker, mpd, AST + 660)[1] == PeriodKind.CONTENT
+
+
+def test_open_period_without_clock_is_content():
+    tracker = PeriodTracker()
+    mpd = manifest(("a", 0, 600, "", False), ("b", 600, None, "", False))
+    assert kinds(tracker, mpd)[1] == PeriodKind.CONTENT
+
+
+def test_short_bounded_period_is_ad():
+    tracker = PeriodTracker(max_ad_duration=120)
+    mpd = manifest(
+        ("show", 0, 600, "", False),
+        ("break", 600, 90, "", False),
+        ("show2", 690, 900, "", False),
+    )
+    assert kinds(tracker, mpd, AST) == [
+        PeriodKind.CONTENT,
+        PeriodKind.AD,
+        PeriodKind.CONTENT,
+    ]
+
+
+def test_periods_without_inband_scte35_are_ads():
+    tracker = PeriodTracker()
+    mpd = manifest(
+        ("show", 0, 600, "", True),
+        ("ssai", 600, 600, "", False),
+        ("show2", 1200, None, "", True),
+    )
+    assert kinds(tracker, mpd, AST + 1210) == [
+        PeriodKind.CONTENT,
+        PeriodKind.AD,
+        PeriodKind.CONTENT,
+    ]
+
+
+def test_id_pattern_and_removed_periods():
+    tracker = PeriodTracker(ad_id_pattern=r"^ad-")
+    mpd = manifest(("show", 0, 600, "", False), ("ad-7", 600, 600, "", False))
+    assert [p.id for p in tracker.update(mpd, AST)] == ["show"]
+    later = manifest(("ad-7", 600, 600, "", False), ("show2", 1200, 600, "", False))
+    assert [p.id for p in tracker.update(later, AST)] == ["show2"]
+    assert tracker.removed == ["show"]
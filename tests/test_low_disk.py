@@ -0,0 +1,101 @@
+import errno
+import os
+
+import pytest
+
+from ditupy.services import low_disk
+from ditupy.services.low_disk import ConsumeJournal, consume_concatenate
+
+
+@pytest.fixture
+def segments(tmp_path):
+    directory = tmp_path / "video"
+    directory.mkdir()
+    files = []
+    for n in range(8):
+        path = directory / f"segment_{n}.m4s"
+        path.write_bytes(os.urandom(1000 + n * 111))
+        files.append(path)
+    return files
+
+
+def test_joins_and_consumes(tmp_path, segments):
+    expected = b"".join(f.read_bytes() for f in segments)
+    journal = ConsumeJournal(tmp_path)
+    output = tmp_path / "video.mp4"
+    freed = []
+    end = consume_concatenate(
+        segments, output, journal, "video", on_consumed=freed.append, sync_bytes=3000
+    )
+    assert end == len(expected)
+    assert output.read_bytes() == expected
+    assert not any(f.exists() for f in segments)
+    assert sum(freed) == len(expected)
+    assert len(freed) > 1
+    progress = journal.track("video")
+    assert progress.complete == output.name
+    assert progress.end == end
+    assert len(progress.consumed) == len(segments)
+    # Pista ya completa: no se vuelve a tocar.
+    assert consume_concatenate(segments, output, journal, "video") == end
+
+
+def test_resumes_after_interruption(monkeypatch, tmp_path, segments):
+    expected = b"".join(f.read_bytes() for f in segments)
+    journal = ConsumeJournal(tmp_path)
+    output = tmp_path / "video.mp4"
+    append = low_disk.append_file
+
+    def fail_on_sixth(path, fd_out, offset, throttle=None):
+        if path == segments[5]:
+            raise OSError(errno.ENOSPC, "No space left on device")
+        return append(path, fd_out, offset, throttle)
+
+    monkeypatch.setattr(low_disk, "append_file", fail_on_sixth)
+    with pytest.raises(OSError):
+        consume_concatenate(segments, output, journal, "video", sync_bytes=4000)
+    consumed = journal.track("video").consumed
+    assert consumed == {f.name for f in segments[:4]}
+    # Lo unido sin registrar sigue en disco y se vuelve a copiar.
+    assert segments[4].exists()
+
+    monkeypatch.setattr(low_disk, "append_file", append)
+    end = consume_concatenate(segments, output, journal, "video", sync_bytes=4000)
+    assert end == len(expected)
+    assert output.read_bytes() == expected
+
+
+def test_recorded_segment_left_on_disk_is_not_copied_twice(tmp_path, segments):
+    expected = b"".join(f.read_bytes() for f in segments)
+    journal = ConsumeJournal(tmp_path)
+    output = tmp_path / "video.mp4"
+    first = segments[0].read_bytes()
+    # Interrumpido tras registrar el segmento y antes de borrarlo, con basura
+    # de un lote siguiente que no llegó a registrarse.
+    output.write_bytes(first + b"garbage")
+    journal.write([{"track": "video", "file": segments[0].name, "end": len(first)}])
+
+    end = consume_concatenate(segments, output, journal, "video")
+    assert end == len(expected)
+    assert output.read_bytes() == expected
+    assert not segments[0].exists()
+
+
+def test_missing_track_with_progress_fails(tmp_path, segments):
+    journal = ConsumeJournal(tmp_path)
+    journal.write([{"track": "video", "file": segments[0].name, "end": 1000}])
+    with pytest.raises(FileNotFoundError):
+        consume_concatenate(segments, tmp_path / "video.mp4", journal, "video")
+    assert segments[0].exists()
+
+
+def test_journal_ignores_torn_last_line(tmp_path):
+    journal = ConsumeJournal(tmp_path)
+    journal.write([{"track": "audio", "file": "segment_0.m4s", "end": 10}])
+    journal.write([{"part": 0, "done": "final.mp4"}])
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"track":"audio","file":"segm')
+    tracks, parts = journal.load()
+    assert tracks["audio"].consumed == {"segment_0.m4s"}
+    assert tracks["audio"].end == 10
+    assert parts == {0: "final.mp4"}
@@ -0,0 +1,193 @@
+import struct
+
+import pytest
+
+from benchmarks.bench_remux import AUDIO_TIMESCALE, make_track, media_segment
+from ditupy.isobmff import check_fragment, find_box, inspect_file, iter_boxes
+from ditupy.remux import _Run, _sample_tables, remux
+
+SEGMENTS = 3
+VIDEO_FRAMES = 50  # 2 s a 25 fps por segmento
+AUDIO_FRAMES = 93  # cuadros AAC de 1024 muestras en 2 s
+
+
+@pytest.fixture
+def tracks(tmp_path):
+    video = make_track(tmp_path / "video", 1, "vide", SEGMENTS, 200_000)
+    audio = make_track(tmp_path / "audio", 1, "soun", SEGMENTS, 20_000)
+    return video, audio
+
+
+def top_level(data):
+    return {t: (p, e) for t, _, p, e in iter_boxes(data)}
+
+
+def mdat_payload(path):
+    data = path.read_bytes()
+    payload, end = top_level(data)["mdat"]
+    return data[payload:end]
+
+
+def traks(data):
+    moov = top_level(data)["moov"]
+    return [(p, e) for t, _, p, e in iter_boxes(data, *moov) if t == "trak"]
+
+
+def table(data, trak, kind):
+    """Entradas de una tabla del stbl: lista de tuplas, o None si no está."""
+    found = find_box(data, ("mdia", "minf", "stbl", kind), *trak)
+    if found is None:
+        return None
+    payload, end = found
+    version = data[payload]
+    body = data[payload + 4 : end]
+    if kind == "stsz":
+        count = struct.unpack_from(">I", body, 4)[0]
+        return list(struct.unpack_from(f">{count}I", body, 8))
+    count = struct.unpack_from(">I", body)[0]
+    fields = {"stts": "II", "ctts": "Ii" if version else "II", "stsc": "III"}
+    fmt = fields.get(kind, "Q" if kind == "co64" else "I")
+    return list(
+        struct.iter_unpack(">" + fmt, body[4 : 4 + count * struct.calcsize(fmt)])
+    )
+
+
+def test_faststart_sample_tables(tmp_path, tracks):
+    video, audio = tracks
+    output = tmp_path / "out.mp4"
+    written = remux([video, audio], output)
+    data = output.read_bytes()
+    assert written == len(data)
+    assert [t for t, *_ in iter_boxes(data)] == ["ftyp", "moov", "mdat"]
+
+    video_trak, audio_trak = traks(data)
+    frames = SEGMENTS * VIDEO_FRAMES
+    assert len(table(data, video_trak, "stsz")) == frames
+    assert sum(n for n, _ in table(data, video_trak, "stts")) == frames
+    assert table(data, video_trak, "stss") == [
+        (1 + n * VIDEO_FRAMES,) for n in range(SEGMENTS)
+    ]
+    assert sum(n for n, _ in table(data, video_trak, "ctts")) == frames
+    assert table(data, video_trak, "stsc") == [(1, VIDEO_FRAMES, 1)]
+    # Audio sin desplazamiento de composición.
+    assert table(data, audio_trak, "ctts") is None
+    assert table(data, audio_trak, "stts") == [(SEGMENTS * AUDIO_FRAMES, 1024)]
+
+    # Un chunk por trun: cada uno apunta a los bytes del mdat de su segmento.
+    for trak, files, samples in (
+        (video_trak, video, VIDEO_FRAMES),
+        (audio_trak, audio, AUDIO_FRAMES),
+    ):
+        sizes = table(data, trak, "stsz")
+        offsets = [o for (o,) in table(data, trak, "stco")]
+        assert len(offsets) == SEGMENTS
+        for n, offset in enumerate(offsets):
+            size = sum(sizes[n * samples : (n + 1) * samples])
+            assert data[offset : offset + size] == mdat_payload(files[n + 1])
+
+    info = inspect_file(output)
+    assert info.track_duration(1) == pytest.approx(SEGMENTS * 2.0)
+    assert info.track_duration(2) == pytest.approx(
+        SEGMENTS * AUDIO_FRAMES * 1024 / AUDIO_TIMESCALE
+    )
+
+
+def test_fragmented_interleaves_and_renumbers(tmp_path, tracks):
+    video, audio = tracks
+    output = tmp_path / "out.mp4"
+    remux([video, audio], output, fragmented=True)
+    info = inspect_file(output)
+    assert [t.track_id for t in info.tracks] == [1, 2]
+    assert [f.sequence for f in info.fragments] == list(range(1, 2 * SEGMENTS + 1))
+    # Por tiempo de decodificación: los segmentos de audio duran 1.984 s.
+    starts = sorted(
+        [(n * 2.0, 1, f) for n, f in enumerate(video[1:])]
+        + [
+            (n * AUDIO_FRAMES * 1024 / AUDIO_TIMESCALE, 2, f)
+            for n, f in enumerate(audio[1:])
+        ]
+    )
+    assert [f.track_id for f in info.fragments] == [track for _, track, _ in starts]
+    assert info.gaps() == []
+
+    data = output.read_bytes()
+    moov_end = top_level(data)["moov"][1]
+    assert check_fragment(data[moov_end:]) is None
+    payloads = [data[p:e] for t, _, p, e in iter_boxes(data) if t == "mdat"]
+    assert payloads == [mdat_payload(f) for _, _, f in starts]
+
+
+def test_concatenated_track_matches_segments(tmp_path, tracks):
+    video, audio = tracks
+    joined = []
+    for name, files in (("video", video), ("audio", audio)):
+        path = tmp_path / f"{name}.mp4"
+        path.write_bytes(b"".join(f.read_bytes() for f in files))
+        joined.append([path])
+    remux([video, audio], tmp_path / "a.mp4")
+    remux(joined, tmp_path / "b.mp4")
+    assert (tmp_path / "a.mp4").read_bytes() == (tmp_path / "b.mp4").read_bytes()
+
+
+def test_backwards_tfdt_is_left_to_ffmpeg(tmp_path, tracks):
+    video, audio = tracks
+    # Un Period nuevo que reinicia el tiempo de decodificación.
+    video[3].write_bytes(media_segment(3, 1, 0, [3600] * VIDEO_FRAMES, 4096, True))
+    output = tmp_path / "out.mp4"
+    with pytest.raises(ValueError):
+        remux([video, audio], output)
+    assert not output.exists()
+
+
+def run(durations, ctos, flags=None, source=0):
+    return _Run(
+        source,
+        0,
+        len(durations) * 10,
+        0,
+        durations,
+        [10] * len(durations),
+        flags or [0] * len(durations),
+        ctos,
+    )
+
+
+def test_sample_tables_negative_cto_and_co64():
+    runs = [run([100, 100, 50], [0, -100, 200]), run([100, 100, 50], [0, 0, 0])]
+    stbl = _sample_tables(runs, [1 << 32, (1 << 32) + 30])
+    boxes = {t: (p, e) for t, _, p, e in iter_boxes(stbl)}
+    assert list(boxes) == ["stts", "ctts", "stsc", "stsz", "co64"]
+
+    stts_payload, _ = boxes["stts"]
+    assert struct.unpack_from(">I8I", stbl, stts_payload + 4) == (
+        4,
+        2,
+        100,
+        1,
+        50,
+        2,
+        100,
+        1,
+        50,
+    )
+    ctts_payload, _ = boxes["ctts"]
+    assert stbl[ctts_payload] == 1  # versión 1: desplazamientos con signo
+    assert struct.unpack_from(">I", stbl, ctts_payload + 4)[0] == 4
+    assert struct.unpack_from(">Ii", stbl, ctts_payload + 16) == (1, -100)
+    stsc_payload, _ = boxes["stsc"]
+    assert struct.unpack_from(">IIII", stbl, stsc_payload + 4) == (1, 1, 3, 1)
+    co64_payload, _ = boxes["co64"]
+    assert struct.unpack_from(">IQQ", stbl, co64_payload + 4) == (
+        2,
+        1 << 32,
+        (1 << 32) + 30,
+    )
+
+
+def test_sample_tables_sync_samples():
+    flags = [0, 0x10000, 0x10000, 0, 0x10000]
+    stbl = _sample_tables([run([1] * 5, [0] * 5, flags)], [100])
+    boxes = {t: (p, e) for t, _, p, e in iter_boxes(stbl)}
+    assert "ctts" not in boxes and "stco" in boxes
+    payload, _ = boxes["stss"]
+    assert struct.unpack_from(">III", stbl, payload + 4) == (2, 1, 4)
@@ -0,0 +1,139 @@
+import base64
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from ditupy.scte35 import (
+    SPLICE_INSERT,
+    TIME_SIGNAL,
+    parse_event_signal,
+    parse_splice_info,
+)
+
+# Ejemplos de la especificación SCTE 35 (sección 14).
+SPLICE_INSERT_OUT = (
+    "/DAvAAAAAAAA///wFAVIAACPf+/+c2nALv4AUsz1AAAAAAAKAAhDVUVJAAABNWLbowo="
+)
+PLACEMENT_START = (
+    "/DA0AAAAAAAA///wBQb+cr0AUAAeAhxDVUVJSAAAjn/PAAGlmbAICAAAAAAsoKGKNAIAmsnRfg=="
+)
+PROGRAM_END_START = (
+    "/DBIAAAAAAAA///wBQb+ek2ItgAyAhdDVUVJSAAAGH+fCAgAAAAALMvDRBEAAAIXQ1VFSUgAABl/"
+    "nwgIAAAAACyk26AQAACZcuND"
+)
+
+
+def section(command: bytes, descriptors: bytes = b"", command_length=None) -> bytes:
+    """splice_info_section mínimo (sin CRC: el parser no lo verifica)."""
+    length = len(command) - 1 if command_length is None else command_length
+    header = bytes([0xFC, 0x30, 0x00]) + b"\0" * 8
+    header += bytes([0xF0 | (length >> 8), length & 0xFF])
+    return header + command + len(descriptors).to_bytes(2, "big") + descriptors
+
+
+def segmentation(type_id: int, cancel=False, program=True, duration=False) -> bytes:
+    flags = (0x80 if program else 0) | (0x40 if duration else 0) | 0x3F
+    body = b"CUEI" + b"\0\0\0\x01" + bytes([0x80 if cancel else 0x7F, flags])
+    if not program:
+        body += bytes([1]) + b"\x01" + b"\0" * 5
+    if duration:
+        body += b"\0" * 5
+    body += bytes([0x08, 2]) + b"ab" + bytes([type_id, 0, 0])
+    return bytes([0x02, len(body)]) + body
+
+
+def splice_insert(out_of_network: bool, cancel=False) -> bytes:
+    body = b"\0\0\0\x01" + bytes([0x80 if cancel else 0x7F])
+    if not cancel:
+        # program_splice y splice_immediate: sin splice_time ni duración.
+        flags = (0x80 if out_of_network else 0) | 0x40 | 0x10 | 0x0F
+        body += bytes([flags]) + b"\0" * 4
+    return bytes([SPLICE_INSERT]) + body
+
+
+@pytest.mark.parametrize(
+    "message, command, out, types, ad",
+    [
+        (SPLICE_INSERT_OUT, SPLICE_INSERT, True, (), True),
+        (PLACEMENT_START, TIME_SIGNAL, None, (0x34,), True),
+        (PROGRAM_END_START, TIME_SIGNAL, None, (0x11, 0x10), False),
+    ],
+)
+def test_spec_examples(message, command, out, types, ad):
+    signal = parse_splice_info(base64.b64decode(message))
+    assert signal.command_type == command
+    assert signal.out_of_network is out
+    assert signal.segmentation_type_ids == types
+    assert signal.is_ad_start is ad
+    assert signal.is_program is not ad
+
+
+def test_splice_insert_return_to_network_is_program():
+    signal = parse_splice_info(section(splice_insert(False)))
+    assert signal.out_of_network is False
+    assert signal.is_program and not signal.is_ad_start
+
+
+def test_cancelled_splice_insert_has_no_direction():
+    signal = parse_splice_info(section(splice_insert(True, cancel=True)))
+    assert signal.out_of_network is None
+    assert not signal.is_ad_start and not signal.is_program
+
+
+def test_segmentation_descriptor_variants():
+    descriptors = (
+        segmentation(0x30, program=False, duration=True)
+        + segmentation(0x22, cancel=True)
+        + bytes([0x00, 4])
+        + b"CUEI"  # avail_descriptor: se ignora
+        + segmentation(0x10, duration=True)
+    )
+    signal = parse_splice_info(section(bytes([TIME_SIGNAL, 0x7F]), descriptors))
+    assert signal.segmentation_type_ids == (0x30, 0x10)
+
+
+def test_unspecified_command_length_keeps_splice_insert_only():
+    data = section(splice_insert(True), segmentation(0x10), command_length=0xFFF)
+    signal = parse_splice_info(data)
+    assert signal.out_of_network is True
+    assert signal.segmentation_type_ids == ()
+
+
+@pytest.mark.parametrize(
+    "data",
+    [b"", b"\xfc" * 10, b"\x00" * 20, base64.b64decode(PLACEMENT_START)[:20]],
+)
+def test_invalid_sections(data):
+    assert parse_splice_info(data) is None
+
+
+def event(xml: str) -> ET.Element:
+    return ET.fromstring(
+        '<Event xmlns="urn:mpeg:dash:schema:mpd:2011" '
+        'xmlns:scte35="http://www.scte.org/schemas/35/2016">' + xml + "</Event>"
+    )
+
+
+def test_event_signal_forms():
+    binary = event(
+        f"<scte35:Signal><scte35:Binary>{SPLICE_INSERT_OUT}</scte35:Binary>"
+        "</scte35:Signal>"
+    )
+    assert parse_event_signal(binary).is_ad_start
+
+    xml = event(
+        '<scte35:SpliceInfoSection><scte35:SpliceInsert outOfNetworkIndicator="false"/>'
+        "</scte35:SpliceInfoSection>"
+    )
+    assert parse_event_signal(xml).is_program
+
+    time_signal = event(
+        "<scte35:SpliceInfoSection><scte35:TimeSignal/>"
+        '<scte35:SegmentationDescriptor segmentationTypeId="52"/>'
+        "</scte35:SpliceInfoSection>"
+    )
+    assert parse_event_signal(time_signal).segmentation_type_ids == (52,)
+
+    message = ET.fromstring(f'<Event messageData="{PLACEMENT_START}"/>')
+    assert parse_event_signal(message).is_ad_start
+    assert parse_event_signal(ET.fromstring("<Event>no es base64!</Event>")) is None
@@ -0,0 +1,119 @@
+import json
+
+import pytest
+
+from ditupy.services.track_index import IndexEntry, TrackIndex
+
+
+def entry(number, time, size=4, period="", duration=2):
+    return IndexEntry(
+        number, time, duration, 1, size, f"{period}segment_{number}.m4s", period
+    )
+
+
+@pytest.fixture
+def index(tmp_path):
+    return TrackIndex(tmp_path / "video")
+
+
+def write_files(index, entries, init="init.mp4", content=b"init"):
+    index.track_dir.mkdir(parents=True, exist_ok=True)
+    (index.track_dir / init).write_bytes(content)
+    for e in entries:
+        if e.size is not None:
+            (index.track_dir / e.filename).write_bytes(b"x" * e.size)
+
+
+def test_load_orders_by_period_then_time(index):
+    index.write_init("init.mp4", "p1")
+    index.write([entry(3, 4, period="p1"), entry(1, 0, period="p1")])
+    index.write_init("init.mp4", "p0")
+    index.write([entry(9, 100, period="p0")])
+    index.write([entry(2, 2, period="p1")])
+    init, entries = index.load()
+    assert init == "init.mp4"
+    assert [(e.period, e.number) for e in entries] == [
+        ("p1", 1),
+        ("p1", 2),
+        ("p1", 3),
+        ("p0", 9),
+    ]
+
+
+def test_last_attempt_wins_and_torn_line_is_skipped(index):
+    index.write_init("init.mp4")
+    index.write([entry(1, 0, size=None), entry(2, 2)])
+    index.write([entry(1, 0, size=7)])
+    with open(index.path, "a", encoding="utf-8") as f:
+        f.write('{"n":3,"t":4,"d"')
+    _, entries = index.load()
+    assert [(e.number, e.size) for e in entries] == [(1, 7), (2, 4)]
+
+
+def test_entry_round_trip():
+    original = entry(5, 10, size=None, period="p")
+    line = original.to_json()
+    assert IndexEntry.from_json(json.loads(line)) == original
+
+
+def test_periods_with_different_inits_cannot_be_joined(index):
+    write_files(index, [], "init_p0.mp4", b"avc1 720p")
+    write_files(index, [], "init_p1.mp4", b"avc1 720p")
+    write_files(index, [], "init_p2.mp4", b"hvc1 1080p")
+    index.write_init("init_p0.mp4", "p0")
+    index.write_init("init_p1.mp4", "p1")
+    assert index.load()[0] == "init_p0.mp4"
+    index.write_init("init_p2.mp4", "p2")
+    with pytest.raises(ValueError, match="p2"):
+        index.load()
+
+
+def test_missing_init_file_is_not_compared(index):
+    write_files(index, [], "init_p0.mp4")
+    index.write_init("init_p0.mp4", "p0")
+    index.write_init("init_p1.mp4", "p1")
+    assert index.load()[0] == "init_p0.mp4"
+
+
+def test_resolve_lists_files_and_problems(index):
+    entries = [entry(1, 0), entry(2, 2), entry(3, 4, size=None), entry(5, 10)]
+    write_files(index, entries)
+    (index.track_dir / entries[1].filename).write_bytes(b"short")
+    index.write_init("init.mp4")
+    index.write(entries)
+    index.write([entry(6, 12, size=3)])
+
+    files, problems = index.resolve()
+    assert [f.name for f in files] == ["init.mp4", "segment_1.m4s", "segment_5.m4s"]
+    assert problems == [
+        "segmento 2 (2.00s): segment_2.m4s mide 5 bytes, se esperaban 4",
+        "segmento 3 (4.00s): no se descargó",
+        "hueco de 6.00s a 10.00s antes del segmento 5 (10.00s)",
+        "segmento 6 (12.00s): falta segment_6.m4s",
+    ]
+
+
+def test_resolve_skips_consumed_and_period_boundaries(index):
+    entries = [entry(1, 0, period="a"), entry(1, 50, period="b")]
+    write_files(index, entries)
+    index.write_init("init.mp4", "a")
+    index.write(entries)
+    (index.track_dir / entries[0].filename).unlink()
+    files, problems = index.resolve(consumed={"init.mp4", entries[0].filename})
+    # El salto de tiempo entre Periods no es un hueco.
+    assert [f.name for f in files] == [entries[1].filename]
+    assert problems == []
+
+
+def test_resolve_without_init(index):
+    index.write([entry(1, 0)])
+    write_files(index, [entry(1, 0)])
+    _, problems = index.resolve()
+    assert problems[0] == "init ausente (sin registrar)"
+
+
+def test_reset(index):
+    index.write_init("init.mp4")
+    assert index.exists()
+    index.reset()
+    assert not index.exists()
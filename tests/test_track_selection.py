@@ -0,0 +1,48 @@
+from ditupy.dash_model import ManifestModel
+from ditupy.track_selection import TrackPolicy, select_tracks
+
+MPD = """<?xml version="1.0"?>
+<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="static"
+     mediaPresentationDuration="PT60S">
+  <Period id="p0">
+    <AdaptationSet contentType="video" mimeType="video/mp4">
+      <SegmentTemplate media="v_$Number$.m4s" initialization="v_init.mp4"
+                       duration="2" timescale="1"/>
+      <Representation id="v1" bandwidth="800000" width="640" height="360" codecs="avc1.4d401e"/>
+      <Representation id="v2" bandwidth="1500000" width="960" height="540" codecs="avc1.4d401f"/>
+      <Representation id="v3" bandwidth="2800000" width="1280" height="720" codecs="avc1.64001f"/>
+      <Representation id="v4" bandwidth="5000000" width="1920" height="1080" codecs="avc1.640028"/>
+    </AdaptationSet>
+    <AdaptationSet contentType="audio" mimeType="audio/mp4" lang="es">
+      <SegmentTemplate media="a_$Number$.m4s" initialization="a_init.mp4"
+                       duration="2" timescale="1"/>
+      <Representation id="a1" bandwidth="128000" codecs="mp4a.40.2"/>
+      <Representation id="a2" bandwidth="384000" codecs="mp4a.40.2"/>
+    </AdaptationSet>
+  </Period>
+</MPD>
+"""
+
+
+def period():
+    return ManifestModel.from_xml(MPD).periods[0]
+
+
+def test_best_quality_without_policy():
+    selection = select_tracks(period())
+    assert (selection.video.id, selection.audio.id) == ("v4", "a2")
+
+
+def test_total_budget_goes_to_video_first():
+    selection = select_tracks(period(), TrackPolicy(max_total_bandwidth=3_000_000))
+    assert (selection.video.id, selection.audio.id) == ("v3", "a1")
+
+
+def test_audio_takes_the_remainder():
+    selection = select_tracks(period(), TrackPolicy(max_total_bandwidth=5_400_000))
+    assert (selection.video.id, selection.audio.id) == ("v4", "a2")
+
+
+def test_budget_too_small_falls_back_to_minimum():
+    selection = select_tracks(period(), TrackPolicy(max_total_bandwidth=100_000))
+    assert (selection.video.id, selection.audio.id) == ("v1", "a1")